@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Latency and database round trips of GET /analytics for a user with history.
+
+    DB_URI=mongodb://... python -m benchmarks.bench_analytics --sessions 5000
+
+Seeds --sessions completed sessions spread over the last year for a throwaway
+user and compares the former existence check plus three aggregations over
+the raw sessions with the single $facet aggregation over the daily rollup
+made by AnalyticsListService, with and without the analytics cache, then
+times the weekly series per session type over the whole year. The seeded
+sessions and their rollup days are removed afterwards.
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from src.api import AnalyticsGranularity, SessionStatus, SessionType
+from src.config import Config
+from src.db import MongoDB
+from src.service.analytics import AnalyticsListService, _convert_to_hours
+from src.service.rollup import ROLLUP_COLLECTION, rollup_updates
+from src.service.sessiontime import DATE_FORMAT, local_today
+
+USER_ID = "focusbuddy_bench_analytics"
+
+
+class CountingCollection(object):
+    """class to count the round trips made through a collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.round_trips = 0
+
+    def find_one(self, *args, **kwargs):
+        self.round_trips += 1
+        return self.collection.find_one(*args, **kwargs)
+
+    def aggregate(self, *args, **kwargs):
+        self.round_trips += 1
+        return self.collection.aggregate(*args, **kwargs)
+
+
+class CountingDB(object):
+    def __init__(self, collections: dict):
+        self.collections = collections
+
+    def get_collection(self, name):
+        return self.collections[name]
+
+
+def legacy_analytics(service: AnalyticsListService, user_id: str) -> tuple:
+    """the former existence check followed by one aggregation per figure"""
+    collection = service.db.get_collection("focus_timer")
+    if collection.find_one({"user_id": user_id}) is None:
+        return 0, 0, 0
+    totals = []
+    for start, end in (service._daily_window(), service._weekly_window()):
+        match = {"user_id": user_id, "session_status": 3}
+        match["start_at"] = {"$gte": start, "$lt": end}
+        group = {
+            "_id": None,
+            "duration": {"$sum": "$duration"},
+            "remaining_time": {"$sum": "$remaining_focus_time"},
+        }
+        total = list(collection.aggregate([{"$match": match}, {"$group": group}]))
+        if total:
+            seconds = total[0]["duration"] * 60 - total[0]["remaining_time"]
+            totals.append(_convert_to_hours(seconds))
+        else:
+            totals.append(0)
+    completed = list(
+        collection.aggregate(
+            [
+                {"$match": {"user_id": user_id, "session_status": 3}},
+                {"$count": "total"},
+            ]
+        )
+    )
+    return totals[0], totals[1], completed[0]["total"] if completed else 0
+
+
+def seed(collection, rollup, count: int):
+    today = local_today()
+    docs = []
+    for i in range(count):
+        start_at = today - timedelta(minutes=i * 105)
+        docs.append(
+            {
+                "user_id": USER_ID,
+                "session_status": SessionStatus.COMPLETED,
+                "start_date": start_at.strftime("%m/%d/%Y"),
+                "start_time": start_at.strftime("%H:%M:%S"),
+                "duration": 25,
+                "break_duration": 5,
+                "session_type": SessionType.WORK,
+                "remaining_focus_time": 0,
+                "remaining_break_time": 0,
+                "start_at": start_at,
+                "end_at": start_at + timedelta(minutes=30),
+            }
+        )
+    collection.insert_many(docs)
+    rollup.bulk_write([write for doc in docs for write in rollup_updates(after=doc)])
+
+
+def timed(name: str, call, counter: CountingCollection, repeat: int):
+    counter.round_trips = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = call()
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    print(
+        f"{name:>8}: {elapsed:9.3f}ms per call, "
+        f"{counter.round_trips / repeat:.0f} round trips per call -> {result}"
+    )
+
+
+def main(args):
+    db = MongoDB().db
+    collection = db.get_collection("focus_timer")
+    rollup = db.get_collection(ROLLUP_COLLECTION)
+    counter = CountingCollection(collection)
+    rollup_counter = CountingCollection(rollup)
+    service = AnalyticsListService(Config())
+    service.db = CountingDB({"focus_timer": counter, ROLLUP_COLLECTION: rollup_counter})
+    collection.delete_many({"user_id": USER_ID})
+    rollup.delete_many({"user_id": USER_ID})
+    try:
+        seed(collection, rollup, args.sessions)
+        timed(
+            "before",
+            lambda: legacy_analytics(service, USER_ID),
+            counter,
+            args.repeat,
+        )
+        timed(
+            "after",
+            lambda: service._get_analytics(USER_ID).model_dump(exclude={"status"}),
+            rollup_counter,
+            args.repeat,
+        )
+        timed(
+            "cached",
+            lambda: service.get_analytics(USER_ID).model_dump(exclude={"status"}),
+            rollup_counter,
+            args.repeat,
+        )
+        today = local_today()
+        start_date = (today - timedelta(days=365)).strftime(DATE_FORMAT)
+        timed(
+            "series",
+            lambda: len(
+                service._get_analytics_series(
+                    USER_ID,
+                    start_date,
+                    today.strftime(DATE_FORMAT),
+                    AnalyticsGranularity.WEEK,
+                    True,
+                )
+            ),
+            rollup_counter,
+            args.repeat,
+        )
+    finally:
+        collection.delete_many({"user_id": USER_ID})
+        rollup.delete_many({"user_id": USER_ID})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Microbenchmark of the per-request authentication cost in BaseAPI.validate_token.
+
+    python -m benchmarks.bench_auth
+
+Compares a full jwt.decode on every request with the verified-token cache.
+No database or server is needed.
+"""
+import argparse
+import timeit
+
+from src.config import Config
+from src.rest.rest import BaseAPI
+from src.service.user import TokenCache
+
+
+def main(args):
+    api = BaseAPI(Config())
+    token = api.user_service._generate_jwt("focusbuddy_bench", "bench@focusbuddy.dev")
+    cache = TokenCache()
+
+    def uncached():
+        cache.clear()
+        api.validate_token(token)
+
+    def clear():
+        cache.clear()
+
+    clear_cost = min(timeit.repeat(clear, number=args.number, repeat=5))
+    before = min(timeit.repeat(uncached, number=args.number, repeat=5)) - clear_cost
+    api.validate_token(token)
+    after = min(
+        timeit.repeat(lambda: api.validate_token(token), number=args.number, repeat=5)
+    )
+
+    def per_call(total):
+        return total / args.number * 1e6
+
+    print(f"jwt.decode per request: {per_call(before):8.2f}us")
+    print(f"cached per request:     {per_call(after):8.2f}us")
+    print(f"speedup:                {before / after:8.1f}x")
+    print(f"cache stats:            {cache.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=20000)
+    main(parser.parse_args())
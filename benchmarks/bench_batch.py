@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Throughput of creating many focus sessions one by one versus as one batch.
+
+    DB_URI=mongodb://... python -m benchmarks.bench_batch --sessions 200
+
+Plans --sessions hourly sessions (every fifth one overlapping the previous)
+for a throwaway user, first through add_focus_session per item, then through
+a single add_focus_sessions call, and checks both paths accept the same ones.
+The created sessions are removed afterwards.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from src.api import SessionStatus, SessionType
+from src.config import Config
+from src.db import MongoDB
+from src.service.focustimer import FocusTimerService
+
+USER_ID = "focusbuddy_bench_batch"
+
+
+def planned_sessions(count: int, origin: datetime) -> list:
+    sessions = []
+    for i in range(count):
+        start_at = origin + timedelta(hours=i, minutes=-50 if i % 5 == 4 else 0)
+        sessions.append(
+            {
+                "session_status": SessionStatus.UPCOMING,
+                "start_date": start_at.strftime("%m/%d/%Y"),
+                "start_time": start_at.strftime("%H:%M:%S"),
+                "duration": 25,
+                "break_duration": 5,
+                "session_type": SessionType.WORK,
+                "remaining_focus_time": 1500,
+                "remaining_break_time": 300,
+            }
+        )
+    return sessions
+
+
+def report(name: str, elapsed: float, count: int, accepted: int):
+    print(
+        f"{name:>10}: {elapsed * 1000:9.1f}ms total, "
+        f"{count / elapsed:9.0f} sessions/s ({accepted} created)"
+    )
+
+
+def main(args):
+    collection = MongoDB().db.get_collection("focus_timer")
+    service = FocusTimerService(Config())
+    sessions = planned_sessions(args.sessions, datetime(2030, 1, 1))
+    collection.delete_many({"user_id": USER_ID})
+    try:
+        start = time.perf_counter()
+        single = [
+            service.add_focus_session(USER_ID, *session.values())[1]
+            for session in sessions
+        ]
+        report("per item", time.perf_counter() - start, len(sessions), sum(single))
+        collection.delete_many({"user_id": USER_ID})
+
+        start = time.perf_counter()
+        batch = [ok for _, ok in service.add_focus_sessions(USER_ID, sessions)]
+        report("batch", time.perf_counter() - start, len(sessions), sum(batch))
+        assert single == batch, "batch and per item paths disagree"
+    finally:
+        collection.delete_many({"user_id": USER_ID})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=200)
+    main(parser.parse_args())
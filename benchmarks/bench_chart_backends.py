@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Per-chart render time and worker memory of every chart backend.
+
+    python -m benchmarks.bench_chart_backends --charts 200
+
+Every backend runs in a fresh interpreter that imports src.service, the
+way an API or Celery worker does, then renders --charts random weeks. The
+import time, the mean time per chart and the peak RSS of that process are
+printed. No database or server is needed.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+BACKENDS = ("builtin", "svg", "matplotlib")
+
+
+def child(backend: str, charts: int):
+    start = time.perf_counter()
+    import src.service  # noqa: F401
+    from src.service.charts import render_chart
+
+    imported = time.perf_counter() - start
+
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    matrices = rng.integers(0, 120, size=(charts, 7, 4))
+    # the first chart pays for lazy imports, leave it out of the mean
+    render_chart(matrices[0], backend)
+    start = time.perf_counter()
+    for matrix in matrices:
+        render_chart(matrix, backend)
+    per_chart = (time.perf_counter() - start) / charts
+    # ru_maxrss is in KB on Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"import": imported, "per_chart": per_chart, "rss": rss}))
+
+
+def main(args):
+    print(f"{args.charts} charts per backend")
+    for backend in BACKENDS:
+        output = subprocess.run(
+            [sys.executable, "-m", __spec__.name, "--child", backend]
+            + ["--charts", str(args.charts)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(
+            f"{backend:>11}: import {result['import'] * 1000:7.1f}ms"
+            f"  {result['per_chart'] * 1000:7.2f}ms/chart"
+            f"  peak RSS {result['rss']:6.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--charts", type=int, default=200)
+    parser.add_argument("--child", choices=BACKENDS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.charts)
+    else:
+        main(args)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Wall-clock time of rendering the weekly summary charts on a process pool.
+
+    python -m benchmarks.bench_chart_rendering --charts 400 --workers 1 2 4 8
+
+Renders --charts random weeks once in the calling process, the way the job
+does with CHART_WORKERS=0, and once per --workers count on a process pool
+through render_charts. The pool startup is included in the timings. No
+database or server is needed.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.service.notification import (
+    CHARTS_IN_FLIGHT_PER_WORKER,
+    render_chart,
+    render_charts,
+)
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    matrices = rng.integers(0, 120, size=(args.charts, 7, 4))
+    print(f"{args.charts} charts, {os.cpu_count()} cores")
+
+    start = time.perf_counter()
+    expected = [render_chart(matrix) for matrix in matrices]
+    serial = time.perf_counter() - start
+    print(f"{'in process':>12}: {serial:7.2f}s")
+
+    for workers in args.workers:
+        start = time.perf_counter()
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        with pool:
+            window = workers * CHARTS_IN_FLIGHT_PER_WORKER
+            charts = list(render_charts(pool, matrices, window))
+        elapsed = time.perf_counter() - start
+        assert charts == expected
+        print(f"{workers:>4} workers: {elapsed:7.2f}s ({serial / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--charts", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    main(parser.parse_args())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Measures the latency of a cheap endpoint while /analytics is under load.
+
+Start the API first, then run from the repository root:
+
+    python -m benchmarks.bench_concurrency --url http://localhost:8000
+
+The probe latencies are printed once on an idle server and once while
+``--load`` concurrent clients hammer /analytics. With a non-blocking data
+layer the p99 of the probe should stay roughly flat between the two runs.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from src.config import Config, api_version
+from src.service.user import UserService
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def probe(
+    client: httpx.AsyncClient, path: str, headers: dict, count: int
+) -> list:
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    return latencies
+
+
+async def load(client: httpx.AsyncClient, headers: dict, stop: asyncio.Event):
+    while not stop.is_set():
+        await client.get(f"{api_version}/analytics", headers=headers)
+
+
+async def run(args):
+    token = UserService(Config())._generate_jwt(args.user_id, "bench@focusbuddy.dev")
+    headers = {"x-auth-token": token}
+    limits = httpx.Limits(max_connections=args.load + 1)
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=30
+    ) as client:
+        path = f"{api_version}/blocklist"
+        idle = await probe(client, path, headers, args.requests)
+
+        stop = asyncio.Event()
+        workers = [
+            asyncio.create_task(load(client, headers, stop)) for _ in range(args.load)
+        ]
+        loaded = await probe(client, path, headers, args.requests)
+        stop.set()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    for name, samples in (("idle", idle), (f"/analytics x{args.load}", loaded)):
+        print(
+            f"{name:>20}: p50={statistics.median(samples):7.2f}ms "
+            f"p99={percentile(samples, 99):7.2f}ms max={max(samples):7.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--user-id", default="focusbuddy_bench")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--load", type=int, default=32)
+    asyncio.run(run(parser.parse_args()))
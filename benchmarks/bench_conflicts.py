@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Cost of the focus session conflict check for a user with many planned sessions.
+
+    DB_URI=mongodb://... python -m benchmarks.bench_conflicts --sessions 10000
+
+Seeds --sessions upcoming sessions for a throwaway user and compares loading
+every unfinished session and scanning it (the former behaviour) with the
+indexed overlap query and with the in-process SessionIntervals structure.
+The seeded sessions are removed afterwards.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from src.api import SessionStatus, SessionType
+from src.config import Config
+from src.db import MongoDB
+from src.service.focustimer import UNFINISHED_STATUSES, FocusTimerService
+from src.service.sessiontime import SessionIntervals
+
+USER_ID = "focusbuddy_bench_conflicts"
+
+
+def seed(collection, count: int, origin: datetime) -> list:
+    docs = []
+    for i in range(count):
+        start_at = origin + timedelta(hours=i)
+        docs.append(
+            {
+                "user_id": USER_ID,
+                "session_status": SessionStatus.UPCOMING,
+                "start_date": start_at.strftime("%m/%d/%Y"),
+                "start_time": start_at.strftime("%H:%M:%S"),
+                "duration": 25,
+                "break_duration": 5,
+                "session_type": SessionType.WORK,
+                "remaining_focus_time": 1500,
+                "remaining_break_time": 300,
+                "start_at": start_at,
+                "end_at": start_at + timedelta(minutes=30),
+            }
+        )
+    collection.insert_many(docs)
+    return [(doc["start_at"], doc["end_at"]) for doc in docs]
+
+
+def scan_conflict(collection, start_at: datetime, end_at: datetime) -> bool:
+    sessions = collection.find(
+        {"user_id": USER_ID, "session_status": {"$in": UNFINISHED_STATUSES}},
+        projection={"start_at": 1, "end_at": 1},
+    )
+    return any(s["start_at"] < end_at and s["end_at"] > start_at for s in sessions)
+
+
+def timed(name: str, check, proposals: list):
+    start = time.perf_counter()
+    conflicts = sum(1 for start_at, end_at in proposals if check(start_at, end_at))
+    elapsed = (time.perf_counter() - start) / len(proposals) * 1000
+    print(f"{name:>18}: {elapsed:9.3f}ms per check ({conflicts} conflicts)")
+
+
+def main(args):
+    collection = MongoDB().db.get_collection("focus_timer")
+    service = FocusTimerService(Config())
+    origin = datetime(2030, 1, 1)
+    collection.delete_many({"user_id": USER_ID})
+    try:
+        intervals = seed(collection, args.sessions, origin)
+        random.seed(0)
+        proposals = []
+        for _ in range(args.checks):
+            start_at = origin + timedelta(minutes=random.randrange(args.sessions * 60))
+            proposals.append((start_at, start_at + timedelta(minutes=20)))
+
+        timed("load + scan", lambda s, e: scan_conflict(collection, s, e), proposals)
+        timed(
+            "indexed query",
+            lambda s, e: service.is_time_conflict_with_all_sessions(USER_ID, s, e),
+            proposals,
+        )
+        build = time.perf_counter()
+        tree = SessionIntervals(intervals)
+        print(f"{'intervals build':>18}: {(time.perf_counter() - build) * 1000:9.3f}ms")
+        timed("SessionIntervals", tree.overlaps, proposals)
+    finally:
+        collection.delete_many({"user_id": USER_ID})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--checks", type=int, default=200)
+    main(parser.parse_args())
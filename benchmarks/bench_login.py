@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Latency of the google userinfo lookup done by POST /user/login.
+
+    python -m benchmarks.bench_login --delay-ms 40
+
+Runs against a local stand-in userinfo server that answers after --delay-ms
+and compares the old blocking requests.get call with GoogleUserInfoClient for
+cold logins (new token, pooled connection) and warm logins (cached token).
+No database is needed.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from src.config import Config
+from src.service.google import GoogleUserInfoClient
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    delay = 0.0
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        token = self.headers["Authorization"].removeprefix("Bearer ")
+        payload = json.dumps({"email": f"{token}@gmail.com", "picture": ""}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def report(name: str, samples: list):
+    print(
+        f"{name:>24}: p50={statistics.median(samples):7.2f}ms "
+        f"max={max(samples):7.2f}ms"
+    )
+
+
+async def timed(coro_fn, tokens) -> list:
+    samples = []
+    for token in tokens:
+        start = time.perf_counter()
+        await coro_fn(token)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def run(args, url: str):
+    client = GoogleUserInfoClient()
+    tokens = [f"bench-{i}" for i in range(args.logins)]
+    report("cold (pooled client)", await timed(client.get_user, tokens))
+    report("warm (cached profile)", await timed(client.get_user, tokens))
+    await client.close()
+
+
+def main(args):
+    StandInHandler.delay = args.delay_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    Config().google_userinfo_url = url
+
+    samples = []
+    for i in range(args.logins):
+        start = time.perf_counter()
+        requests.get(url, headers={"Authorization": f"Bearer blocking-{i}"})
+        samples.append((time.perf_counter() - start) * 1000)
+    report("requests.get per login", samples)
+
+    asyncio.run(run(args, url))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--delay-ms", type=float, default=0.0)
+    main(parser.parse_args())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Throughput of bulk email delivery against a local aiosmtpd stand-in.
+
+    python -m benchmarks.bench_smtp --emails 2000 --handshake-ms 50
+
+Starts an aiosmtpd server that delays every EHLO by --handshake-ms, to stand
+in for the round trips, STARTTLS and AUTH of a real provider, then sends
+--emails weekly summary sized messages twice: once with a new session per
+message like the former send_email, and once through SMTPPool with
+--pool-size sessions on as many threads.
+"""
+import argparse
+import asyncio
+import smtplib
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiosmtpd.controller import Controller
+
+from src.service.mailer import SMTPPool
+
+
+class Sink:
+    def __init__(self, handshake: float):
+        self.handshake = handshake
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.handshake)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main(args):
+    sink = Sink(args.handshake_ms / 1000)
+    controller = Controller(sink, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    host, port = controller.hostname, controller.port
+    # about the size of a summary email with its base64-encoded chart
+    body = ("x" * 76 + "\r\n") * 400
+    message = "Subject: Your Weekly Focus Sessions Summary\r\n\r\n" + body
+
+    def one_shot(to_email: str):
+        with smtplib.SMTP(host, port) as server:
+            server.ehlo()
+            server.sendmail("from@focusbuddy.dev", to_email, message)
+
+    pool = SMTPPool(host, port, starttls=False, size=args.pool_size)
+
+    def pooled(to_email: str):
+        pool.send("from@focusbuddy.dev", to_email, message)
+
+    recipients = [f"user{i}@focusbuddy.dev" for i in range(args.emails)]
+    try:
+        for name, send in (("session per email", one_shot), ("SMTPPool", pooled)):
+            sink.received = 0
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.pool_size) as senders:
+                list(senders.map(send, recipients))
+            elapsed = time.perf_counter() - start
+            assert sink.received == args.emails
+            print(f"{name:>18}: {args.emails / elapsed:8.1f} emails/s")
+        print(f"{'pool stats':>18}: {pool.stats()}")
+    finally:
+        pool.close()
+        controller.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--handshake-ms", type=float, default=50)
+    main(parser.parse_args())
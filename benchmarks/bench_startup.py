@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Import time and time to first request of the API, against a budget.
+
+    python -m benchmarks.bench_startup --runs 5
+
+Every run imports src.rest in a fresh interpreter under ``python -X
+importtime``, then starts uvicorn on src.rest:app and polls /metrics until
+it answers. The medians and the modules with the largest import time are
+printed. The exit status is 1 when a median is over its budget or when a
+module that must stay lazy (Celery, the chart backends, testcontainers) was
+imported, so the script can gate a CI job. No database is needed.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from src.config import api_version
+
+# only needed by some requests or processes, never to serve the first one
+LAZY_MODULES = ("celery", "kombu", "matplotlib", "testcontainers", "docker")
+
+
+def import_times() -> dict:
+    """Cumulative import time in ms of every module imported by src.rest."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.rest"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # the same module can only be imported once, keep the outermost name
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_request(timeout: float) -> float:
+    """Seconds from starting uvicorn to the first answered request."""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}{api_version}/metrics"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.rest:app", "--port", str(port)]
+        + ["--log-level", "warning"],
+        env={**os.environ, "ENSURE_INDEXES": "0"},
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                httpx.get(url, timeout=1).raise_for_status()
+                return time.perf_counter() - start
+            except httpx.TransportError:
+                time.sleep(0.01)
+        raise TimeoutError(f"no answer from {url} in {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(args) -> int:
+    runs = [import_times() for _ in range(args.runs)]
+    imported = statistics.median(times["src.rest"] for times in runs)
+    ready = statistics.median(first_request(args.timeout) for _ in range(args.runs))
+
+    print("slowest top-level imports of the last run")
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)
+    for name, ms in [item for item in slowest if "." not in item[0]][: args.top]:
+        print(f"  {name:>24}: {ms:7.1f}ms")
+    print(f"medians of {args.runs} runs")
+    print(f"import src.rest: {imported:7.1f}ms (budget {args.import_budget_ms}ms)")
+    print(f"  first request: {ready * 1000:7.1f}ms (budget {args.ready_budget_ms}ms)")
+
+    failed = False
+    lazy = sorted({name.split(".")[0] for name in runs[-1]} & set(LAZY_MODULES))
+    if lazy:
+        print(f"imported at startup: {', '.join(lazy)}")
+        failed = True
+    if imported > args.import_budget_ms:
+        print("import time over budget")
+        failed = True
+    if ready * 1000 > args.ready_budget_ms:
+        print("time to first request over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--import-budget-ms", type=int, default=1000)
+    parser.add_argument("--ready-budget-ms", type=int, default=2500)
+    sys.exit(main(parser.parse_args()))
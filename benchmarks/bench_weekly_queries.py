@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Database time and bytes transferred to gather the weekly summary inputs.
+
+    DB_URI=mongodb://... python -m benchmarks.bench_weekly_queries --users 2000
+
+Seeds --users subscribed users, each with --history-days days of rollup
+history, and compares the former shape of the job (find the subscribers,
+then one unbounded find per user filtered to the week in Python) with the
+single aggregation of NotificationService._weekly_summary_pipeline.
+The seeded users and rollup days are removed afterwards.
+"""
+import argparse
+import random
+import time
+from datetime import timedelta
+
+from bson import BSON, ObjectId
+
+from src.config import Config
+from src.db import MongoDB
+from src.service.notification import NotificationService
+from src.service.rollup import ROLLUP_COLLECTION
+from src.service.sessiontime import local_today
+
+EMAIL_DOMAIN = "@bench-weekly.focusbuddy.dev"
+
+
+def seed(db, users: int, history_days: int) -> list:
+    random.seed(0)
+    today = local_today()
+    user_docs = [
+        {
+            "_id": ObjectId(),
+            "email": f"user{i}{EMAIL_DOMAIN}",
+            "notification": {"email_notification": True, "browser": False},
+        }
+        for i in range(users)
+    ]
+    db.get_collection("user").insert_many(user_docs)
+    rows = []
+    for user in user_docs:
+        for days_ago in range(history_days):
+            if random.random() < 0.5:
+                continue
+            rows.append(
+                {
+                    "user_id": str(user["_id"]),
+                    "day": today - timedelta(days=days_ago),
+                    "session_type": random.randrange(4),
+                    "focus_seconds": 1500,
+                    "focus_minutes": 25,
+                    "sessions": 1,
+                }
+            )
+    db.get_collection(ROLLUP_COLLECTION).insert_many(rows)
+    return [str(user["_id"]) for user in user_docs]
+
+
+def size(doc: dict) -> int:
+    return len(BSON.encode(doc))
+
+
+def per_user(db) -> (int, int, int):
+    week_start = local_today() - timedelta(days=6)
+    transferred = round_trips = kept = 0
+    users = db.get_collection("user").find({"notification.email_notification": True})
+    round_trips += 1
+    for user in users:
+        transferred += size(user)
+        round_trips += 1
+        for row in db.get_collection(ROLLUP_COLLECTION).find(
+            {"user_id": str(user["_id"])}
+        ):
+            transferred += size(row)
+            kept += row["day"] >= week_start
+    return transferred, round_trips, kept
+
+
+def single_aggregation(db, service: NotificationService) -> (int, int, int):
+    transferred = kept = 0
+    for week in db.get_collection(ROLLUP_COLLECTION).aggregate(
+        service._weekly_summary_pipeline(), batchSize=1000
+    ):
+        transferred += size(week)
+        kept += len(week["days"])
+    return transferred, 1, kept
+
+
+def report(name: str, call):
+    start = time.perf_counter()
+    transferred, round_trips, rows = call()
+    elapsed = (time.perf_counter() - start) * 1000
+    print(
+        f"{name:>18}: {elapsed:9.1f}ms, {transferred / 1024:9.1f}KiB "
+        f"in {round_trips} queries ({rows} rows of the week)"
+    )
+
+
+def main(args):
+    db = MongoDB().db
+    service = NotificationService(Config())
+    user_ids = []
+    try:
+        user_ids = seed(db, args.users, args.history_days)
+        report("query per user", lambda: per_user(db))
+        report("single aggregation", lambda: single_aggregation(db, service))
+    finally:
+        db.get_collection("user").delete_many({"email": {"$regex": f"{EMAIL_DOMAIN}$"}})
+        db.get_collection(ROLLUP_COLLECTION).delete_many({"user_id": {"$in": user_ids}})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--history-days", type=int, default=365)
+    main(parser.parse_args())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Cost of turning a week of sessions into per-user day x session type minutes.
+
+    python -m benchmarks.bench_weekly_summary --users 100000
+
+Generates --sessions-per-user completed sessions of the past week for every
+user and compares the former per-session loop (two strptime calls and nested
+defaultdicts per session) with building columnar arrays and computing every
+user's 7x4 matrix at once with week_matrices. Chart rendering is left out.
+No database or server is needed.
+"""
+import argparse
+import math
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.service.notification import WEEK_ORDER, week_matrices
+
+
+def generate(users: int, per_user: int) -> list:
+    random.seed(0)
+    monday = datetime(2030, 1, 7)
+    sessions = []
+    for user in range(users):
+        for _ in range(per_user):
+            start_at = monday + timedelta(minutes=random.randrange(7 * 24 * 60))
+            sessions.append(
+                {
+                    "user_id": user,
+                    "start_date": start_at.strftime("%m/%d/%Y"),
+                    "start_time": start_at.strftime("%H:%M:%S"),
+                    "start_at": start_at,
+                    "session_type": random.randrange(4),
+                    "duration": random.choice((25, 50, 90)),
+                    "remaining_focus_time": random.randrange(600),
+                }
+            )
+    return sessions
+
+
+def per_session_loop(sessions: list) -> dict:
+    day_data = defaultdict(lambda: defaultdict(lambda: {0: 0, 1: 0, 2: 0, 3: 0}))
+    for s in sessions:
+        date = datetime.strptime(s["start_date"], "%m/%d/%Y")
+        datetime.strptime(s["start_time"], "%H:%M:%S")
+        day_data[s["user_id"]][date.strftime("%A")][s["session_type"]] += s[
+            "duration"
+        ] - math.floor(s["remaining_focus_time"] / 60)
+    return day_data
+
+
+def vectorized(sessions: list, users: int):
+    columns = [[], [], [], []]
+    for s in sessions:
+        columns[0].append(s["user_id"])
+        columns[1].append(s["start_at"].weekday())
+        columns[2].append(s["session_type"])
+        columns[3].append(s["duration"] - s["remaining_focus_time"] // 60)
+    arrays = [np.array(column, dtype=np.int64) for column in columns]
+    return week_matrices(*arrays, users)
+
+
+def main(args):
+    sessions = generate(args.users, args.sessions_per_user)
+    print(f"{len(sessions)} sessions of {args.users} users")
+
+    start = time.perf_counter()
+    day_data = per_session_loop(sessions)
+    before = time.perf_counter() - start
+    print(f"{'per session loop':>18}: {before * 1000:9.1f}ms")
+
+    start = time.perf_counter()
+    matrices, _ = vectorized(sessions, args.users)
+    after = time.perf_counter() - start
+    print(f"{'week_matrices':>18}: {after * 1000:9.1f}ms ({before / after:.1f}x)")
+
+    sample = random.randrange(args.users)
+    for day, types in day_data[sample].items():
+        expected = [types[t] for t in range(4)]
+        assert list(matrices[sample, WEEK_ORDER.index(day)]) == expected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--sessions-per-user", type=int, default=5)
+    main(parser.parse_args())
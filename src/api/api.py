@@ -109,6 +109,25 @@ class ListAnalyticsWeeklySummaryResponse(BaseModel):
     status: ResponseStatus = ResponseStatus.SUCCESS
 
 
+class AnalyticsGranularity(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class AnalyticsSeriesPoint(BaseModel):
+    start_date: str
+    session_type: Optional[SessionType] = None
+    duration: float = 0
+    sessions: int = 0
+
+
+class AnalyticsSeriesResponse(BaseModel):
+    granularity: AnalyticsGranularity
+    series: List[AnalyticsSeriesPoint]
+    status: ResponseStatus = ResponseStatus.SUCCESS
+
+
 class FocusSessionModel(BaseModel):
     session_status: Optional[SessionStatus] = None
     start_date: Optional[str] = None
@@ -120,6 +139,36 @@ class FocusSessionModel(BaseModel):
     remaining_break_time: Optional[int] = None
 
 
+class RecurrenceFrequency(str, Enum):
+    DAILY = "daily"
+    WEEKLY = "weekly"
+
+
+class FocusSessionRecurrence(BaseModel):
+    session: FocusSessionModel
+    frequency: RecurrenceFrequency = RecurrenceFrequency.DAILY
+    count: Optional[int] = None
+    until: Optional[str] = None
+
+
+class AddFocusSessionBatchRequest(BaseModel):
+    sessions: List[FocusSessionModel] = []
+    recurrence: Optional[FocusSessionRecurrence] = None
+
+
+class FocusSessionBatchItem(BaseModel):
+    start_date: str
+    start_time: str
+    id: Optional[str] = None
+    conflict: bool = False
+
+
+class AddFocusSessionBatchResponse(BaseModel):
+    items: List[FocusSessionBatchItem]
+    created: int
+    status: ResponseStatus = ResponseStatus.SUCCESS
+
+
 class GetFocusSessionResponse(BaseModel):
     session_id: Optional[str] = None
     session_status: Optional[SessionStatus] = None
@@ -161,3 +210,33 @@ class GetAllFocusSessionResponse(BaseModel):
 class NotificationUpdateRequest(BaseModel):
     type: str
     enabled: bool
+
+
+class WeeklySummaryScope(str, Enum):
+    SELF = "self"
+    ALL = "all"
+
+
+class WeeklySummaryJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class WeeklySummaryJobRequest(BaseModel):
+    scope: WeeklySummaryScope = WeeklySummaryScope.SELF
+
+
+class WeeklySummaryJobResponse(BaseModel):
+    job_id: str
+    week: str
+    job_status: WeeklySummaryJobStatus
+    users: int = 0
+    chunks: int = 0
+    chunks_done: int = 0
+    pending: int = 0
+    sending: int = 0
+    sent: int = 0
+    failed: int = 0
+    status: ResponseStatus = ResponseStatus.SUCCESS
@@ -5,6 +5,13 @@ import os
 api_version = "/api/v1"
 
 
+def cpu_count() -> int:
+    """CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
 class Config:
     _instance = None
 
@@ -24,7 +31,47 @@ class Config:
 
             self.app_host = os.getenv("APP_HOST", "localhost")
             self.app_port = int(os.getenv("APP_PORT", 8000))
-            self.initialized = True
+            # "production" runs web_workers processes (0 is one per usable CPU,
+            # more than one share the analytics cache through
+            # ANALYTICS_CACHE_REDIS_URL only), "dev" a single reloading one
+            # with debugpy listening on debug_port
+            self.server_profile = os.getenv("SERVER_PROFILE", "production")
+            self.web_workers = int(os.getenv("WEB_WORKERS", 0))
+            self.debug_port = int(os.getenv("DEBUG_PORT", 5678))
+            # longer than the idle timeout of the load balancer, so that it is
+            # the one closing idle connections
+            self.keep_alive = int(os.getenv("KEEP_ALIVE", 75))
+            self.backlog = int(os.getenv("BACKLOG", 2048))
+            # seconds in-flight requests get to finish on shutdown
+            self.graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+
+            # "async" awaits the Async* services, "offload" runs the synchronous
+            # services on a bounded thread pool instead
+            self.service_mode = os.getenv("SERVICE_MODE", "async")
+            self.offload_workers = int(os.getenv("OFFLOAD_WORKERS", 16))
+            self.offload_queue_size = int(os.getenv("OFFLOAD_QUEUE_SIZE", 64))
+            self.token_cache_size = int(os.getenv("TOKEN_CACHE_SIZE", 4096))
+
+            self.google_userinfo_url = os.getenv(
+                "GOOGLE_USERINFO_URL", "https://www.googleapis.com/oauth2/v2/userinfo"
+            )
+            self.google_timeout = float(os.getenv("GOOGLE_TIMEOUT", 3.0))
+            self.google_retries = int(os.getenv("GOOGLE_RETRIES", 2))
+            self.google_pool_size = int(os.getenv("GOOGLE_POOL_SIZE", 20))
+            self.userinfo_cache_ttl = int(os.getenv("USERINFO_CACHE_TTL", 300))
+            self.userinfo_cache_size = int(os.getenv("USERINFO_CACHE_SIZE", 1024))
+            self.analytics_cache_size = int(os.getenv("ANALYTICS_CACHE_SIZE", 4096))
+            self.analytics_cache_ttl = int(os.getenv("ANALYTICS_CACHE_TTL", 600))
+            self.analytics_cache_redis_url = os.getenv("ANALYTICS_CACHE_REDIS_URL", "")
+            # processes the weekly summary charts are rendered on, 0 renders
+            # them in the calling process, as do the prefork Celery workers
+            self.chart_workers = int(os.getenv("CHART_WORKERS", 0))
+            # "matplotlib", or the faster "builtin" (PNG) and "svg" renderers
+            # that draw the same chart without it, see src/service/charts.py
+            self.chart_backend = os.getenv("CHART_BACKEND", "matplotlib")
+            # build the missing indexes in the background when the app starts,
+            # set to 0 where "python -m src.service.migrations indexes" does it
+            self.ensure_indexes = os.getenv("ENSURE_INDEXES", "1") == "1"
 
             self.secret_key = os.getenv(
                 "SECRET_KEY", "70dd17f8-b3cd-4b1a-a09a-7cdf68c59fdc"
@@ -37,6 +84,15 @@ class Config:
             )
             self.smtp_password = os.environ.get("SMTP_PASSWORD", "cjdjlqijxkajcpgi")
             self.from_email = os.environ.get("FROM_EMAIL", "ece651.group10@gmail.com")
+            self.smtp_starttls = os.environ.get("SMTP_STARTTLS", "true") == "true"
+            # authenticated SMTP sessions kept open for sending, each reused for
+            # up to SMTP_MESSAGES_PER_CONNECTION messages; SMTP_RATE_LIMIT caps
+            # the messages sent per second, 0 for no limit
+            self.smtp_pool_size = int(os.environ.get("SMTP_POOL_SIZE", 4))
+            self.smtp_messages_per_connection = int(
+                os.environ.get("SMTP_MESSAGES_PER_CONNECTION", 100)
+            )
+            self.smtp_rate_limit = float(os.environ.get("SMTP_RATE_LIMIT", 0))
 
             self.broker_url = os.environ.get(
                 "CELERY_BROKER_URL", "redis://redis:6379/0"
@@ -44,3 +100,40 @@ class Config:
             self.backend_url = os.environ.get(
                 "CELERY_RESULT_BACKEND", "redis://redis:6379/0"
             )
+            # the weekly summary is sent in chunks of SUMMARY_CHUNK_SIZE users,
+            # a chunk with failed emails is retried up to SUMMARY_CHUNK_RETRIES
+            # times, SUMMARY_RETRY_DELAY seconds doubling on every retry
+            self.summary_chunk_size = int(os.environ.get("SUMMARY_CHUNK_SIZE", 200))
+            self.summary_chunk_retries = int(os.environ.get("SUMMARY_CHUNK_RETRIES", 3))
+            self.summary_retry_delay = int(os.environ.get("SUMMARY_RETRY_DELAY", 60))
+            # the weekly summary goes out over a window of SUMMARY_WINDOW_HOURS
+            # from Monday midnight in the user's time zone, split into
+            # SUMMARY_BUCKETS buckets of users sent to one after the other
+            self.summary_window_hours = float(os.environ.get("SUMMARY_WINDOW_HOURS", 6))
+            self.summary_buckets = int(os.environ.get("SUMMARY_BUCKETS", 24))
+            if self.summary_window_hours <= 0 or self.summary_buckets < 1:
+                # the beat schedule runs once per window_hours / buckets
+                raise ValueError(
+                    "SUMMARY_WINDOW_HOURS must be positive and SUMMARY_BUCKETS "
+                    "at least 1"
+                )
+            # the emails of the outbox are claimed OUTBOX_CLAIM_BATCH at a time
+            # for OUTBOX_LEASE_SECONDS, and failed for good after
+            # OUTBOX_MAX_ATTEMPTS attempts
+            self.outbox_claim_batch = int(os.environ.get("OUTBOX_CLAIM_BATCH", 100))
+            self.outbox_lease_seconds = int(os.environ.get("OUTBOX_LEASE_SECONDS", 300))
+            self.outbox_max_attempts = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 4))
+            # ids of the users allowed to send the weekly summary to every user
+            self.admin_users = {
+                user_id
+                for user_id in os.environ.get("ADMIN_USERS", "").split(",")
+                if user_id
+            }
+            # last, so that a Config that failed to load is loaded again
+            self.initialized = True
+
+    def server_workers(self) -> int:
+        """Processes the API runs in with the configured server profile."""
+        if self.server_profile == "dev":
+            return 1
+        return self.web_workers or cpu_count()
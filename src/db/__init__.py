@@ -1,12 +1,85 @@
 #!/usr/bin/env python
 # -*- encoding=utf8 -*-
+import asyncio
 import os
+import weakref
 
-from pymongo import ASCENDING, MongoClient
-from testcontainers.mongodb import MongoDbContainer
+from pymongo import ASCENDING, AsyncMongoClient, IndexModel, MongoClient
 
 from src.config import Config
 
+# Indexes derived from the query shapes of the services:
+# - blocklist: list by user_id, upsert by (user_id, domain, list_type)
+# - user: lookup by email at login, scan of email-notification subscribers
+# - focus_timer: every query filters by user_id and session_status, most of
+#   them also by a start_at range or sort by start_at
+# - focus_daily_rollup: upsert by (user_id, day, session_type), day ranges
+#   of a user, and the day range of every user for the weekly summary
+# - email_outbox: upsert and lookup by (week, user_id), claims of the oldest
+#   entries by status, and the count of the entries of a week per status
+INDEXES = {
+    "blocklist": [
+        IndexModel(
+            [("user_id", ASCENDING), ("domain", ASCENDING), ("list_type", ASCENDING)],
+            unique=True,
+        ),
+    ],
+    "user": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("notification.email_notification", ASCENDING)]),
+    ],
+    "focus_timer": [
+        IndexModel(
+            [
+                ("user_id", ASCENDING),
+                ("session_status", ASCENDING),
+                ("start_at", ASCENDING),
+            ]
+        ),
+    ],
+    "focus_daily_rollup": [
+        IndexModel(
+            [("user_id", ASCENDING), ("day", ASCENDING), ("session_type", ASCENDING)],
+            unique=True,
+        ),
+        IndexModel([("day", ASCENDING)]),
+    ],
+    "email_outbox": [
+        IndexModel([("week", ASCENDING), ("user_id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+    ],
+}
+
+
+def duplicate_keys(collection, index: IndexModel, limit: int = 5) -> list:
+    """Up to limit key values of index shared by several documents."""
+    keys = list(index.document["key"])
+    pipeline = [
+        {"$group": {"_id": {key: f"${key}" for key in keys}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit},
+    ]
+    return [group["_id"] for group in collection.aggregate(pipeline)]
+
+
+def unbuildable_indexes(db) -> list:
+    """
+    (collection name, index name, duplicate keys) of the unique indexes of
+    INDEXES that do not exist yet and that the documents would violate.
+    """
+    unbuildable = []
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        existing = collection.index_information()
+        for index in indexes:
+            name = index.document["name"]
+            if not index.document.get("unique") or name in existing:
+                continue
+            duplicates = duplicate_keys(collection, index)
+            if duplicates:
+                unbuildable.append((collection_name, name, duplicates))
+    return unbuildable
+
 
 class MongoDB:
     """class to encapsulate the MongoDB connection."""
@@ -19,8 +92,12 @@ class MongoDB:
             cls._instance = super(MongoDB, cls).__new__(cls)
             cls._instance.cfg = cfg
             if os.getenv("ENV") == "test":
+                # docker client and all, only needed by the tests
+                from testcontainers.mongodb import MongoDbContainer
+
                 mongo = MongoDbContainer("mongo:latest")
                 mongo.start()
+                cls._instance.container = mongo
                 cls._instance.client = mongo.get_connection_client()
             else:
                 if cls._instance.cfg.db_uri != "":
@@ -36,41 +113,84 @@ class MongoDB:
                         connectTimeoutMS=3000,
                     )
             cls._instance.db = cls._instance.client[cls._instance.cfg.db]
-            cls._instance._init_index(
-                "blocklist",
-                [
-                    ("user_id", ASCENDING),
-                    ("domain", ASCENDING),
-                    ("list_type", ASCENDING),
-                ],
-            )
-            cls._instance._init_index(
-                "user",
-                [
-                    ("user_id", ASCENDING),
-                ],
-            )
-            cls._instance._init_index(
-                "focus_timer",
-                [
-                    ("user_id", ASCENDING),
-                    ("session_status", ASCENDING),
-                    ("start_date", ASCENDING),
-                    ("start_time", ASCENDING),
-                    ("duration", ASCENDING),
-                    ("break_duration", ASCENDING),
-                    ("session_type", ASCENDING),
-                    ("remaining_focus_time", ASCENDING),
-                    ("remaining_break_time", ASCENDING),
-                ],
-            )
+            if os.getenv("ENV") == "test":
+                # a fresh container, the indexes take no time to build
+                cls._instance.ensure_indexes()
         return cls._instance
 
-    def _init_index(self, collection_name, index):
-        self.db[collection_name].create_index(index, unique=True)
+    def ensure_indexes(self) -> list:
+        """
+        Create the indexes of INDEXES that do not exist yet, but the unique
+        ones the documents would violate, which are returned like
+        unbuildable_indexes returns them.
+        """
+        skipped = unbuildable_indexes(self.db)
+        names = {(collection_name, name) for collection_name, name, _ in skipped}
+        for collection_name, indexes in INDEXES.items():
+            indexes = [
+                index
+                for index in indexes
+                if (collection_name, index.document["name"]) not in names
+            ]
+            if indexes:
+                self.db[collection_name].create_indexes(indexes)
+        return skipped
 
     def get_collection(self, collection_name):
         return self.db[collection_name]
 
     def close(self):
         self.client.close()
+
+
+class AsyncMongoDB:
+    """class to encapsulate the asynchronous MongoDB connection.
+
+    An AsyncMongoClient is bound to the event loop it is first used on, so one
+    client is kept per running loop (a single one per uvicorn worker).
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AsyncMongoDB, cls).__new__(cls)
+            cls._instance.cfg = Config()
+            cls._instance._clients = weakref.WeakKeyDictionary()
+        return cls._instance
+
+    def _new_client(self):
+        if os.getenv("ENV") == "test":
+            return AsyncMongoClient(MongoDB().container.get_connection_url())
+        if self.cfg.db_uri != "":
+            return AsyncMongoClient(self.cfg.db_uri)
+        return AsyncMongoClient(
+            self.cfg.db_host,
+            self.cfg.db_port,
+            username=self.cfg.db_user_name,
+            password=self.cfg.db_password,
+            timeoutMS=2000,
+            socketTimeoutMS=2000,
+            connectTimeoutMS=3000,
+        )
+
+    @property
+    def client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._new_client()
+            self._clients[loop] = client
+        return client
+
+    @property
+    def db(self):
+        return self.client[self.cfg.db]
+
+    def get_collection(self, collection_name):
+        return self.db[collection_name]
+
+    async def close(self):
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
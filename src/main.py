@@ -2,7 +2,7 @@
 # -*- encoding=utf8 -*-
 
 import sys
-import debugpy
+from importlib.util import find_spec
 
 sys.path.append(".")
 
@@ -10,11 +10,41 @@ import uvicorn
 
 from src.config import Config
 
-if __name__ == "__main__":
-    
-    debugpy.listen(("0.0.0.0", 5678))  # Ensure it's listening
-    print("Waiting for debugger to attach...")
+APP = "src.rest:app"
+
+
+def server_options(cfg: Config) -> dict:
+    """uvicorn.run keyword arguments of the configured server profile."""
+    options = {"host": cfg.app_host, "port": cfg.app_port}
+    if cfg.server_profile == "dev":
+        return {**options, "reload": True}
+    workers = cfg.server_workers()
+    if workers > 1 and not cfg.analytics_cache_redis_url:
+        # their caches could not see each other's writes, see AnalyticsCache
+        print(
+            f"Warning: {workers} workers without ANALYTICS_CACHE_REDIS_URL, "
+            "the analytics cache is bypassed"
+        )
+    return {
+        **options,
+        "workers": workers,
+        # the C implementations when installed, they are not on every platform
+        "loop": "uvloop" if find_spec("uvloop") else "asyncio",
+        "http": "httptools" if find_spec("httptools") else "h11",
+        "timeout_keep_alive": cfg.keep_alive,
+        "backlog": cfg.backlog,
+        # on SIGTERM stop accepting, then wait for the in-flight requests
+        "timeout_graceful_shutdown": cfg.graceful_timeout,
+    }
 
+
+if __name__ == "__main__":
     cfg = Config()
-    print(f"Starting server at {cfg.app_host}:{cfg.app_port}")
-    uvicorn.run("rest:app", host=cfg.app_host, port=cfg.app_port, reload=True)
+    options = server_options(cfg)
+    if cfg.server_profile == "dev":
+        import debugpy
+
+        debugpy.listen(("0.0.0.0", cfg.debug_port))
+        print(f"Debugger listening on port {cfg.debug_port}")
+    print(f"Starting {cfg.server_profile} server at {cfg.app_host}:{cfg.app_port}")
+    uvicorn.run(APP, **options)
@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+
+
+class Metrics:
+    """process-wide registry of runtime statistics served by GET /metrics."""
+
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(Metrics, cls).__new__(cls)
+            cls._instance._sources = {}
+        return cls._instance
+
+    def register(self, name: str, source):
+        """Register a callable returning a JSON-serializable dict under name."""
+        self._sources[name] = source
+
+    def snapshot(self) -> dict:
+        return {name: source() for name, source in self._sources.items()}
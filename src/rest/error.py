@@ -2,47 +2,43 @@
 # -*- encoding=utf8 -*-
 
 
-BLOCKLIST_NOT_FOUND = {
-    "code": 10009,
-    "message": "No blocklist found"
-}
+BLOCKLIST_NOT_FOUND = {"code": 10009, "message": "No blocklist found"}
 
-BLOCKLIST_IS_INVALID = {
-    "code": 10006,
-    "message": "Blocklist is invalid"
-}
+BLOCKLIST_IS_INVALID = {"code": 10006, "message": "Blocklist is invalid"}
 
-BLOCKLIST_ID_INVALID = {
-    "code": 10007,
-    "message": "Blocklist id is invalid"
-}
+BLOCKLIST_ID_INVALID = {"code": 10007, "message": "Blocklist id is invalid"}
 
-BLOCKLIST_ALREADY_EXISTS = {
-    "code": 10008,
-    "message": "Blocklist already exists"
-}
+BLOCKLIST_ALREADY_EXISTS = {"code": 10008, "message": "Blocklist already exists"}
 
-INVALID_TOKEN = {
-    "code": 10010,
-    "message": "Invalid token"
-}
+INVALID_TOKEN = {"code": 10010, "message": "Invalid token"}
 
 FOCUSSESSION_CONFLICT = {
     "code": 10011,
-    "message": "Focus session conflict with upcoming sessions"
+    "message": "Focus session conflict with upcoming sessions",
 }
 
-FOCUSSESSION_NOT_UPDATED = {
-    "code": 10012,
-    "message": "Focus session not updated"
-}
+FOCUSSESSION_NOT_UPDATED = {"code": 10012, "message": "Focus session not updated"}
+
+FOCUSSESSION_NOT_FOUND = {"code": 10013, "message": "Focus session not found"}
 
-FOCUSSESSION_NOT_FOUND = {
-    "code": 10013,
-    "message": "Focus session not found"
+USERSTATUS_NOT_UPDATED = {"code": 10014, "message": "User status not updated"}
+
+SERVICE_OVERLOADED = {"code": 10015, "message": "Service overloaded, retry later"}
+
+FOCUSSESSION_BATCH_INVALID = {
+    "code": 10016,
+    "message": "Focus session batch is invalid",
 }
 
-USERSTATUS_NOT_UPDATED = {
-    "code": 10014,
-    "message": "User status not updated"
+ANALYTICS_RANGE_INVALID = {"code": 10017, "message": "Analytics date range is invalid"}
+
+ADMIN_REQUIRED = {"code": 10018, "message": "Only admins can do this"}
+
+SUMMARY_JOB_NOT_FOUND = {"code": 10019, "message": "Weekly summary job not found"}
+
+WEEKLY_CHART_NOT_FOUND = {"code": 10020, "message": "No focus sessions that week"}
+
+GOOGLE_UNAVAILABLE = {
+    "code": 10021,
+    "message": "Google sign-in is unavailable, retry later",
 }
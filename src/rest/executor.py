@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+
+import asyncio
+import inspect
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.config import Config
+from src.metrics import Metrics
+
+
+class ServiceOverloadedError(Exception):
+    """Raised when the service executor queue is full."""
+
+
+class _MethodStats:
+    def __init__(self):
+        self.queued = 0
+        self.calls = 0
+        self.rejected = 0
+        self.wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.run_ms = 0.0
+        self.max_run_ms = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "queued": self.queued,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_ms / self.calls, 3) if self.calls else 0,
+            "max_wait_ms": round(self.max_wait_ms, 3),
+            "avg_run_ms": round(self.run_ms / self.calls, 3) if self.calls else 0,
+            "max_run_ms": round(self.max_run_ms, 3),
+        }
+
+
+class ServiceExecutor:
+    """
+    class to run blocking service calls on a dedicated, bounded thread pool.
+
+    At most offload_workers calls run at once and at most offload_queue_size
+    more wait for a thread; anything beyond that is rejected immediately with
+    ServiceOverloadedError instead of piling up behind the event loop.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cfg = Config()
+            cls._instance = super(ServiceExecutor, cls).__new__(cls)
+            cls._instance._pool = ThreadPoolExecutor(
+                max_workers=cfg.offload_workers, thread_name_prefix="service"
+            )
+            cls._instance._max_pending = cfg.offload_workers + cfg.offload_queue_size
+            cls._instance._pending = 0
+            cls._instance._lock = threading.Lock()
+            cls._instance._stats = defaultdict(_MethodStats)
+            Metrics().register("service_executor", cls._instance.stats)
+        return cls._instance
+
+    async def run(self, name: str, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool and await its result."""
+        stats = self._stats[name]
+        with self._lock:
+            if self._pending >= self._max_pending:
+                stats.rejected += 1
+                raise ServiceOverloadedError(name)
+            self._pending += 1
+            stats.queued += 1
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            with self._lock:
+                stats.queued -= 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    wait_ms = (started - submitted) * 1000
+                    run_ms = (finished - started) * 1000
+                    stats.calls += 1
+                    stats.wait_ms += wait_ms
+                    stats.run_ms += run_ms
+                    stats.max_wait_ms = max(stats.max_wait_ms, wait_ms)
+                    stats.max_run_ms = max(stats.max_run_ms, run_ms)
+
+        future = self._pool.submit(job)
+        future.add_done_callback(lambda f: self._release(stats, f))
+        return await asyncio.wrap_future(future)
+
+    def _release(self, stats: _MethodStats, future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                stats.queued -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "capacity": self._max_pending,
+                "methods": {name: s.as_dict() for name, s in self._stats.items()},
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+class OffloadedService:
+    """
+    class exposing a synchronous service with the interface of its Async*
+    counterpart: every method that is a coroutine on async_cls becomes a
+    coroutine running the synchronous method on the ServiceExecutor, all other
+    attributes are passed through unchanged.
+    """
+
+    def __init__(self, service, async_cls, executor: ServiceExecutor):
+        self._service = service
+        self._async_cls = async_cls
+        self._executor = executor
+
+    def __getattr__(self, name):
+        attr = getattr(self._service, name)
+        if not inspect.iscoroutinefunction(getattr(self._async_cls, name, None)):
+            return attr
+        label = f"{type(self._service).__name__}.{name}"
+
+        async def call(*args, **kwargs):
+            return await self._executor.run(label, attr, *args, **kwargs)
+
+        return call
@@ -1,29 +1,37 @@
 #!/usr/bin/env python
 # -*- encoding=utf8 -*-
+import asyncio
 import os
 import random
 import re
 import string
-from datetime import datetime
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
 from typing import Annotated, Optional
 
 from bson import ObjectId
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     FastAPI,
     Header,
     HTTPException,
     Query,
+    Request,
     Response,
     status,
 )
+from fastapi.responses import JSONResponse
 
 from src.api import (
     AddBlockListRequest,
+    AddFocusSessionBatchRequest,
+    AddFocusSessionBatchResponse,
+    AnalyticsGranularity,
     AnalyticsListResponse,
+    AnalyticsSeriesResponse,
     EditBlockListResponse,
     EditFocusSessionResponse,
+    FocusSessionBatchItem,
     FocusSessionModel,
     GetAllFocusSessionResponse,
     GetNextFocusSessionResponse,
@@ -35,26 +43,55 @@ from src.api import (
     ResponseStatus,
     UpdateUserStatusRequest,
     UpdateUserStatusResponse,
+    WeeklySummaryJobRequest,
+    WeeklySummaryJobResponse,
+    WeeklySummaryScope,
 )
 from src.config import Config, api_version
+from src.db import AsyncMongoDB, MongoDB
 from src.rest.error import (
+    ADMIN_REQUIRED,
+    ANALYTICS_RANGE_INVALID,
     BLOCKLIST_ALREADY_EXISTS,
     BLOCKLIST_ID_INVALID,
     BLOCKLIST_IS_INVALID,
     BLOCKLIST_NOT_FOUND,
+    FOCUSSESSION_BATCH_INVALID,
     FOCUSSESSION_CONFLICT,
     FOCUSSESSION_NOT_FOUND,
     FOCUSSESSION_NOT_UPDATED,
+    GOOGLE_UNAVAILABLE,
     INVALID_TOKEN,
+    SERVICE_OVERLOADED,
+    SUMMARY_JOB_NOT_FOUND,
+    WEEKLY_CHART_NOT_FOUND,
     USERSTATUS_NOT_UPDATED,
 )
+from src.metrics import Metrics
+from src.rest.executor import (
+    OffloadedService,
+    ServiceExecutor,
+    ServiceOverloadedError,
+)
 from src.service import (
     AnalyticsListService,
+    AsyncAnalyticsListService,
+    AsyncBlockListService,
+    AsyncFocusTimerService,
+    AsyncNotificationService,
     BlockListService,
     FocusTimerService,
     NotificationService,
 )
-from src.service.user import UserService
+from src.service.focustimer import (
+    BATCH_REQUIRED_FIELDS,
+    MAX_BATCH_SESSIONS,
+    recurring_sessions,
+)
+from src.service.google import GoogleUnavailableError, GoogleUserInfoClient
+from src.service.notification import WEEK_FORMAT, summary_week
+from src.service.sessiontime import parse_date, session_window
+from src.service.user import AsyncUserService, TokenCache, UserService
 
 
 class BaseAPI:
@@ -62,16 +99,28 @@ class BaseAPI:
 
     def __init__(self, cfg: Config):
         self.cfg = cfg
-        self.user_service = UserService(cfg)
+        self.user_service = self._service(UserService, AsyncUserService)
+        self.token_cache = TokenCache()
         self.router = APIRouter()
 
+    def _service(self, service_cls, async_service_cls):
+        """Create the service used by the handlers for the configured mode."""
+        if self.cfg.service_mode == "offload":
+            return OffloadedService(
+                service_cls(self.cfg), async_service_cls, ServiceExecutor()
+            )
+        return async_service_cls(self.cfg)
+
     def validate_token(self, token: str) -> (str, bool):
         """Validate the token."""
         if token is None:
             return "", False
-        user = self.user_service.decode_user(token)
-        if user.user_id == "":
-            return "", False
+        user = self.token_cache.get(token)
+        if user is None:
+            user = self.user_service.decode_user(token)
+            if user.user_id == "":
+                return "", False
+            self.token_cache.put(token, user)
         return user.user_id, True
 
 
@@ -80,7 +129,7 @@ class BlockListAPI(BaseAPI):
 
     def __init__(self, cfg: Config):
         super().__init__(cfg)
-        self.blocklist_service = BlockListService(cfg)
+        self.blocklist_service = self._service(BlockListService, AsyncBlockListService)
         self._register_routes()
 
     def _register_routes(self):
@@ -114,7 +163,7 @@ class BlockListAPI(BaseAPI):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
             )
-        response = self.blocklist_service.list_blocklist(user_id)
+        response = await self.blocklist_service.list_blocklist(user_id)
         return ListBlockListResponse(blocklist=response, status=ResponseStatus.SUCCESS)
 
     async def add_blocklist(
@@ -132,7 +181,7 @@ class BlockListAPI(BaseAPI):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
             )
-        new_id, ok = self.blocklist_service.add_blocklist(
+        new_id, ok = await self.blocklist_service.add_blocklist(
             user_id, request.domain, request.list_type
         )
         if not ok:
@@ -160,7 +209,7 @@ class BlockListAPI(BaseAPI):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
             )
-        ok = self.blocklist_service.delete_blocklist(user_id, blocklist_id)
+        ok = await self.blocklist_service.delete_blocklist(user_id, blocklist_id)
         if not ok:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail=BLOCKLIST_NOT_FOUND
@@ -210,7 +259,7 @@ class UserAPI(BaseAPI):
                 return "".join(random.choices(alphabet, k=8))
 
             test_user_email = f"focusbuddy.test+{random_choice()}@gmail.com"
-            test_user_id = self.user_service._get_user_id_from_db(test_user_email)
+            test_user_id = await self.user_service._get_user_id_from_db(test_user_email)
             jwt = self.user_service._generate_jwt(test_user_id, test_user_email)
             return GetUserAppTokenResponse(jwt=jwt, email=test_user_email, picture="")
 
@@ -221,7 +270,7 @@ class UserAPI(BaseAPI):
                 status_code=status.HTTP_400_BAD_REQUEST, detail=INVALID_TOKEN
             )
 
-        user = self.user_service.get_user_app_token(token)
+        user = await self.user_service.get_user_app_token(token)
         if user.jwt == "":
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
@@ -241,7 +290,7 @@ class UserAPI(BaseAPI):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
             )
-        ok = self.user_service.update_user_status(user_id, request.user_status)
+        ok = await self.user_service.update_user_status(user_id, request.user_status)
         if not ok:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -259,7 +308,9 @@ class NotificationAPI(BaseAPI):
 
     def __init__(self, cfg: Config):
         super().__init__(cfg)
-        self.notification_service = NotificationService(cfg)
+        self.notification_service = self._service(
+            NotificationService, AsyncNotificationService
+        )
         self._register_routes()
 
     def _register_routes(self):
@@ -282,7 +333,17 @@ class NotificationAPI(BaseAPI):
             path="/user/send_weekly_summary",
             endpoint=self.send_weekly_summary,
             methods=["POST"],
-            summary="Send weekly summary of focus sessions",
+            status_code=status.HTTP_202_ACCEPTED,
+            response_model=WeeklySummaryJobResponse,
+            summary="Queue a job sending the weekly summary of focus sessions",
+        )
+
+        self.router.add_api_route(
+            path="/user/weekly_summary_jobs/{job_id}",
+            endpoint=self.get_weekly_summary_job,
+            methods=["GET"],
+            response_model=WeeklySummaryJobResponse,
+            summary="Get the progress of a weekly summary job",
         )
 
     async def update_notification(
@@ -296,7 +357,7 @@ class NotificationAPI(BaseAPI):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
             )
-        response = self.notification_service.update_notification(
+        response = await self.notification_service.update_notification(
             user_id=user_id, notification_type=data.type, enabled=data.enabled
         )
         return response
@@ -311,33 +372,61 @@ class NotificationAPI(BaseAPI):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
             )
-        response = self.notification_service.get_notification(user_id=user_id)
+        response = await self.notification_service.get_notification(user_id=user_id)
         return response
 
     async def send_weekly_summary(
         self,
         x_auth_token: Annotated[str, Header()] = None,
-        background_tasks: BackgroundTasks = None,
+        data: WeeklySummaryJobRequest = None,
     ):
-        """Generate a summary of weekly activities and send an email to the user"""
+        """
+        Queue a job sending the weekly summary email to the user, or to every
+        user for an admin, and return it right away. The job runs on the
+        Celery workers, its progress is at /user/weekly_summary_jobs/{job_id}.
+        """
         user_id, ok = self.validate_token(x_auth_token)
         if not ok:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
             )
+        data = data or WeeklySummaryJobRequest()
+        if data.scope == WeeklySummaryScope.ALL:
+            if user_id not in self.cfg.admin_users:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN, detail=ADMIN_REQUIRED
+                )
+            user_ids = None
+        else:
+            user_ids = [user_id]
 
-        summaries = self.notification_service.aggregate_weekly_summary()
+        job = await self.notification_service.create_summary_job(user_id, user_ids)
+        # celery and its broker client are only imported once a job is sent
+        from src.service.celery import weekly_summary_task
 
-        for summary in summaries:
-            background_tasks.add_task(
-                self.notification_service.send_email,
-                summary["email"],
-                summary["chart_b64"],
-                summary["max_day"],
-                summary["summary_text"],
-            )
+        # publishing to the broker is a blocking call
+        await asyncio.to_thread(weekly_summary_task.delay, job["job_id"])
+        return WeeklySummaryJobResponse(**job)
 
-        return {"status": "Weekly summary emails queued for sending"}
+    async def get_weekly_summary_job(
+        self,
+        job_id: str,
+        x_auth_token: Annotated[str, Header()] = None,
+    ):
+        """Get the progress of a weekly summary job of the user, or any for an admin."""
+        user_id, ok = self.validate_token(x_auth_token)
+        if not ok:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
+            )
+        job = await self.notification_service.get_summary_job(job_id)
+        if job is None or (
+            job["requested_by"] != user_id and user_id not in self.cfg.admin_users
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=SUMMARY_JOB_NOT_FOUND
+            )
+        return WeeklySummaryJobResponse(**job)
 
 
 class AnalyticsListAPI(BaseAPI):
@@ -346,7 +435,12 @@ class AnalyticsListAPI(BaseAPI):
     def __init__(self, cfg: Config):
         super().__init__(cfg)
         self.router = APIRouter()
-        self.analyticslist_service = AnalyticsListService(cfg)
+        self.analyticslist_service = self._service(
+            AnalyticsListService, AsyncAnalyticsListService
+        )
+        self.notification_service = self._service(
+            NotificationService, AsyncNotificationService
+        )
         self._register_routes()
 
     def _register_routes(self):
@@ -367,6 +461,22 @@ class AnalyticsListAPI(BaseAPI):
             summary="List all analytics for user per session type",
         )
 
+        self.router.add_api_route(
+            path="/analytics/series",
+            endpoint=self.list_analytics_series,
+            methods=["GET"],
+            response_model=AnalyticsSeriesResponse,
+            summary="List focused time per day, week or month of any date range",
+        )
+
+        self.router.add_api_route(
+            path="/analytics/weeklychart",
+            endpoint=self.get_weekly_chart,
+            methods=["GET"],
+            response_class=Response,
+            summary="Get the chart of focused time per day and session type of a week",
+        )
+
     async def list_analytics(self, x_auth_token: Annotated[str, Header()] = None):
         """List all analytics for user."""
         user_id, ok = self.validate_token(x_auth_token)
@@ -374,7 +484,7 @@ class AnalyticsListAPI(BaseAPI):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
             )
-        response = self.analyticslist_service.get_analytics(user_id)
+        response = await self.analyticslist_service.get_analytics(user_id)
         return response
 
     async def list_analytics_weekly_per_session_type(
@@ -401,7 +511,8 @@ class AnalyticsListAPI(BaseAPI):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
             )
-        response = self.analyticslist_service.get_weekly_analytics_per_session_type(
+        service = self.analyticslist_service
+        response = await service.get_weekly_analytics_per_session_type(
             user_id=user_id,
             start_date=start_date,
             end_date=end_date,
@@ -410,13 +521,93 @@ class AnalyticsListAPI(BaseAPI):
             summary=response, status=ResponseStatus.SUCCESS
         )
 
+    async def list_analytics_series(
+        self,
+        start_date: str = Query(description="Start date (MM/DD/YYYY)"),
+        end_date: str = Query(description="End date (MM/DD/YYYY)"),
+        granularity: AnalyticsGranularity = AnalyticsGranularity.DAY,
+        group_by_session_type: bool = False,
+        x_auth_token: Annotated[str, Header()] = None,
+    ):
+        """List focused time per day, week or month of any date range."""
+        user_id, ok = self.validate_token(x_auth_token)
+        if not ok:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
+            )
+        try:
+            valid = parse_date(start_date) <= parse_date(end_date)
+        except ValueError:
+            valid = False
+        if not valid:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=ANALYTICS_RANGE_INVALID,
+            )
+        series = await self.analyticslist_service.get_analytics_series(
+            user_id, start_date, end_date, granularity, group_by_session_type
+        )
+        return AnalyticsSeriesResponse(
+            granularity=granularity, series=series, status=ResponseStatus.SUCCESS
+        )
+
+    async def get_weekly_chart(
+        self,
+        week: Optional[str] = Query(
+            None,
+            description="A day of the week (YYYY-MM-DD), last full week by default",
+        ),
+        x_auth_token: Annotated[str, Header()] = None,
+        if_none_match: Annotated[Optional[str], Header()] = None,
+    ):
+        """
+        Get the chart of the Monday to Sunday week of the user, from the chart
+        cache. Its content hash is its ETag, so an unchanged chart is answered
+        with 304; a past week's chart can be cached for a day.
+        """
+        user_id, ok = self.validate_token(x_auth_token)
+        if not ok:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
+            )
+        if week is not None:
+            try:
+                day = datetime.strptime(week, WEEK_FORMAT)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=ANALYTICS_RANGE_INVALID,
+                )
+            # charts are kept per week, under the Sunday ending it
+            week = (day + timedelta(days=6 - day.weekday())).strftime(WEEK_FORMAT)
+        chart = await self.notification_service.weekly_chart(user_id, week)
+        if chart is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=WEEKLY_CHART_NOT_FOUND
+            )
+        chart_id = chart["chart_id"]
+        etag = f'"{chart_id}"'
+        past = week is None or week <= summary_week()
+        headers = {
+            "ETag": etag,
+            # the week in progress is revalidated every time
+            "Cache-Control": "private, max-age=86400" if past else "private, no-cache",
+        }
+        if if_none_match and etag in (
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        ):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(
+            content=chart["chart"], media_type=chart["content_type"], headers=headers
+        )
+
 
 class FocusTimerAPI(BaseAPI):
     """class to encapsulate the focustimer API endpoints."""
 
     def __init__(self, cfg: Config):
         super().__init__(cfg)
-        self.timer_service = FocusTimerService(cfg)
+        self.timer_service = self._service(FocusTimerService, AsyncFocusTimerService)
         self._register_routes()
 
     def _register_routes(self):
@@ -427,6 +618,12 @@ class FocusTimerAPI(BaseAPI):
             methods=["POST"],
             summary="Add a focus session",
         )
+        self.router.add_api_route(
+            path="/focustimer/batch",
+            endpoint=self.add_focus_sessions,
+            methods=["POST"],
+            summary="Add many focus sessions, or a recurring one, at once",
+        )
         self.router.add_api_route(
             path="/focustimer/{session_id}",
             endpoint=self.modify_focus_session,
@@ -461,7 +658,7 @@ class FocusTimerAPI(BaseAPI):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
             )
-        session_id, ok = self.timer_service.add_focus_session(
+        session_id, ok = await self.timer_service.add_focus_session(
             user_id,
             request.session_status,
             request.start_date,
@@ -480,6 +677,73 @@ class FocusTimerAPI(BaseAPI):
             user_id=user_id, id=session_id, status=ResponseStatus.SUCCESS
         )
 
+    @staticmethod
+    def _batch_sessions(request: AddFocusSessionBatchRequest) -> list[dict]:
+        """Expand the batch into session dicts, None when it is invalid."""
+        sessions = [session.model_dump() for session in request.sessions]
+        recurrence = request.recurrence
+        if recurrence is not None:
+            if recurrence.count is None and recurrence.until is None:
+                return None
+            try:
+                sessions += recurring_sessions(
+                    recurrence.session.model_dump(),
+                    recurrence.frequency,
+                    recurrence.count,
+                    recurrence.until,
+                    limit=MAX_BATCH_SESSIONS + 1,
+                )
+            except (TypeError, ValueError):
+                return None
+        if not sessions or len(sessions) > MAX_BATCH_SESSIONS:
+            return None
+        for session in sessions:
+            if any(session[field] is None for field in BATCH_REQUIRED_FIELDS):
+                return None
+            try:
+                session_window(
+                    session["start_date"],
+                    session["start_time"],
+                    session["duration"],
+                    session["break_duration"],
+                )
+            except (TypeError, ValueError):
+                return None
+        return sessions
+
+    async def add_focus_sessions(
+        self,
+        request: AddFocusSessionBatchRequest,
+        x_auth_token: Annotated[str, Header()] = None,
+    ):
+        """Add many focus sessions, conflicting ones are reported and skipped."""
+        user_id, ok = self.validate_token(x_auth_token)
+        if not ok:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
+            )
+        sessions = self._batch_sessions(request)
+        if sessions is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=FOCUSSESSION_BATCH_INVALID,
+            )
+        results = await self.timer_service.add_focus_sessions(user_id, sessions)
+        items = [
+            FocusSessionBatchItem(
+                start_date=session["start_date"],
+                start_time=session["start_time"],
+                id=session_id or None,
+                conflict=not ok,
+            )
+            for session, (session_id, ok) in zip(sessions, results)
+        ]
+        return AddFocusSessionBatchResponse(
+            items=items,
+            created=sum(1 for item in items if not item.conflict),
+            status=ResponseStatus.SUCCESS,
+        )
+
     async def modify_focus_session(
         self,
         session_id: str,
@@ -499,7 +763,9 @@ class FocusTimerAPI(BaseAPI):
                 status_code=status.HTTP_400_BAD_REQUEST, detail=FOCUSSESSION_NOT_UPDATED
             )
 
-        result = self.timer_service.modify_focus_session(user_id, session_id, **updates)
+        result = await self.timer_service.modify_focus_session(
+            user_id, session_id, **updates
+        )
 
         if result == "conflict":
             raise HTTPException(
@@ -523,7 +789,7 @@ class FocusTimerAPI(BaseAPI):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
             )
-        ok = self.timer_service.delete_focus_session(user_id, session_id)
+        ok = await self.timer_service.delete_focus_session(user_id, session_id)
         if not ok:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail=FOCUSSESSION_NOT_FOUND
@@ -539,7 +805,7 @@ class FocusTimerAPI(BaseAPI):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
             )
-        response = self.timer_service.get_next_focus_session(user_id)
+        response = await self.timer_service.get_next_focus_session(user_id)
         return GetNextFocusSessionResponse(
             focus_session=response, status=ResponseStatus.SUCCESS
         )
@@ -555,14 +821,92 @@ class FocusTimerAPI(BaseAPI):
             )
         if session_status:
             session_status = [int(status) for status in session_status.split(",")]
-        response = self.timer_service.get_all_focus_session(user_id, session_status)
+        response = await self.timer_service.get_all_focus_session(
+            user_id, session_status
+        )
         return GetAllFocusSessionResponse(
             focus_sessions=response, status=ResponseStatus.SUCCESS
         )
 
 
+class MetricsAPI(BaseAPI):
+    """class to encapsulate the runtime metrics endpoint."""
+
+    def __init__(self, cfg: Config):
+        super().__init__(cfg)
+        self._register_routes()
+
+    def _register_routes(self):
+        """Register API routes."""
+        self.router.add_api_route(
+            path="/metrics",
+            endpoint=self.list_metrics,
+            methods=["GET"],
+            summary="List runtime metrics of this worker",
+        )
+
+    async def list_metrics(self):
+        """List runtime metrics of this worker."""
+        return Metrics().snapshot()
+
+
+async def service_overloaded_handler(request: Request, exc: ServiceOverloadedError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": SERVICE_OVERLOADED},
+        headers={"Retry-After": "1"},
+    )
+
+
+async def google_unavailable_handler(request: Request, exc: GoogleUnavailableError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": GOOGLE_UNAVAILABLE},
+        headers={"Retry-After": "5"},
+    )
+
+
+def ensure_indexes():
+    """Build the missing indexes, reporting the ones that could not be."""
+    try:
+        skipped = MongoDB().ensure_indexes()
+    except Exception as e:
+        # nothing awaits the background task, so it would be lost otherwise
+        print(f"Index creation failed: {e}")
+        return
+    for collection_name, name, duplicates in skipped:
+        print(f"Index {collection_name}.{name} not built, duplicate keys: {duplicates}")
+
+
+def lifespan(cfg: Config):
+    """
+    Lifespan of the app, building the missing indexes in the background and
+    closing the MongoDB and google clients on shutdown.
+    """
+
+    @asynccontextmanager
+    async def _lifespan(_app: FastAPI):
+        task = None
+        if cfg.ensure_indexes:
+            # not awaited, the app serves while MongoDB builds them
+            task = asyncio.create_task(asyncio.to_thread(ensure_indexes))
+        yield
+        # uvicorn has drained the in-flight requests by now
+        if task is not None and not task.done():
+            task.cancel()
+        await AsyncMongoDB().close()
+        if GoogleUserInfoClient._instance is not None:
+            await GoogleUserInfoClient().close()
+        if MongoDB._instance is not None:
+            MongoDB().close()
+
+    return _lifespan
+
+
 def create_app(cfg: Config):
-    _app = FastAPI()
+    _app = FastAPI(lifespan=lifespan(cfg))
+    _app.add_exception_handler(ServiceOverloadedError, service_overloaded_handler)
+    _app.add_exception_handler(GoogleUnavailableError, google_unavailable_handler)
     blocklist_api = BlockListAPI(cfg)
     focustimer_api = FocusTimerAPI(cfg)
     _app.include_router(focustimer_api.router, prefix=api_version)
@@ -573,6 +917,8 @@ def create_app(cfg: Config):
     _app.include_router(user_api.router, prefix=api_version)
     notification_api = NotificationAPI(cfg)
     _app.include_router(notification_api.router, prefix=api_version)
+    metrics_api = MetricsAPI(cfg)
+    _app.include_router(metrics_api.router, prefix=api_version)
     return _app
 
 
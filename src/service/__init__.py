@@ -1,8 +1,7 @@
 #!/usr/bin/env python
 # -*- encoding=utf8 -*-
 
-from .analytics import AnalyticsListService
-from .blocklist import BlockListService
-from .celery import celery_app
-from .focustimer import FocusTimerService
-from .notification import NotificationService
+from .analytics import AnalyticsListService, AsyncAnalyticsListService
+from .blocklist import AsyncBlockListService, BlockListService
+from .focustimer import AsyncFocusTimerService, FocusTimerService
+from .notification import AsyncNotificationService, NotificationService
@@ -1,16 +1,34 @@
 #!/usr/bin/env python
 # -*- encoding=utf8 -*-
 
+import asyncio
+import threading
+import time
+import weakref
 from datetime import datetime, timedelta
-from zoneinfo import ZoneInfo
+
+import redis
+import redis.asyncio
+from pydantic import TypeAdapter
 
 from src.api import (
+    AnalyticsGranularity,
     AnalyticsListResponse,
+    AnalyticsSeriesPoint,
     AnalyticsWeeklySummaryResponse,
     ResponseStatus,
 )
 from src.config import Config
-from src.db import MongoDB
+from src.db import AsyncMongoDB, MongoDB
+from src.metrics import Metrics
+from src.service.cache import LRUCache
+from src.service.rollup import ROLLUP_COLLECTION
+from src.service.sessiontime import DATE_FORMAT, LOCAL_TZ, local_today, parse_date
+
+ANALYTICS = TypeAdapter(AnalyticsListResponse)
+WEEKLY_SUMMARY = TypeAdapter(list[AnalyticsWeeklySummaryResponse])
+SERIES = TypeAdapter(list[AnalyticsSeriesPoint])
+DAY_MS = 24 * 3600 * 1000
 
 
 def _convert_to_hours(time_in_seconds):
@@ -18,182 +36,603 @@ def _convert_to_hours(time_in_seconds):
     return round(time_in_seconds / 3600, 2)
 
 
+def _focus_total_stages(start: datetime, end: datetime) -> list:
+    """stages summing the focused time of the rollup days in [start, end)"""
+    return [
+        {"$match": {"day": {"$gte": start, "$lt": end}}},
+        {"$group": {"_id": None, "focus_seconds": {"$sum": "$focus_seconds"}}},
+    ]
+
+
+def _bucket_start(granularity: AnalyticsGranularity) -> dict:
+    """expression mapping a rollup day to the first day of its bucket"""
+    if granularity == AnalyticsGranularity.WEEK:
+        # weeks start on Sunday, $dayOfWeek is 1 on Sundays
+        days_into_week = {"$subtract": [{"$dayOfWeek": "$day"}, 1]}
+        return {"$subtract": ["$day", {"$multiply": [days_into_week, DAY_MS]}]}
+    if granularity == AnalyticsGranularity.MONTH:
+        return {
+            "$dateFromParts": {"year": {"$year": "$day"}, "month": {"$month": "$day"}}
+        }
+    return "$day"
+
+
+def _focus_total_hours(focus_total: list) -> float:
+    """converts the result of focus total stages to hours"""
+    if focus_total:
+        return _convert_to_hours(focus_total[0]["focus_seconds"])
+    return 0
+
+
+class AnalyticsCache(object):
+    """
+    class to cache analytics responses per user.
+
+    Responses are kept in a bounded in-process tier and, when
+    analytics_cache_redis_url is set, in a Redis tier shared by all workers.
+    Every key carries a per-user generation that is bumped as soon as the
+    user's completed sessions change, and entries expire at the next local
+    midnight at the latest, when the daily and weekly windows move on.
+
+    Without redis the generations only live in this process, so a write is
+    only seen by the worker that handled it: the cache is then bypassed
+    unless the API runs in a single process, and clear() from another, like the
+    rollup rebuild, does not reach the running API.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AnalyticsCache, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, "initialized"):
+            self.cfg = Config()
+            self.local = LRUCache(self.cfg.analytics_cache_size)
+            self.redis = None
+            if self.cfg.analytics_cache_redis_url:
+                self.redis = redis.Redis.from_url(
+                    self.cfg.analytics_cache_redis_url, socket_timeout=0.5
+                )
+            self._async_redis = weakref.WeakKeyDictionary()
+            # generations of the in-process tier, used without redis
+            self._epoch = 0
+            self._generations = {}
+            self._day = local_today()
+            self._lock = threading.Lock()
+            self.hits = 0
+            self.redis_hits = 0
+            self.misses = 0
+            self.computes = 0
+            self.compute_ms = 0.0
+            self.saved_ms = 0.0
+            Metrics().register("analytics_cache", self.stats)
+            self.initialized = True
+
+    @property
+    def enabled(self) -> bool:
+        """False in one of several workers that do not share redis."""
+        return self.redis is not None or self.cfg.server_workers() == 1
+
+    @property
+    def async_redis(self) -> redis.asyncio.Redis:
+        loop = asyncio.get_running_loop()
+        client = self._async_redis.get(loop)
+        if client is None:
+            client = redis.asyncio.Redis.from_url(
+                self.cfg.analytics_cache_redis_url, socket_timeout=0.5
+            )
+            self._async_redis[loop] = client
+        return client
+
+    def _roll_day(self):
+        """Drop the in-process tier once the local day is over."""
+        today = local_today()
+        if today != self._day:
+            with self._lock:
+                if today != self._day:
+                    self._day = today
+                    self._generations.clear()
+                    self.local.clear()
+
+    def _expires_at(self) -> float:
+        midnight = (self._day + timedelta(days=1)).replace(tzinfo=LOCAL_TZ)
+        return min(time.time() + self.cfg.analytics_cache_ttl, midnight.timestamp())
+
+    def _generation_keys(self, user_id: str) -> list:
+        return ["analytics:epoch", f"analytics:gen:{user_id}"]
+
+    def _key(self, user_id: str, generation, name: str, args: tuple) -> str:
+        epoch, user_generation = generation
+        arguments = ":".join(args)
+        return f"analytics:{user_id}:{epoch}.{user_generation}:{name}:{arguments}"
+
+    def _local_generation(self, user_id: str) -> tuple:
+        return self._epoch, self._generations.get(user_id, 0)
+
+    def _hit(self, from_redis: bool = False):
+        with self._lock:
+            self.hits += 1
+            self.redis_hits += from_redis
+            if self.computes:
+                self.saved_ms += self.compute_ms / self.computes
+
+    def _computed(self, started: float):
+        with self._lock:
+            self.misses += 1
+            self.computes += 1
+            self.compute_ms += (time.perf_counter() - started) * 1000
+
+    def fetch(
+        self,
+        user_id: str,
+        name: str,
+        args: tuple,
+        compute,
+        adapter: TypeAdapter,
+        cacheable=None,
+    ):
+        """Get the cached result of compute(), running and caching it on a miss."""
+        if not self.enabled:
+            return compute()
+        self._roll_day()
+        try:
+            if self.redis is None:
+                generation = self._local_generation(user_id)
+            else:
+                generations = self.redis.mget(self._generation_keys(user_id))
+                generation = tuple(int(g or 0) for g in generations)
+            key = self._key(user_id, generation, name, args)
+            value = self.local.get(key)
+            if value is None and self.redis is not None:
+                raw = self.redis.get(key)
+                if raw is not None:
+                    value = adapter.validate_json(raw)
+                    self.local.put(key, value, self._expires_at())
+                    self._hit(from_redis=True)
+                    return value
+        except redis.RedisError as e:
+            print(f"Analytics cache unavailable: {e}")
+            return compute()
+        if value is not None:
+            self._hit()
+            return value
+
+        started = time.perf_counter()
+        value = compute()
+        self._computed(started)
+        if cacheable is None or cacheable(value):
+            expires_at = self._expires_at()
+            self.local.put(key, value, expires_at)
+            if self.redis is not None:
+                try:
+                    self.redis.set(key, adapter.dump_json(value), exat=int(expires_at))
+                except redis.RedisError as e:
+                    print(f"Analytics cache unavailable: {e}")
+        return value
+
+    async def afetch(
+        self,
+        user_id: str,
+        name: str,
+        args: tuple,
+        compute,
+        adapter: TypeAdapter,
+        cacheable=None,
+    ):
+        """Same as fetch, for a compute returning a coroutine."""
+        if not self.enabled:
+            return await compute()
+        self._roll_day()
+        try:
+            if self.redis is None:
+                generation = self._local_generation(user_id)
+            else:
+                generations = await self.async_redis.mget(
+                    self._generation_keys(user_id)
+                )
+                generation = tuple(int(g or 0) for g in generations)
+            key = self._key(user_id, generation, name, args)
+            value = self.local.get(key)
+            if value is None and self.redis is not None:
+                raw = await self.async_redis.get(key)
+                if raw is not None:
+                    value = adapter.validate_json(raw)
+                    self.local.put(key, value, self._expires_at())
+                    self._hit(from_redis=True)
+                    return value
+        except redis.RedisError as e:
+            print(f"Analytics cache unavailable: {e}")
+            return await compute()
+        if value is not None:
+            self._hit()
+            return value
+
+        started = time.perf_counter()
+        value = await compute()
+        self._computed(started)
+        if cacheable is None or cacheable(value):
+            expires_at = self._expires_at()
+            self.local.put(key, value, expires_at)
+            if self.redis is not None:
+                try:
+                    await self.async_redis.set(
+                        key, adapter.dump_json(value), exat=int(expires_at)
+                    )
+                except redis.RedisError as e:
+                    print(f"Analytics cache unavailable: {e}")
+        return value
+
+    def _bump_local(self, user_id: str = None):
+        with self._lock:
+            if user_id is None:
+                self._epoch += 1
+            else:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def invalidate(self, user_id: str):
+        """Forget the cached analytics of a user."""
+        self._bump_local(user_id)
+        if self.redis is not None:
+            try:
+                key = f"analytics:gen:{user_id}"
+                # outlive the longest entry so a generation is never reused
+                self.redis.pipeline().incr(key).expire(key, 2 * 86400).execute()
+            except redis.RedisError as e:
+                print(f"Analytics cache invalidation of {user_id} failed: {e}")
+
+    async def ainvalidate(self, user_id: str):
+        """Same as invalidate, on the async redis client."""
+        self._bump_local(user_id)
+        if self.redis is not None:
+            try:
+                key = f"analytics:gen:{user_id}"
+                await self.async_redis.pipeline().incr(key).expire(
+                    key, 2 * 86400
+                ).execute()
+            except redis.RedisError as e:
+                print(f"Analytics cache invalidation of {user_id} failed: {e}")
+
+    def clear(self):
+        """Forget the cached analytics of every user."""
+        self._bump_local()
+        self.local.clear()
+        if self.redis is not None:
+            try:
+                self.redis.incr("analytics:epoch")
+            except redis.RedisError as e:
+                print(f"Analytics cache invalidation failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0,
+            "avg_compute_ms": (
+                round(self.compute_ms / self.computes, 3) if self.computes else 0
+            ),
+            "saved_db_ms": round(self.saved_ms, 3),
+            "local": self.local.stats(),
+            "redis": self.redis is not None,
+            "enabled": self.enabled,
+        }
+
+
 class AnalyticsListService(object):
     """class to encapsulate the analytics service."""
 
     def __init__(self, cfg: Config):
         self.cfg = cfg
         self.db = MongoDB().db
+        self.cache = AnalyticsCache()
+
+    def _daily_window(self) -> (datetime, datetime):
+        start_date_filter = local_today()
+        return start_date_filter, start_date_filter + timedelta(days=1)
+
+    def _weekly_window(self) -> (datetime, datetime):
+        # weeks start on Sunday
+        today = local_today()
+        start_date_filter = today - timedelta(days=today.isoweekday() % 7)
+        return start_date_filter, start_date_filter + timedelta(days=7)
+
+    def _analytics_pipeline(self, user_id: str) -> list:
+        """
+        Compute every dashboard figure in one pass over the user's rollup
+        days: today's and this week's focused time and the number of
+        completed sessions.
+        """
+        return [
+            {"$match": {"user_id": user_id}},
+            {
+                "$facet": {
+                    "daily": _focus_total_stages(*self._daily_window()),
+                    "weekly": _focus_total_stages(*self._weekly_window()),
+                    "completed": [
+                        {"$group": {"_id": None, "total": {"$sum": "$sessions"}}}
+                    ],
+                }
+            },
+        ]
 
-    def _get_daily_focus_total(self, user_id: str) -> float:
-        """Get daily summary per user"""
-        collection = self.db.get_collection("focus_timer")
-        start_date_filter = datetime.now(ZoneInfo("America/Toronto"))
-        end_date_filter = start_date_filter + timedelta(days=1)
+    def _to_analytics(self, result: list) -> AnalyticsListResponse:
+        facets = result[0] if result else {}
+        completed = facets.get("completed")
+        return AnalyticsListResponse(
+            daily=_focus_total_hours(facets.get("daily")),
+            weekly=_focus_total_hours(facets.get("weekly")),
+            completed_sessions=completed[0]["total"] if completed else 0,
+            status=ResponseStatus.SUCCESS,
+        )
 
-        start_date_str = start_date_filter.strftime("%m/%d/%Y")
-        end_date_str = end_date_filter.strftime("%m/%d/%Y")
+    def _no_analytics(self) -> AnalyticsListResponse:
+        return AnalyticsListResponse(
+            daily=0.0,
+            weekly=0.0,
+            completed_sessions=0,
+            status=ResponseStatus.FAILED,
+        )
 
-        pipeline = [
+    def _weekly_per_session_type_pipeline(
+        self, user_id: str, start_date: str, end_date: str
+    ) -> list:
+        return [
             {
                 "$match": {
-                    "start_date": {
-                        "$gte": start_date_str,
-                        "$lt": end_date_str,
-                    },
-                    "session_status": 3,
                     "user_id": user_id,
+                    "day": {
+                        "$gte": parse_date(start_date),
+                        "$lt": parse_date(end_date) + timedelta(days=1),
+                    },
+                    "sessions": {"$gt": 0},
                 }
             },
             {
                 "$group": {
-                    "_id": None,
-                    "total_duration": {"$sum": "$duration"},
-                    "remaining_time": {"$sum": "$remaining_focus_time"},
+                    "_id": "$session_type",
+                    "focus_seconds": {"$sum": "$focus_seconds"},
                 }
             },
+            {"$sort": {"_id": 1}},
         ]
 
-        daily_focus_total = list(collection.aggregate(pipeline))
-
-        if daily_focus_total:
-            duration = daily_focus_total[0]["total_duration"] * 60
-            remaining_focus_time = daily_focus_total[0]["remaining_time"]
-            diff = _convert_to_hours(duration - remaining_focus_time)
-            return diff
-        else:
-            return 0
-
-    def _get_weekly_focus_total(self, user_id: str) -> float:
-        """Get weekly summary per user"""
-        collection = self.db.get_collection("focus_timer")
-        dow = datetime.now(ZoneInfo("America/Toronto")).isoweekday()
-        start_date_filter = datetime.now(ZoneInfo("America/Toronto")) - timedelta(
-            days=(dow)
-        )
-        if dow == 7:
-            start_date_filter = datetime.now(ZoneInfo("America/Toronto"))
-        end_date_filter = start_date_filter + timedelta(days=7)
-
-        start_date_str = start_date_filter.strftime("%m/%d/%Y")
-        end_date_str = end_date_filter.strftime("%m/%d/%Y")
-
-        pipeline = [
+    def _series_pipeline(
+        self,
+        user_id: str,
+        start_date: str,
+        end_date: str,
+        granularity: AnalyticsGranularity,
+        by_session_type: bool,
+    ) -> list:
+        bucket = {"start": _bucket_start(granularity)}
+        if by_session_type:
+            bucket["session_type"] = "$session_type"
+        return [
             {
                 "$match": {
-                    "start_date": {
-                        "$gte": start_date_str,
-                        "$lt": end_date_str,
-                    },
-                    "session_status": 3,
                     "user_id": user_id,
+                    "day": {
+                        "$gte": parse_date(start_date),
+                        "$lt": parse_date(end_date) + timedelta(days=1),
+                    },
+                    "sessions": {"$gt": 0},
                 }
             },
             {
                 "$group": {
-                    "_id": None,
-                    "total_duration": {"$sum": "$duration"},
-                    "remaining_time": {"$sum": "$remaining_focus_time"},
+                    "_id": bucket,
+                    "focus_seconds": {"$sum": "$focus_seconds"},
+                    "sessions": {"$sum": "$sessions"},
                 }
             },
+            {"$sort": {"_id.start": 1, "_id.session_type": 1}},
         ]
 
-        weekly_focus_total = list(collection.aggregate(pipeline))
-
-        if weekly_focus_total:
-            duration = weekly_focus_total[0]["total_duration"] * 60
-            remaining_focus_time = weekly_focus_total[0]["remaining_time"]
-            diff = _convert_to_hours(duration - remaining_focus_time)
-            return diff
-        else:
-            return 0
-
-    def _all_completed_sessions(self, user_id: str) -> int:
-        """Get count of all completed sessions (session_status 3) for a user"""
-        collection = self.db.get_collection("focus_timer")
-
-        pipeline = [
-            {"$match": {"user_id": user_id, "session_status": 3}},
-            {"$count": "total"},
-        ]
-
-        total_completed_sessions = list(collection.aggregate(pipeline))
+    def _to_series_point(self, bucket: dict) -> AnalyticsSeriesPoint:
+        return AnalyticsSeriesPoint(
+            start_date=bucket["_id"]["start"].strftime(DATE_FORMAT),
+            session_type=bucket["_id"].get("session_type"),
+            duration=_convert_to_hours(bucket["focus_seconds"]),
+            sessions=bucket["sessions"],
+        )
 
-        if total_completed_sessions:
-            results = total_completed_sessions[0]["total"]
-        else:
-            results = 0
+    def _to_weekly_summary(
+        self, user_id: str, session_type: dict
+    ) -> AnalyticsWeeklySummaryResponse:
+        return AnalyticsWeeklySummaryResponse(
+            duration=_convert_to_hours(session_type["focus_seconds"]),
+            user_id=user_id,
+            session_type=session_type["_id"],
+        )
 
-        return results
+    def _is_success(self, analytics: AnalyticsListResponse) -> bool:
+        return analytics.status == ResponseStatus.SUCCESS
 
     def get_analytics(self, user_id: str) -> AnalyticsListResponse:
         """Get analytics per user."""
-        user_col = self.db.get_collection("focus_timer")
-        query = {"user_id": user_id}
-        user_exists = user_col.find_one(query)
-        if user_exists is None:
-            return AnalyticsListResponse(
-                daily=0.0,
-                weekly=0.0,
-                completed_sessions=0,
-                status=ResponseStatus.FAILED,
-            )
-
-        daily_total = self._get_daily_focus_total(user_id)
-        weekly_total = self._get_weekly_focus_total(user_id)
-        completed_sessions_total = self._all_completed_sessions(user_id)
+        return self.cache.fetch(
+            user_id,
+            "analytics",
+            (),
+            lambda: self._get_analytics(user_id),
+            ANALYTICS,
+            cacheable=self._is_success,
+        )
 
-        return AnalyticsListResponse(
-            daily=daily_total,
-            weekly=weekly_total,
-            completed_sessions=completed_sessions_total,
-            status=ResponseStatus.SUCCESS,
+    def _get_analytics(self, user_id: str) -> AnalyticsListResponse:
+        rollup = self.db.get_collection(ROLLUP_COLLECTION)
+        analytics = self._to_analytics(
+            list(rollup.aggregate(self._analytics_pipeline(user_id)))
         )
+        # the rollup only knows completed sessions, users without any
+        # session at all get the failed response
+        if not analytics.completed_sessions and not self._has_sessions(user_id):
+            return self._no_analytics()
+        return analytics
+
+    def _has_sessions(self, user_id: str) -> bool:
+        collection = self.db.get_collection("focus_timer")
+        session = collection.find_one({"user_id": user_id}, projection={"_id": 1})
+        return session is not None
 
     def get_weekly_analytics_per_session_type(
         self, user_id: str, start_date: str, end_date: str
     ) -> list[AnalyticsWeeklySummaryResponse]:
         """Get weekly summary per user per session type"""
-        collection = self.db.get_collection("focus_timer")
+        if not start_date or not end_date:
+            return []
+        return self.cache.fetch(
+            user_id,
+            "weeklysummary",
+            (start_date, end_date),
+            lambda: self._get_weekly_analytics_per_session_type(
+                user_id, start_date, end_date
+            ),
+            WEEKLY_SUMMARY,
+        )
 
-        start_date_str = start_date
-        end_date_str = end_date
+    def _get_weekly_analytics_per_session_type(
+        self, user_id: str, start_date: str, end_date: str
+    ) -> list[AnalyticsWeeklySummaryResponse]:
+        rollup = self.db.get_collection(ROLLUP_COLLECTION)
 
-        pipeline = [
-            {
-                "$match": {
-                    "start_date": {
-                        "$gte": start_date_str,
-                        "$lte": end_date_str,
-                    },
-                    "session_status": {"$eq": 3},
-                    "user_id": {"$eq": user_id},
-                }
-            },
-            {
-                "$group": {
-                    "_id": {"session_type": "$session_type", "user_id": "$user_id"},
-                    "duration": {"$sum": "$duration"},
-                    "remaining_time": {"$sum": "$remaining_focus_time"},
-                }
-            },
-        ]
+        weekly_summary = rollup.aggregate(
+            self._weekly_per_session_type_pipeline(user_id, start_date, end_date)
+        )
+
+        return [self._to_weekly_summary(user_id, row) for row in weekly_summary]
+
+    def get_analytics_series(
+        self,
+        user_id: str,
+        start_date: str,
+        end_date: str,
+        granularity: AnalyticsGranularity = AnalyticsGranularity.DAY,
+        by_session_type: bool = False,
+    ) -> list[AnalyticsSeriesPoint]:
+        """Get the focused time per day, week or month of any date range"""
+        return self.cache.fetch(
+            user_id,
+            "series",
+            (start_date, end_date, granularity.value, str(by_session_type)),
+            lambda: self._get_analytics_series(
+                user_id, start_date, end_date, granularity, by_session_type
+            ),
+            SERIES,
+        )
 
-        pipeline.append({"$set": {"user_id": "$_id"}})
+    def _get_analytics_series(
+        self,
+        user_id: str,
+        start_date: str,
+        end_date: str,
+        granularity: AnalyticsGranularity,
+        by_session_type: bool,
+    ) -> list[AnalyticsSeriesPoint]:
+        rollup = self.db.get_collection(ROLLUP_COLLECTION)
+        series = rollup.aggregate(
+            self._series_pipeline(
+                user_id, start_date, end_date, granularity, by_session_type
+            )
+        )
+        return [self._to_series_point(bucket) for bucket in series]
 
-        pipeline.append({"$unset": ["_id"]})
 
-        weekly_summary = collection.aggregate(pipeline)
+class AsyncAnalyticsListService(AnalyticsListService):
+    """class to encapsulate the analytics service on top of AsyncMongoDB."""
 
-        results = [
-            AnalyticsWeeklySummaryResponse(
-                duration=_convert_to_hours(
-                    (session["duration"] * 60) - session["remaining_time"]
-                ),
-                user_id=session["user_id"]["user_id"],
-                session_type=session["user_id"]["session_type"],
-            )
-            for session in weekly_summary
-        ]
+    def __init__(self, cfg: Config):
+        self.cfg = cfg
+        self.db = AsyncMongoDB()
+        self.cache = AnalyticsCache()
+
+    async def _aggregate(self, pipeline: list) -> list:
+        rollup = self.db.get_collection(ROLLUP_COLLECTION)
+        cursor = await rollup.aggregate(pipeline)
+        return await cursor.to_list()
+
+    async def get_analytics(self, user_id: str) -> AnalyticsListResponse:
+        """Get analytics per user."""
+        return await self.cache.afetch(
+            user_id,
+            "analytics",
+            (),
+            lambda: self._get_analytics(user_id),
+            ANALYTICS,
+            cacheable=self._is_success,
+        )
 
-        return results
+    async def _get_analytics(self, user_id: str) -> AnalyticsListResponse:
+        analytics = self._to_analytics(
+            await self._aggregate(self._analytics_pipeline(user_id))
+        )
+        if not analytics.completed_sessions and not await self._has_sessions(user_id):
+            return self._no_analytics()
+        return analytics
+
+    async def _has_sessions(self, user_id: str) -> bool:
+        collection = self.db.get_collection("focus_timer")
+        session = await collection.find_one({"user_id": user_id}, projection={"_id": 1})
+        return session is not None
+
+    async def get_weekly_analytics_per_session_type(
+        self, user_id: str, start_date: str, end_date: str
+    ) -> list[AnalyticsWeeklySummaryResponse]:
+        """Get weekly summary per user per session type"""
+        if not start_date or not end_date:
+            return []
+        return await self.cache.afetch(
+            user_id,
+            "weeklysummary",
+            (start_date, end_date),
+            lambda: self._get_weekly_analytics_per_session_type(
+                user_id, start_date, end_date
+            ),
+            WEEKLY_SUMMARY,
+        )
+
+    async def _get_weekly_analytics_per_session_type(
+        self, user_id: str, start_date: str, end_date: str
+    ) -> list[AnalyticsWeeklySummaryResponse]:
+        weekly_summary = await self._aggregate(
+            self._weekly_per_session_type_pipeline(user_id, start_date, end_date)
+        )
+        return [self._to_weekly_summary(user_id, row) for row in weekly_summary]
+
+    async def get_analytics_series(
+        self,
+        user_id: str,
+        start_date: str,
+        end_date: str,
+        granularity: AnalyticsGranularity = AnalyticsGranularity.DAY,
+        by_session_type: bool = False,
+    ) -> list[AnalyticsSeriesPoint]:
+        """Get the focused time per day, week or month of any date range"""
+        return await self.cache.afetch(
+            user_id,
+            "series",
+            (start_date, end_date, granularity.value, str(by_session_type)),
+            lambda: self._get_analytics_series(
+                user_id, start_date, end_date, granularity, by_session_type
+            ),
+            SERIES,
+        )
+
+    async def _get_analytics_series(
+        self,
+        user_id: str,
+        start_date: str,
+        end_date: str,
+        granularity: AnalyticsGranularity,
+        by_session_type: bool,
+    ) -> list[AnalyticsSeriesPoint]:
+        series = await self._aggregate(
+            self._series_pipeline(
+                user_id, start_date, end_date, granularity, by_session_type
+            )
+        )
+        return [self._to_series_point(bucket) for bucket in series]
@@ -7,7 +7,7 @@ from bson import ObjectId
 
 from src.api import BlockListType, BlockListResponse
 from src.config import Config
-from src.db import MongoDB
+from src.db import AsyncMongoDB, MongoDB
 
 URL_REGEX = re.compile(
     r"^(https?:\/\/)?"  # Optional http or https
@@ -30,21 +30,21 @@ class BlockListService(object):
         query = {"user_id": user_id}
         blocklist_cursor = collection.find(query)
         blocklist = [
-            BlockListResponse(id=str(doc["_id"]), domain=doc["domain"], list_type=doc["list_type"])
+            BlockListResponse(
+                id=str(doc["_id"]), domain=doc["domain"], list_type=doc["list_type"]
+            )
             for doc in blocklist_cursor
         ]
 
         return blocklist
 
-    def add_blocklist(self, user_id: str, domain: str, list_type: BlockListType) -> (str, bool):
+    def add_blocklist(
+        self, user_id: str, domain: str, list_type: BlockListType
+    ) -> (str, bool):
         """Add an url to blocklist."""
         collection = self.db.get_collection("blocklist")
 
-        query = {
-            "user_id": user_id,
-            "domain": domain,
-            "list_type": list_type
-        }
+        query = {"user_id": user_id, "domain": domain, "list_type": list_type}
         update = {"$setOnInsert": query}
         result = collection.update_one(query, update, upsert=True)
 
@@ -58,6 +58,54 @@ class BlockListService(object):
         """Delete an url from blocklist."""
         collection = self.db.get_collection("blocklist")
 
-        result = collection.delete_one({"_id": ObjectId(blocklist_id), "user_id": user_id})
+        result = collection.delete_one(
+            {"_id": ObjectId(blocklist_id), "user_id": user_id}
+        )
+
+        return result.deleted_count > 0
+
+
+class AsyncBlockListService(BlockListService):
+    """class to encapsulate the blocklist service on top of AsyncMongoDB."""
+
+    def __init__(self, cfg: Config):
+        self.cfg = cfg
+        self.db = AsyncMongoDB()
+
+    async def list_blocklist(self, user_id: str) -> list[BlockListResponse]:
+        """List all blocklist."""
+        collection = self.db.get_collection("blocklist")
+        query = {"user_id": user_id}
+        blocklist = [
+            BlockListResponse(
+                id=str(doc["_id"]), domain=doc["domain"], list_type=doc["list_type"]
+            )
+            async for doc in collection.find(query)
+        ]
+
+        return blocklist
+
+    async def add_blocklist(
+        self, user_id: str, domain: str, list_type: BlockListType
+    ) -> (str, bool):
+        """Add an url to blocklist."""
+        collection = self.db.get_collection("blocklist")
+
+        query = {"user_id": user_id, "domain": domain, "list_type": list_type}
+        update = {"$setOnInsert": query}
+        result = await collection.update_one(query, update, upsert=True)
+
+        if result.matched_count > 0:
+            return "", False
+
+        return str(result.upserted_id), True
+
+    async def delete_blocklist(self, user_id: str, blocklist_id: str) -> bool:
+        """Delete an url from blocklist."""
+        collection = self.db.get_collection("blocklist")
+
+        result = await collection.delete_one(
+            {"_id": ObjectId(blocklist_id), "user_id": user_id}
+        )
 
         return result.deleted_count > 0
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def token_digest(token: str) -> bytes:
+    """Key under which a bearer token is cached, so the token itself is not kept."""
+    return hashlib.sha256(token.encode()).digest()
+
+
+class LRUCache(object):
+    """
+    class to hold a bounded, thread-safe in-process cache.
+
+    Every entry carries its own expiry timestamp; expired entries count as a
+    miss and the least recently used entry is evicted when the cache is full.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value of key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, expires_at: float):
+        """Cache value under key until the expires_at timestamp."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
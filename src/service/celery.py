@@ -1,9 +1,11 @@
+from datetime import timedelta
+
 from celery import Celery
 from celery.schedules import crontab
 
 from src.config import Config
 
-from .notification import NotificationService
+from .notification import NotificationService, summary_week
 
 cfg = Config()
 celery_app = Celery("tasks", broker=cfg.broker_url, backend=cfg.backend_url)
@@ -12,19 +14,97 @@ celery_app = Celery("tasks", broker=cfg.broker_url, backend=cfg.backend_url)
 celery_app.conf.update(
     timezone="America/Toronto",
     beat_schedule={
-        "weekly-summary-job": {
-            "task": "src.service.weekly_summary_task",
-            # Run every Monday at midnight (00:00)
-            "schedule": crontab(day_of_week="mon", hour=0, minute=0),
+        "weekly-summary-schedule": {
+            "task": "src.service.weekly_summary_schedule_task",
+            # Once per bucket of the delivery window
+            "schedule": timedelta(hours=cfg.summary_window_hours / cfg.summary_buckets),
+        },
+        "drain-outbox": {
+            "task": "src.service.drain_outbox_task",
+            # Resume the emails left in the outbox by workers that died
+            "schedule": crontab(minute="*/15"),
         },
     },
 )
 
 
 @celery_app.task(name="src.service.weekly_summary_task")
-def weekly_summary_task():  # pragma: no cover
+def weekly_summary_task(job_id: str = None):
     """
-    Celery task to run the weekly summary job.
+    Celery task to run the weekly summary job: pages through the users it
+    goes to and enqueues one weekly_summary_chunk_task per chunk of them, so
+    that the emails are sent by every worker and a failure only holds back
+    its chunk. Given a job_id, runs the job requested through the API, with
+    its week and users.
     """
     notification_service = NotificationService(cfg)
-    notification_service.weekly_summary_job()
+    week, user_ids = summary_week(), None
+    if job_id is not None:
+        job = notification_service.find_summary_job(job_id)
+        if job is None:
+            # expired, or the task was redelivered after the job was removed
+            print(f"Weekly summary job {job_id} not found, nothing to send")
+            return None
+        week, user_ids = job["week"], job["user_ids"]
+    users = chunks = 0
+    try:
+        for chunk in notification_service.iter_subscriber_chunks(
+            week, cfg.summary_chunk_size, user_ids
+        ):
+            weekly_summary_chunk_task.delay(week, chunk, job_id)
+            users += len(chunk)
+            chunks += 1
+    except Exception as e:
+        if job_id is not None:
+            notification_service.fail_summary_job(job_id, e)
+        raise
+    notification_service.start_summary_run(week, users, chunks)
+    if job_id is not None:
+        notification_service.start_summary_job(job_id, users, chunks)
+    return {"week": week, "users": users, "chunks": chunks}
+
+
+@celery_app.task(name="src.service.weekly_summary_schedule_task")
+def weekly_summary_schedule_task():
+    """
+    Celery task to enqueue one weekly_summary_chunk_task per chunk of the
+    users whose bucket of the weekly summary delivery window started since
+    its previous run, spreading the run over the window instead of sending to
+    everyone at Monday midnight.
+    """
+    notification_service = NotificationService(cfg)
+    return notification_service.schedule_weekly_summaries(
+        weekly_summary_chunk_task.delay
+    )
+
+
+@celery_app.task(
+    name="src.service.weekly_summary_chunk_task",
+    bind=True,
+    acks_late=True,
+    max_retries=cfg.summary_chunk_retries,
+)
+def weekly_summary_chunk_task(self, week: str, user_ids: list, job_id: str = None):
+    """
+    Celery task to render the weekly summary of week of a chunk of users into
+    the email outbox and send it. The users already in the outbox are not
+    rendered again and only the emails not sent yet are sent, so the chunk is
+    simply retried when some emails failed, or redelivered if its worker died.
+    Its progress is also counted in the job of job_id, if it was sent by one.
+    """
+    notification_service = NotificationService(cfg)
+    notification_service.enqueue_weekly_summaries(week, user_ids)
+    counts = notification_service.drain_outbox(week, user_ids)
+    if counts["retry"] and self.request.retries < self.max_retries:
+        raise self.retry(countdown=cfg.summary_retry_delay * 2**self.request.retries)
+    notification_service.record_summary_chunk(week, job_id)
+    return counts
+
+
+@celery_app.task(name="src.service.drain_outbox_task")
+def drain_outbox_task():
+    """
+    Celery task to send every email of the outbox that can be claimed, the
+    ones due for a retry and the ones whose sender died.
+    """
+    return NotificationService(cfg).drain_outbox()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Cache of the rendered weekly charts.
+
+A chart only depends on its 7 day x 4 session type minutes matrix and on the
+backend rendering it, so it is stored once in CHART_BLOB_COLLECTION under the
+hash of both, however many users had the same week, and is never rendered
+again. The hash is also the ETag the chart is served with.
+"""
+import hashlib
+from datetime import datetime
+
+import numpy as np
+from bson import Binary
+from pymongo import UpdateOne
+
+CHART_BLOB_COLLECTION = "chart_blob"
+
+
+def chart_key(matrix: np.ndarray, backend: str) -> str:
+    """Content hash of the chart of matrix rendered by backend."""
+    digest = hashlib.blake2b(backend.encode(), digest_size=16)
+    digest.update(np.ascontiguousarray(matrix, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def content_type(chart: bytes) -> str:
+    """Media type of a rendered chart."""
+    return "image/svg+xml" if chart.startswith(b"<svg") else "image/png"
+
+
+def blob_update(key: str, chart: bytes, max_day: str) -> (dict, dict):
+    """Filter and update storing the chart of key, if not stored yet."""
+    return {"_id": key}, {
+        "$setOnInsert": {
+            "data": Binary(chart),
+            "max_day": max_day,
+            "content_type": content_type(chart),
+            "created_at": datetime.now(),
+        }
+    }
+
+
+class ChartCache:
+    """class to encapsulate the weekly chart cache collection."""
+
+    def __init__(self, db):
+        self.blobs = db.get_collection(CHART_BLOB_COLLECTION)
+
+    def get_many(self, keys) -> dict:
+        """Get the (chart, max_day) of every key of keys that is cached."""
+        return {
+            blob["_id"]: (bytes(blob["data"]), blob["max_day"])
+            for blob in self.blobs.find({"_id": {"$in": list(keys)}})
+        }
+
+    def put_many(self, charts: dict):
+        """Store the (chart, max_day) of every key of charts."""
+        if charts:
+            self.blobs.bulk_write(
+                [
+                    UpdateOne(*blob_update(key, chart, max_day), upsert=True)
+                    for key, (chart, max_day) in charts.items()
+                ],
+                ordered=False,
+            )
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+
+import io
+import math
+import struct
+import zlib
+
+import numpy as np
+
+from src.config import Config
+
+WEEK_ORDER = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+SESSION_LABELS = {0: "WORK", 1: "STUDY", 2: "PERSONAL", 3: "OTHER"}
+TITLE = "Weekly Focus Sessions Summary"
+Y_LABEL = "Total Duration (minutes)"
+
+# same canvas and bar colors as the matplotlib figure (8x4 inches at 100 dpi)
+WIDTH, HEIGHT = 800, 400
+LEFT, RIGHT, TOP, BOTTOM = 70, 20, 40, 40
+BAR_WIDTH = 0.6
+COLORS = [(31, 119, 180), (255, 127, 14), (44, 160, 44), (214, 39, 40)]
+TEXT_COLOR = (0, 0, 0)
+GRID_COLOR = (204, 204, 204)
+WHITE = (255, 255, 255)
+
+# 5x7 bitmap font, one hex byte per row with the glyph in the low 5 bits
+FONT = {
+    " ": "00000000000000",
+    "(": "02040808080402",
+    ")": "08040202020408",
+    "0": "0e11131519110e",
+    "1": "040c040404040e",
+    "2": "0e11010204081f",
+    "3": "1f02040201110e",
+    "4": "02060a121f0202",
+    "5": "1f101e0101110e",
+    "6": "0608101e11110e",
+    "7": "1f010204080808",
+    "8": "0e11110e11110e",
+    "9": "0e11110f01020c",
+    "A": "0e1111111f1111",
+    "B": "1e11111e11111e",
+    "C": "0e11101010110e",
+    "D": "1c12111111121c",
+    "E": "1f10101e10101f",
+    "F": "1f10101e101010",
+    "G": "0e11101711110f",
+    "H": "1111111f111111",
+    "I": "0e04040404040e",
+    "J": "0702020202120c",
+    "K": "11121418141211",
+    "L": "1010101010101f",
+    "M": "111b1515111111",
+    "N": "11111915131111",
+    "O": "0e11111111110e",
+    "P": "1e11111e101010",
+    "Q": "0e11111115120d",
+    "R": "1e11111e141211",
+    "S": "0f10100e01011e",
+    "T": "1f040404040404",
+    "U": "1111111111110e",
+    "V": "11111111110a04",
+    "W": "1111111515150a",
+    "X": "11110a040a1111",
+    "Y": "1111110a040404",
+    "Z": "1f01020408101f",
+}
+GLYPHS = {
+    char: np.unpackbits(np.frombuffer(bytes.fromhex(rows), dtype=np.uint8))
+    .reshape(7, 8)[:, 3:]
+    .astype(bool)
+    for char, rows in FONT.items()
+}
+
+
+def _nice_step(top: float) -> int:
+    """Tick step of 1, 2 or 5 times a power of ten giving at most 6 ticks."""
+    magnitude = 10 ** max(0, int(math.floor(math.log10(max(top, 1) / 6))))
+    for factor in (1, 2, 5, 10):
+        if top / (factor * magnitude) <= 6:
+            return factor * magnitude
+    return 10 * magnitude
+
+
+def chart_layout(matrix: np.ndarray) -> (list, list, str):
+    """
+    Lays out the stacked bar chart of a 7 day x 4 session type minutes matrix
+    on the WIDTH x HEIGHT canvas. Returns the rectangles as (x, y, width,
+    height, color), the texts as (x, y, text, size, anchor) with y the top of
+    the text, and the day with the highest total duration.
+    """
+    total_per_day = matrix.sum(axis=1)
+    max_day = WEEK_ORDER[int(total_per_day.argmax())]
+    max_total = int(total_per_day.max())
+    top = max_total * 1.2 if max_total > 0 else 1
+    plot_width = WIDTH - LEFT - RIGHT
+    plot_height = HEIGHT - TOP - BOTTOM
+    slot = plot_width / len(WEEK_ORDER)
+
+    def y_of(minutes: float) -> int:
+        return TOP + plot_height - int(round(minutes / top * plot_height))
+
+    rects, texts = [], []
+    step = _nice_step(top)
+    for tick in range(0, int(top) + 1, step):
+        rects.append((LEFT - 4, y_of(tick), plot_width + 4, 1, GRID_COLOR))
+        texts.append((LEFT - 8, y_of(tick) - 3, str(tick), 1, "end"))
+
+    for day in range(len(WEEK_ORDER)):
+        x = LEFT + int(round(slot * (day + (1 - BAR_WIDTH) / 2)))
+        bottom = 0
+        for stype in SESSION_LABELS:
+            minutes = int(matrix[day, stype])
+            if minutes > 0:
+                y = y_of(bottom + minutes)
+                height = y_of(bottom) - y
+                rects.append((x, y, int(slot * BAR_WIDTH), height, COLORS[stype]))
+            bottom += minutes
+        label_x = LEFT + int(round(slot * (day + 0.5)))
+        texts.append((label_x, TOP + plot_height + 8, WEEK_ORDER[day], 1, "middle"))
+
+    # axes, title, y label and legend
+    rects.append((LEFT, TOP, 1, plot_height + 1, TEXT_COLOR))
+    rects.append((LEFT, TOP + plot_height, plot_width, 1, TEXT_COLOR))
+    texts.append((WIDTH // 2, 12, TITLE, 2, "middle"))
+    texts.append((LEFT, TOP - 12, Y_LABEL, 1, "start"))
+    legend_x = WIDTH - RIGHT - 90
+    for stype, label in SESSION_LABELS.items():
+        y = TOP + 8 + stype * 14
+        rects.append((legend_x, y, 10, 10, COLORS[stype]))
+        texts.append((legend_x + 16, y + 1, label, 1, "start"))
+    return rects, texts, max_day
+
+
+def _text_width(text: str, size: int) -> int:
+    return (len(text) * 6 - 1) * size
+
+
+def _text_left(x: int, text: str, size: int, anchor: str) -> int:
+    if anchor == "middle":
+        return x - _text_width(text, size) // 2
+    if anchor == "end":
+        return x - _text_width(text, size)
+    return x
+
+
+def render_png(matrix: np.ndarray) -> (bytes, str):
+    """
+    Renders the chart of a week as PNG bytes with numpy and zlib only, and
+    returns it with the day with the highest total duration.
+    """
+    rects, texts, max_day = chart_layout(matrix)
+    canvas = np.full((HEIGHT, WIDTH, 3), 255, dtype=np.uint8)
+    for x, y, width, height, color in rects:
+        canvas[y : y + height, x : x + width] = color
+    for x, y, text, size, anchor in texts:
+        left = _text_left(x, text, size, anchor)
+        for i, char in enumerate(text.upper()):
+            glyph = GLYPHS.get(char, GLYPHS[" "])
+            if size > 1:
+                glyph = glyph.repeat(size, axis=0).repeat(size, axis=1)
+            gx = left + i * 6 * size
+            canvas[y : y + glyph.shape[0], gx : gx + glyph.shape[1]][glyph] = TEXT_COLOR
+    return _encode_png(canvas), max_day
+
+
+def _encode_png(canvas: np.ndarray) -> bytes:
+    """Encodes an RGB uint8 height x width x 3 array as an unfiltered PNG."""
+    height, width, _ = canvas.shape
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 1:] = canvas.reshape(height, width * 3)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        crc = zlib.crc32(kind + data) & 0xFFFFFFFF
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", crc)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(rows.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+def render_svg(matrix: np.ndarray) -> (bytes, str):
+    """
+    Renders the chart of a week as SVG bytes, and returns it with the day
+    with the highest total duration.
+    """
+    rects, texts, max_day = chart_layout(matrix)
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" '
+        f'height="{HEIGHT}" viewBox="0 0 {WIDTH} {HEIGHT}">',
+        f'<rect width="{WIDTH}" height="{HEIGHT}" fill="rgb{WHITE}"/>',
+    ]
+    for x, y, width, height, color in rects:
+        parts.append(
+            f'<rect x="{x}" y="{y}" width="{width}" height="{height}" '
+            f'fill="rgb{color}"/>'
+        )
+    for x, y, text, size, anchor in texts:
+        parts.append(
+            f'<text x="{x}" y="{y + 7 * size}" font-family="sans-serif" '
+            f'font-size="{9 * size}" text-anchor="{anchor}">{text}</text>'
+        )
+    parts.append("</svg>")
+    return "".join(parts).encode("utf-8"), max_day
+
+
+def render_matplotlib(matrix: np.ndarray) -> (bytes, str):
+    """
+    Renders the chart of a week as PNG bytes with matplotlib, and returns it
+    with the day with the highest total duration.
+    """
+    # imported here so that only the processes drawing charts pay for it, and
+    # without pyplot, whose global state would make rendering thread-unsafe
+    from matplotlib.figure import Figure
+
+    days = WEEK_ORDER
+    total_per_day = matrix.sum(axis=1)
+    max_day = days[int(total_per_day.argmax())]
+
+    # Create the stacked bar chart
+    fig = Figure(figsize=(8, 4))
+    ax = fig.subplots()
+    indices = range(len(days))
+
+    bottom = np.zeros(len(days), dtype=np.int64)
+    for stype, label in SESSION_LABELS.items():
+        ax.bar(
+            indices,
+            matrix[:, stype],
+            BAR_WIDTH,
+            bottom=bottom,
+            label=label,
+        )
+
+        bottom = bottom + matrix[:, stype]
+
+    ax.set_xticks(indices)
+    ax.set_xticklabels(days)
+    ax.set_ylabel(Y_LABEL)
+    ax.set_title(TITLE)
+    ax.legend()
+
+    max_total = int(total_per_day.max())
+    ax.set_ylim([0, max_total * 1.2 if max_total > 0 else 1])
+
+    # Save the figure to a buffer
+    buf = io.BytesIO()
+    fig.tight_layout()
+    fig.savefig(buf, format="png")
+    return buf.getvalue(), max_day
+
+
+CHART_BACKENDS = {
+    "builtin": render_png,
+    "svg": render_svg,
+    "matplotlib": render_matplotlib,
+}
+
+
+def render_chart(matrix: np.ndarray, backend: str = None) -> (bytes, str):
+    """
+    Renders the 7 day x 4 session type minutes matrix of a week as a stacked
+    bar chart with backend, chart_backend by default. Returns the image
+    bytes with the day with the highest total duration. Takes and returns
+    plain values only, so that it can run on the chart render pool.
+    """
+    backend = backend or Config().chart_backend
+    if backend not in CHART_BACKENDS:
+        raise ValueError(f"Unrecognized chart backend: {backend}")
+    return CHART_BACKENDS[backend](matrix)
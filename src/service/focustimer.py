@@ -3,9 +3,50 @@
 
 from src.api import SessionStatus, SessionType, GetFocusSessionResponse
 from src.config import Config
-from src.db import MongoDB
-from bson import ObjectId 
-from datetime import datetime
+from src.db import AsyncMongoDB, MongoDB
+from src.service.analytics import AnalyticsCache
+from src.service.rollup import ROLLUP_COLLECTION, rollup_updates
+from src.service.sessiontime import (
+    DATE_FORMAT,
+    MAX_SESSION_SPAN,
+    SessionIntervals,
+    parse_date,
+    session_window,
+)
+from bson import ObjectId
+from datetime import datetime, timedelta
+from pymongo import InsertOne, ReturnDocument
+
+UNFINISHED_STATUSES = [
+    SessionStatus.UPCOMING,
+    SessionStatus.ONGOING,
+    SessionStatus.PAUSED,
+]
+MAX_BATCH_SESSIONS = 500
+# fields a batch session cannot leave out, the responses and the rollup need them
+BATCH_REQUIRED_FIELDS = ("session_status", "session_type", "remaining_focus_time")
+
+
+def recurring_sessions(
+    session: dict,
+    frequency: str,
+    count: int = None,
+    until: str = None,
+    limit: int = None,
+) -> list[dict]:
+    """Expand a session repeating daily or weekly, by number of occurrences or up to a date."""
+    step = timedelta(days=7 if frequency == "weekly" else 1)
+    first = parse_date(session["start_date"])
+    last = parse_date(until) if until else None
+    sessions = []
+    day = first
+    while (count is None or len(sessions) < count) and (last is None or day <= last):
+        if limit is not None and len(sessions) >= limit:
+            break
+        sessions.append({**session, "start_date": day.strftime(DATE_FORMAT)})
+        day += step
+    return sessions
+
 
 class FocusTimerService(object):
     """class to encapsulate the analytics service."""
@@ -13,16 +54,26 @@ class FocusTimerService(object):
     def __init__(self, cfg: Config):
         self.cfg = cfg
         self.db = MongoDB().db
-    
-    def _time_to_seconds(self, time_str: str) -> int:
-        """Convert HH:MM:SS to total seconds."""
-        time_obj = datetime.strptime(time_str, "%H:%M:%S")
-        return time_obj.hour * 3600 + time_obj.minute * 60 + time_obj.second
+        self.analytics_cache = AnalyticsCache()
 
-    def add_focus_session(self, user_id: str, session_status: SessionStatus, start_date: str, start_time: str, duration: int, break_duration: int, session_type: SessionType, remaining_focus_time: int, remaining_break_time: int) -> (str, bool):
+    def add_focus_session(
+        self,
+        user_id: str,
+        session_status: SessionStatus,
+        start_date: str,
+        start_time: str,
+        duration: int,
+        break_duration: int,
+        session_type: SessionType,
+        remaining_focus_time: int,
+        remaining_break_time: int,
+    ) -> (str, bool):
         """Add focus timer."""
         collection = self.db.get_collection("focus_timer")
-        if self.is_time_conflict_with_all_sessions(user_id, start_date, start_time, duration, break_duration):
+        start_at, end_at = session_window(
+            start_date, start_time, duration, break_duration
+        )
+        if self.is_time_conflict_with_all_sessions(user_id, start_at, end_at):
             print("Time conflict detected, cannot add session!")
             return "", False  # Conflict: another session overlaps with this one
 
@@ -35,57 +86,141 @@ class FocusTimerService(object):
             "break_duration": break_duration,
             "session_type": session_type,
             "remaining_focus_time": remaining_focus_time,
-            "remaining_break_time": remaining_break_time
+            "remaining_break_time": remaining_break_time,
         }
-        update = {"$setOnInsert": query}
+        update = {"$setOnInsert": {**query, "start_at": start_at, "end_at": end_at}}
         result = collection.update_one(query, update, upsert=True)
+        if result.upserted_id is not None:
+            self._update_rollup(user_id, after={**query, "start_at": start_at})
         return str(result.upserted_id), True
-    
+
+    def _plan_batch(self, user_id: str, sessions: list[dict]) -> (list, list):
+        """Window every session and bound the stored sessions it may conflict with."""
+        windows = [
+            session_window(
+                s["start_date"], s["start_time"], s["duration"], s["break_duration"]
+            )
+            for s in sessions
+        ]
+        query = {
+            "user_id": user_id,
+            "session_status": {"$in": UNFINISHED_STATUSES},
+            "start_at": {
+                "$gt": min(start for start, _ in windows) - MAX_SESSION_SPAN,
+                "$lt": max(end for _, end in windows),
+            },
+        }
+        return windows, query
+
+    def _accept_batch(
+        self, user_id: str, sessions: list[dict], windows: list, stored
+    ) -> (list, list):
+        """Check the batch against the stored sessions and itself, in order."""
+        intervals = SessionIntervals(
+            (s["start_at"], s["end_at"])
+            for s in stored
+            if s.get("start_at") is not None
+        )
+        results, docs = [], []
+        for session, (start_at, end_at) in zip(sessions, windows):
+            if intervals.overlaps(start_at, end_at):
+                results.append(("", False))
+                continue
+            intervals.add(start_at, end_at)
+            doc = {
+                "_id": ObjectId(),
+                "user_id": user_id,
+                **session,
+                "start_at": start_at,
+                "end_at": end_at,
+            }
+            docs.append(doc)
+            results.append((str(doc["_id"]), True))
+        return results, docs
+
+    def add_focus_sessions(self, user_id: str, sessions: list[dict]) -> list:
+        """Add many focus timers at once, returns (session_id, ok) per session."""
+        if not sessions:
+            return []
+        collection = self.db.get_collection("focus_timer")
+        windows, query = self._plan_batch(user_id, sessions)
+        stored = collection.find(query, projection={"start_at": 1, "end_at": 1})
+        results, docs = self._accept_batch(user_id, sessions, windows, stored)
+        if docs:
+            collection.bulk_write([InsertOne(doc) for doc in docs])
+            self._update_rollup_many(
+                user_id, [rollup_updates(after=doc) for doc in docs]
+            )
+        return results
+
     def modify_focus_session(self, user_id: str, session_id: str, **updates) -> bool:
         """Modify focus timer with optional fields."""
         collection = self.db.get_collection("focus_timer")
 
         if not updates:
             return False
-        
+
         session = collection.find_one({"user_id": user_id, "_id": ObjectId(session_id)})
         if not session:
             return False
-        
+
         start_date = updates.get("start_date", session["start_date"])
         start_time = updates.get("start_time", session["start_time"])
         duration = updates.get("duration", session["duration"])
         break_duration = updates.get("break_duration", session["break_duration"])
+        start_at, end_at = session_window(
+            start_date, start_time, duration, break_duration
+        )
 
-        if self.is_time_conflict_with_all_sessions(user_id, start_date, start_time, duration, break_duration, exclude_session_id=session_id):
+        if self.is_time_conflict_with_all_sessions(
+            user_id, start_at, end_at, exclude_session_id=session_id
+        ):
             return "conflict"  # Conflict: another session overlaps with this one
-        
+
         if "session_status" in updates:
             updates["session_status"] = updates["session_status"].value
         if "session_type" in updates:
             updates["session_type"] = updates["session_type"].value
+        updates["start_at"], updates["end_at"] = start_at, end_at
+
+        before = collection.find_one_and_update(
+            {"user_id": user_id, "_id": ObjectId(session_id)},
+            {"$set": updates},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if before is None:
+            return False
+        self._update_rollup(user_id, before=before, after={**before, **updates})
+        return self._is_modified(before, updates)
 
-        result = collection.update_one({"user_id": user_id, "_id": ObjectId(session_id)}, {"$set": updates})
-        return result.modified_count > 0
-    
     def delete_focus_session(self, user_id: str, session_id: str) -> bool:
         """Delete focus timer."""
         collection = self.db.get_collection("focus_timer")
-        result = collection.delete_one({"user_id": user_id, "_id": ObjectId(session_id)})
-        return result.deleted_count > 0
-    
+        before = collection.find_one_and_delete(
+            {"user_id": user_id, "_id": ObjectId(session_id)}
+        )
+        if before is None:
+            return False
+        self._update_rollup(user_id, before=before)
+        return True
+
     def get_next_focus_session(self, user_id: str) -> GetFocusSessionResponse:
         """Get next upcoming focus session."""
         collection = self.db.get_collection("focus_timer")
 
         session = collection.find_one(
-            {"user_id": user_id, "session_status": 0},  # Filter: Only sessions with status 0
-            sort=[("start_date", 1), ("start_time", 1)]  # Sort: First by date, then by time
+            {
+                "user_id": user_id,
+                "session_status": 0,
+            },  # Filter: Only sessions with status 0
+            sort=[("start_at", 1)],
         )
-        
+
         return GetFocusSessionResponse(**session) if session else None
-    
-    def get_all_focus_session(self, user_id: str, session_status: list[int] = None) -> list[GetFocusSessionResponse]:
+
+    def get_all_focus_session(
+        self, user_id: str, session_status: list[int] = None
+    ) -> list[GetFocusSessionResponse]:
         """Get focus sessions of specific status, default is fetching all."""
         collection = self.db.get_collection("focus_timer")
 
@@ -95,69 +230,229 @@ class FocusTimerService(object):
 
         session_cursor = collection.find(query)
 
-        focus_sessions = [
-            GetFocusSessionResponse(
-                session_id = str(doc["_id"]),
-                session_status=SessionStatus(doc.get("session_status")),
-                start_date=doc.get("start_date"),
-                start_time=doc.get("start_time"),
-                duration=doc.get("duration"),
-                break_duration=doc.get("break_duration"),
-                session_type=SessionType(doc.get("session_type")),
-                remaining_focus_time=doc.get("remaining_focus_time"),
-                remaining_break_time=doc.get("remaining_break_time"),
-            )
-            for doc in session_cursor
-        ]
+        focus_sessions = [self._to_response(doc) for doc in session_cursor]
 
         return focus_sessions
 
-    def _is_previous_day(self, date1: str, date2: str) -> bool:
-        from datetime import datetime, timedelta
-        date1_obj = datetime.strptime(date1, "%m/%d/%Y")
-        date2_obj = datetime.strptime(date2, "%m/%d/%Y")
-        return date1_obj + timedelta(days=1) == date2_obj
+    def _to_response(self, doc: dict) -> GetFocusSessionResponse:
+        return GetFocusSessionResponse(
+            session_id=str(doc["_id"]),
+            session_status=SessionStatus(doc.get("session_status")),
+            start_date=doc.get("start_date"),
+            start_time=doc.get("start_time"),
+            duration=doc.get("duration"),
+            break_duration=doc.get("break_duration"),
+            session_type=SessionType(doc.get("session_type")),
+            remaining_focus_time=doc.get("remaining_focus_time"),
+            remaining_break_time=doc.get("remaining_break_time"),
+        )
 
+    def _is_modified(self, before: dict, updates: dict) -> bool:
+        return any(before.get(field) != value for field, value in updates.items())
 
-    def is_time_conflict_with_all_sessions(self, user_id: str, start_date: str, start_time: str, duration: int, break_duration: int, exclude_session_id: str = None) -> bool:
+    def _update_rollup(self, user_id: str, before: dict = None, after: dict = None):
+        """Apply the change of a session to the daily rollup."""
+        self._update_rollup_many(user_id, [rollup_updates(before, after)])
 
-        collection = self.db.get_collection("focus_timer")
+    def _update_rollup_many(self, user_id: str, updates: list[list]):
+        writes = [write for session_writes in updates for write in session_writes]
+        if writes:
+            self.db.get_collection(ROLLUP_COLLECTION).bulk_write(writes, ordered=False)
+            self.analytics_cache.invalidate(user_id)
 
+    def _conflict_query(
+        self,
+        user_id: str,
+        start_at: datetime,
+        end_at: datetime,
+        exclude_session_id: str = None,
+    ) -> dict:
+        """Query for unfinished sessions overlapping [start_at, end_at)."""
         query = {
             "user_id": user_id,
-            "session_status": {"$ne": SessionStatus.COMPLETED},
+            "session_status": {"$in": UNFINISHED_STATUSES},
+            # the lower bound keeps the index range tight, end_at does the rest
+            "start_at": {"$gt": start_at - MAX_SESSION_SPAN, "$lt": end_at},
+            "end_at": {"$gt": start_at},
         }
         if exclude_session_id:
             query["_id"] = {"$ne": ObjectId(exclude_session_id)}
+        return query
+
+    def is_time_conflict_with_all_sessions(
+        self,
+        user_id: str,
+        start_at: datetime,
+        end_at: datetime,
+        exclude_session_id: str = None,
+    ) -> bool:
+        """Check whether [start_at, end_at) overlaps another unfinished session."""
+        collection = self.db.get_collection("focus_timer")
+        query = self._conflict_query(user_id, start_at, end_at, exclude_session_id)
+        return collection.find_one(query, projection={"_id": 1}) is not None
+
+
+class AsyncFocusTimerService(FocusTimerService):
+    """class to encapsulate the focus timer service on top of AsyncMongoDB."""
+
+    def __init__(self, cfg: Config):
+        self.cfg = cfg
+        self.db = AsyncMongoDB()
+        self.analytics_cache = AnalyticsCache()
+
+    async def add_focus_session(
+        self,
+        user_id: str,
+        session_status: SessionStatus,
+        start_date: str,
+        start_time: str,
+        duration: int,
+        break_duration: int,
+        session_type: SessionType,
+        remaining_focus_time: int,
+        remaining_break_time: int,
+    ) -> (str, bool):
+        """Add focus timer."""
+        collection = self.db.get_collection("focus_timer")
+        start_at, end_at = session_window(
+            start_date, start_time, duration, break_duration
+        )
+        if await self.is_time_conflict_with_all_sessions(user_id, start_at, end_at):
+            return "", False
+
+        query = {
+            "user_id": user_id,
+            "session_status": session_status,
+            "start_date": start_date,
+            "start_time": start_time,
+            "duration": duration,
+            "break_duration": break_duration,
+            "session_type": session_type,
+            "remaining_focus_time": remaining_focus_time,
+            "remaining_break_time": remaining_break_time,
+        }
+        update = {"$setOnInsert": {**query, "start_at": start_at, "end_at": end_at}}
+        result = await collection.update_one(query, update, upsert=True)
+        if result.upserted_id is not None:
+            await self._update_rollup(user_id, after={**query, "start_at": start_at})
+        return str(result.upserted_id), True
+
+    async def add_focus_sessions(self, user_id: str, sessions: list[dict]) -> list:
+        """Add many focus timers at once, returns (session_id, ok) per session."""
+        if not sessions:
+            return []
+        collection = self.db.get_collection("focus_timer")
+        windows, query = self._plan_batch(user_id, sessions)
+        stored = await collection.find(
+            query, projection={"start_at": 1, "end_at": 1}
+        ).to_list()
+        results, docs = self._accept_batch(user_id, sessions, windows, stored)
+        if docs:
+            await collection.bulk_write([InsertOne(doc) for doc in docs])
+            await self._update_rollup_many(
+                user_id, [rollup_updates(after=doc) for doc in docs]
+            )
+        return results
+
+    async def modify_focus_session(
+        self, user_id: str, session_id: str, **updates
+    ) -> bool:
+        """Modify focus timer with optional fields."""
+        collection = self.db.get_collection("focus_timer")
+
+        if not updates:
+            return False
+
+        session = await collection.find_one(
+            {"user_id": user_id, "_id": ObjectId(session_id)}
+        )
+        if not session:
+            return False
+
+        start_date = updates.get("start_date", session["start_date"])
+        start_time = updates.get("start_time", session["start_time"])
+        duration = updates.get("duration", session["duration"])
+        break_duration = updates.get("break_duration", session["break_duration"])
+        start_at, end_at = session_window(
+            start_date, start_time, duration, break_duration
+        )
+
+        if await self.is_time_conflict_with_all_sessions(
+            user_id, start_at, end_at, exclude_session_id=session_id
+        ):
+            return "conflict"
+
+        if "session_status" in updates:
+            updates["session_status"] = updates["session_status"].value
+        if "session_type" in updates:
+            updates["session_type"] = updates["session_type"].value
+        updates["start_at"], updates["end_at"] = start_at, end_at
 
-        all_sessions = list(collection.find(query))
-
-        proposed_start_time_seconds = self._time_to_seconds(start_time)
-        proposed_end_time_seconds = proposed_start_time_seconds + (duration + break_duration) * 60
-   
-        for session in all_sessions:
-            session_start_date = session["start_date"] 
-            session_start_time = session["start_time"] 
-            session_duration = session["duration"]
-            session_break_duration = session["break_duration"]
-
-            session_start_time_seconds = self._time_to_seconds(session_start_time)
-            session_end_time_seconds = session_start_time_seconds + (session_duration + session_break_duration) * 60
-
-            if session_start_date == start_date:
-                if (proposed_start_time_seconds < session_end_time_seconds) and (proposed_end_time_seconds > session_start_time_seconds):
-                    return True
-                
-            elif self._is_previous_day(session_start_date, start_date):
-                if session_end_time_seconds > 86400:
-                    adjusted_end_time_seconds = session_end_time_seconds % 86400
-                    if proposed_start_time_seconds < adjusted_end_time_seconds:
-                        return True  
-
-            elif self._is_previous_day(start_date, session_start_date):
-                if proposed_end_time_seconds > 86400: 
-                    adjusted_proposed_end_time = proposed_end_time_seconds % 86400
-                    if adjusted_proposed_end_time > session_start_time_seconds:
-                        return True  
-
-        return False  
\ No newline at end of file
+        before = await collection.find_one_and_update(
+            {"user_id": user_id, "_id": ObjectId(session_id)},
+            {"$set": updates},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if before is None:
+            return False
+        await self._update_rollup(user_id, before=before, after={**before, **updates})
+        return self._is_modified(before, updates)
+
+    async def delete_focus_session(self, user_id: str, session_id: str) -> bool:
+        """Delete focus timer."""
+        collection = self.db.get_collection("focus_timer")
+        before = await collection.find_one_and_delete(
+            {"user_id": user_id, "_id": ObjectId(session_id)}
+        )
+        if before is None:
+            return False
+        await self._update_rollup(user_id, before=before)
+        return True
+
+    async def get_next_focus_session(self, user_id: str) -> GetFocusSessionResponse:
+        """Get next upcoming focus session."""
+        collection = self.db.get_collection("focus_timer")
+
+        session = await collection.find_one(
+            {"user_id": user_id, "session_status": 0}, sort=[("start_at", 1)]
+        )
+
+        return GetFocusSessionResponse(**session) if session else None
+
+    async def get_all_focus_session(
+        self, user_id: str, session_status: list[int] = None
+    ) -> list[GetFocusSessionResponse]:
+        """Get focus sessions of specific status, default is fetching all."""
+        collection = self.db.get_collection("focus_timer")
+
+        query = {"user_id": user_id}
+        if session_status is not None:
+            query["session_status"] = {"$in": session_status}
+
+        return [self._to_response(doc) async for doc in collection.find(query)]
+
+    async def _update_rollup(
+        self, user_id: str, before: dict = None, after: dict = None
+    ):
+        """Apply the change of a session to the daily rollup."""
+        await self._update_rollup_many(user_id, [rollup_updates(before, after)])
+
+    async def _update_rollup_many(self, user_id: str, updates: list[list]):
+        writes = [write for session_writes in updates for write in session_writes]
+        if writes:
+            await self.db.get_collection(ROLLUP_COLLECTION).bulk_write(
+                writes, ordered=False
+            )
+            await self.analytics_cache.ainvalidate(user_id)
+
+    async def is_time_conflict_with_all_sessions(
+        self,
+        user_id: str,
+        start_at: datetime,
+        end_at: datetime,
+        exclude_session_id: str = None,
+    ) -> bool:
+        """Check whether [start_at, end_at) overlaps another unfinished session."""
+        collection = self.db.get_collection("focus_timer")
+        query = self._conflict_query(user_id, start_at, end_at, exclude_session_id)
+        return await collection.find_one(query, projection={"_id": 1}) is not None
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+
+import asyncio
+import time
+import weakref
+
+import httpx
+
+from src.config import Config
+from src.metrics import Metrics
+from src.service.cache import LRUCache, token_digest
+
+
+class GoogleUnavailableError(Exception):
+    """Raised when google cannot be reached or keeps answering with errors."""
+
+
+class GoogleUserInfoClient(object):
+    """
+    class to look up google profiles from oauth access tokens.
+
+    Requests go through a keep-alive connection pool (one per event loop) with
+    strict timeouts, connection failures and 5xx responses are retried, and
+    successful lookups are cached per access token for userinfo_cache_ttl
+    seconds so repeated logins skip the round trip.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(GoogleUserInfoClient, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, "initialized"):
+            self.cfg = Config()
+            self.profiles = LRUCache(self.cfg.userinfo_cache_size)
+            self.requests = 0
+            self.request_ms = 0.0
+            self._clients = weakref.WeakKeyDictionary()
+            Metrics().register("google_userinfo", self.stats)
+            self.initialized = True
+
+    def _new_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=self.cfg.google_pool_size,
+            max_keepalive_connections=self.cfg.google_pool_size,
+            keepalive_expiry=60,
+        )
+        transport = httpx.AsyncHTTPTransport(
+            limits=limits, retries=self.cfg.google_retries
+        )
+        return httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(self.cfg.google_timeout),
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._new_client()
+            self._clients[loop] = client
+        return client
+
+    async def _fetch(self, token: str) -> httpx.Response:
+        headers = {"Authorization": f"Bearer {token}"}
+        for _ in range(self.cfg.google_retries + 1):
+            try:
+                response = await self.client.get(
+                    self.cfg.google_userinfo_url, headers=headers
+                )
+            except httpx.HTTPError as e:
+                # timeouts and connection errors, already retried by the transport
+                raise GoogleUnavailableError(str(e)) from e
+            if response.status_code < 500:
+                return response
+        raise GoogleUnavailableError(f"google answered {response.status_code}")
+
+    async def get_user(self, token: str) -> (str, str):
+        """Get user email and picture from token."""
+        key = token_digest(token)
+        profile = self.profiles.get(key)
+        if profile is not None:
+            return profile
+
+        start = time.perf_counter()
+        try:
+            response = await self._fetch(token)
+        finally:
+            self.requests += 1
+            self.request_ms += (time.perf_counter() - start) * 1000
+
+        try:
+            user_info = response.json()
+        except ValueError:
+            return "", ""
+        if not isinstance(user_info, dict) or user_info.get("email") is None:
+            return "", ""
+        profile = (user_info["email"], user_info.get("picture", ""))
+        self.profiles.put(key, profile, time.time() + self.cfg.userinfo_cache_ttl)
+        return profile
+
+    async def close(self):
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "avg_request_ms": (
+                round(self.request_ms / self.requests, 3) if self.requests else 0
+            ),
+            "profile_cache": self.profiles.stats(),
+        }
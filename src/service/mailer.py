@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+
+import queue
+import smtplib
+import socket
+import threading
+import time
+
+from src.config import Config
+from src.metrics import Metrics
+
+
+def _connection_lost(error: Exception) -> bool:
+    """Whether error means the SMTP session was lost, not the message refused."""
+    if isinstance(error, smtplib.SMTPResponseException):
+        # 421: the server is closing the session
+        return error.smtp_code == 421
+    return isinstance(
+        error, (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout)
+    )
+
+
+class _Connection:
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.sent = 0
+
+
+class SMTPPool:
+    """
+    class to deliver emails over a bounded pool of authenticated SMTP
+    sessions.
+
+    At most size sessions are open at once, each one is reused for up to
+    messages_per_connection messages before being closed, and at most
+    rate_limit messages per second are sent across the pool (0 for no
+    limit). A message whose session was dropped by the server is retried
+    once on a fresh session.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str = "",
+        password: str = "",
+        starttls: bool = True,
+        size: int = 4,
+        messages_per_connection: int = 100,
+        rate_limit: float = 0,
+        timeout: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.messages_per_connection = messages_per_connection
+        self.rate_limit = rate_limit
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._next_send = 0.0
+        self._stats = {"connects": 0, "reconnects": 0, "sent": 0, "failed": 0}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, idle=self._idle.qsize())
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def send(self, from_addr: str, to_addrs, message: str):
+        """Send message on a pooled session, blocking while all are busy."""
+        self._throttle()
+        with self._slots:
+            conn = self._checkout()
+            for attempt in range(2):
+                try:
+                    conn.server.sendmail(from_addr, to_addrs, message)
+                    break
+                except Exception as e:
+                    if not _connection_lost(e):
+                        self._checkin(conn)
+                        self._count("failed")
+                        raise
+                    self._close(conn)
+                    if attempt:
+                        self._count("failed")
+                        raise
+                    # the server dropped the session, retry on a fresh one
+                    self._count("reconnects")
+                    conn = self._connect()
+            conn.sent += 1
+            self._count("sent")
+            self._checkin(conn)
+
+    def close(self):
+        """Close every idle session."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+    def _throttle(self):
+        if self.rate_limit <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_send - now
+            self._next_send = max(now, self._next_send) + 1 / self.rate_limit
+        if wait > 0:
+            time.sleep(wait)
+
+    def _checkout(self) -> _Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _checkin(self, conn: _Connection):
+        if conn.sent >= self.messages_per_connection:
+            self._close(conn)
+        else:
+            self._idle.put(conn)
+
+    def _connect(self) -> _Connection:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        self._count("connects")
+        return _Connection(server)
+
+    def _close(self, conn: _Connection):
+        try:
+            conn.server.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.server.close()
+
+
+_smtp_pool = None
+_smtp_pool_lock = threading.Lock()
+
+
+def smtp_pool() -> SMTPPool:
+    """Process-wide SMTPPool of the configured SMTP server, created on first use."""
+    global _smtp_pool
+    with _smtp_pool_lock:
+        if _smtp_pool is None:
+            cfg = Config()
+            _smtp_pool = SMTPPool(
+                cfg.smtp_server,
+                cfg.smtp_port,
+                username=cfg.smtp_username,
+                password=cfg.smtp_password,
+                starttls=cfg.smtp_starttls,
+                size=cfg.smtp_pool_size,
+                messages_per_connection=cfg.smtp_messages_per_connection,
+                rate_limit=cfg.smtp_rate_limit,
+            )
+            Metrics().register("smtp_pool", _smtp_pool.stats)
+    return _smtp_pool
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Data migrations, run from the repository root with
+
+    python -m src.service.migrations <name>
+
+Every migration only touches documents it has not processed yet, so an
+interrupted run can simply be started again and resumes where it stopped.
+"""
+import argparse
+from datetime import timedelta
+
+from pymongo import ASCENDING, UpdateOne
+
+from src.db import INDEXES, MongoDB, unbuildable_indexes
+from src.service.analytics import AnalyticsCache
+from src.service.rollup import ROLLUP_COLLECTION, rollup_rebuild_pipeline
+from src.service.sessiontime import parse_date, session_window
+
+
+def _session_times(doc: dict) -> dict:
+    """Derive start_at/end_at of a legacy focus_timer document."""
+    duration = doc.get("duration") or 0
+    break_duration = doc.get("break_duration") or 0
+    try:
+        start_at, end_at = session_window(
+            doc["start_date"], doc["start_time"], duration, break_duration
+        )
+    except (KeyError, TypeError, ValueError):
+        try:
+            # keep the day when only the time of day is unreadable
+            start_at = parse_date(doc["start_date"])
+            end_at = start_at + timedelta(minutes=duration + break_duration)
+        except (KeyError, TypeError, ValueError):
+            # mark as processed so the backfill does not pick it up again
+            start_at, end_at = None, None
+    return {"start_at": start_at, "end_at": end_at}
+
+
+def backfill_session_times(db, batch_size: int = 1000) -> int:
+    """Write start_at/end_at on focus_timer documents that lack them."""
+    collection = db.get_collection("focus_timer")
+    projection = {"start_date": 1, "start_time": 1, "duration": 1, "break_duration": 1}
+    migrated = 0
+    query = {"start_at": {"$exists": False}}
+    while True:
+        batch = list(
+            collection.find(query, projection).sort("_id", ASCENDING).limit(batch_size)
+        )
+        if not batch:
+            return migrated
+        # resume after the batch, whether or not its documents were written
+        query["_id"] = {"$gt": batch[-1]["_id"]}
+        collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": doc["_id"], "start_at": {"$exists": False}},
+                    {"$set": _session_times(doc)},
+                )
+                for doc in batch
+            ],
+            ordered=False,
+        )
+        migrated += len(batch)
+
+
+def migrate_indexes(db) -> dict:
+    """Build the indexes of src.db.INDEXES, then drop every other index."""
+    unbuildable = unbuildable_indexes(db)
+    if unbuildable:
+        # before touching anything, the duplicates have to be merged by hand
+        raise ValueError(
+            "duplicate keys: "
+            + "; ".join(
+                f"{collection_name}.{name} {duplicates}"
+                for collection_name, name, duplicates in unbuildable
+            )
+        )
+    dropped = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = db.get_collection(collection_name)
+        # build first so the queries stay indexed during the migration
+        wanted = set(collection.create_indexes(indexes))
+        wanted.add("_id_")
+        dropped[collection_name] = []
+        for name in collection.index_information():
+            if name not in wanted:
+                collection.drop_index(name)
+                dropped[collection_name].append(name)
+    return dropped
+
+
+def rebuild_daily_rollup(db) -> int:
+    """Regenerate the focus_daily_rollup collection from the focus_timer documents."""
+    # $out swaps the collection in atomically once the aggregation is done
+    db.get_collection("focus_timer").aggregate(rollup_rebuild_pipeline())
+    rollup = db.get_collection(ROLLUP_COLLECTION)
+    rollup.create_indexes(INDEXES[ROLLUP_COLLECTION])
+    cache = AnalyticsCache()
+    cache.clear()
+    if cache.redis is None:
+        # the generations of the API are in its own process
+        print("Restart the API, it may serve analytics cached before the rebuild")
+    return rollup.count_documents({})
+
+
+MIGRATIONS = {
+    "backfill-session-times": backfill_session_times,
+    "indexes": migrate_indexes,
+    "rebuild-daily-rollup": rebuild_daily_rollup,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a data migration.")
+    parser.add_argument("name", choices=sorted(MIGRATIONS))
+    args = parser.parse_args()
+    result = MIGRATIONS[args.name](MongoDB().db)
+    print(f"{args.name}: {result}")
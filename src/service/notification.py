@@ -1,19 +1,142 @@
+import asyncio
 import base64
-import io
-import math
-import smtplib
-from collections import defaultdict
+import multiprocessing
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from email.mime.image import MIMEImage
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from zoneinfo import ZoneInfo
 
-import matplotlib.pyplot as plt
+import numpy as np
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 from src.config import Config
-from src.db import MongoDB
+from src.db import AsyncMongoDB, MongoDB
+from src.service.chartcache import (
+    CHART_BLOB_COLLECTION,
+    ChartCache,
+    blob_update,
+    chart_key,
+    content_type,
+)
+from src.service.charts import SESSION_LABELS, WEEK_ORDER, render_chart
+from src.service.mailer import smtp_pool
+from src.service.outbox import (
+    OUTBOX_COLLECTION,
+    PENDING,
+    EmailOutbox,
+    status_counts,
+    status_pipeline,
+)
+from src.service.rollup import ROLLUP_COLLECTION
+from src.service.schedule import (
+    due_at,
+    user_timezone,
+    utc_now,
+    window_bounds,
+    window_monday,
+)
+from src.service.sessiontime import local_today
+
+USER_BATCH_SIZE = 1000
+# charts submitted to the render pool ahead of the one being consumed
+CHARTS_IN_FLIGHT_PER_WORKER = 4
+# emails queued per SMTP session ahead of the one being reported
+EMAILS_IN_FLIGHT_PER_CONNECTION = 2
+# progress of every weekly summary run
+SUMMARY_RUN_COLLECTION = "weekly_summary_run"
+# weekly summary runs requested through the API, and their statuses
+SUMMARY_JOB_COLLECTION = "weekly_summary_job"
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+# charts looked up in and written to the chart cache at once
+CHART_CACHE_BATCH_SIZE = 100
+# rendered summaries written to the email outbox at once
+OUTBOX_WRITE_BATCH_SIZE = 100
+WEEK_FORMAT = "%Y-%m-%d"
+
+
+def summary_week(today: datetime = None) -> str:
+    """
+    Key of the weekly summary sent on today, the current local day by
+    default: its last Sunday before today, the summary covering the Monday to
+    Sunday week it ends. Every day of the week after shares the same key.
+    """
+    today = today or local_today()
+    return (today - timedelta(days=today.weekday() + 1)).strftime(WEEK_FORMAT)
+
+
+def _batches(iterable, size: int):
+    """Yield lists of up to size items of iterable."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+_chart_pool = None
+_chart_pool_lock = threading.Lock()
+
+
+def chart_pool():
+    """
+    Process pool the weekly charts are rendered on, started on first use with
+    chart_workers processes. None when chart_workers is 0, in which case
+    charts are rendered in the calling process, and in daemon processes such
+    as the children of Celery's prefork pool, which cannot start processes
+    of their own: there the charts scale with the worker concurrency.
+    """
+    global _chart_pool
+    workers = Config().chart_workers
+    if workers <= 0 or multiprocessing.current_process().daemon:
+        return None
+    with _chart_pool_lock:
+        if _chart_pool is None:
+            # spawned rather than forked, the parent holds MongoDB client threads
+            _chart_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _chart_pool
+
+
+def render_charts(pool: ProcessPoolExecutor, matrices, window: int):
+    """
+    Yields render_chart of every matrix, in order, rendered on pool. At most
+    window charts are queued or done but not yet consumed, so a slow consumer
+    holds the pool back instead of piling up charts.
+    """
+    pending = deque()
+    for matrix in matrices:
+        pending.append(pool.submit(render_chart, matrix))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def week_matrices(users, days, session_types, minutes, n_users: int):
+    """
+    Sum columnar (user index, weekday, session type, minutes) rows into one
+    7 day x 4 session type minutes matrix per user, in one pass for all
+    users. Also returns which days of each user had any rows.
+    """
+    cells = (users * 7 + days) * 4 + session_types
+    totals = np.bincount(cells, weights=minutes, minlength=n_users * 28)
+    active = np.bincount(users * 7 + days, minlength=n_users * 7)
+    return (
+        totals.astype(np.int64).reshape(n_users, 7, 4),
+        active.reshape(n_users, 7) > 0,
+    )
 
 
 class NotificationService(object):
@@ -35,99 +158,74 @@ class NotificationService(object):
         """Update user notification status"""
         collection = self.db.get_collection("user")
         query_filter = {"_id": ObjectId(user_id)}
-        print(user_id, notification_type, enabled)
-        if notification_type == "browser":
-            update_operation = {"$set": {"notification.browser": enabled}}
-        elif notification_type == "email":
-            update_operation = {"$set": {"notification.email_notification": enabled}}
-        else:
-            raise ValueError(f"Unrecognized notification type: {notification_type}")
-
+        update_operation = self._notification_update(notification_type, enabled)
         result = collection.update_one(query_filter, update_operation)
         return result.modified_count > 0
 
+    def _notification_update(self, notification_type: str, enabled: bool) -> dict:
+        if notification_type == "browser":
+            return {"$set": {"notification.browser": enabled}}
+        elif notification_type == "email":
+            return {"$set": {"notification.email_notification": enabled}}
+        raise ValueError(f"Unrecognized notification type: {notification_type}")
+
     def generate_stacked_bar_chart(self, day_data: dict) -> (str, str):
         """
         Generates a stacked bar chart from the provided data.
         day_data is a dict mapping day names to another dict of session types and durations.
-        Returns a base64-encoded PNG and the day with the highest total duration.
+        Returns the base64-encoded chart image and the day with the highest total duration.
         """
         if len(day_data) == 0:
             return "", ""
-        # Define the expected order and labels
-        week_order = [
-            "Monday",
-            "Tuesday",
-            "Wednesday",
-            "Thursday",
-            "Friday",
-            "Saturday",
-            "Sunday",
-        ]
-        session_labels = {0: "WORK", 1: "STUDY", 2: "PERSONAL", 3: "OTHER"}
-        session_types = [0, 1, 2, 3]
-
-        days = week_order
-
-        # Prepare the data for each session type per day
-        values = {stype: [] for stype in session_types}
-        total_per_day = []
-        for day in days:
-            day_totals = day_data.get(day, {0: 0, 1: 0, 2: 0, 3: 0})
-            day_sum = 0
-            for stype in session_types:
-                duration = day_totals.get(stype, 0)
-                values[stype].append(duration)
-                day_sum += duration
-            total_per_day.append(day_sum)
-
-        if all(total == 0 for total in total_per_day):
-            max_day = days[0]
-        else:
-            max_day = days[total_per_day.index(max(total_per_day))]
-
-        # Create the stacked bar chart
-        fig, ax = plt.subplots(figsize=(8, 4))
-        bar_width = 0.6
-        indices = range(len(days))
-
-        bottom = [0] * len(days)
-        for stype in session_types:
-            ax.bar(
-                indices,
-                values[stype],
-                bar_width,
-                bottom=bottom,
-                label=session_labels[stype],
-            )
-
-            bottom = [b + v for b, v in zip(bottom, values[stype])]
-
-        ax.set_xticks(indices)
-        ax.set_xticklabels(days)
-        ax.set_ylabel("Total Duration (minutes)")
-        ax.set_title("Weekly Focus Sessions Summary")
-        ax.legend()
-
-        max_total = max(total_per_day) if total_per_day else 0
-        ax.set_ylim([0, max_total * 1.2 if max_total > 0 else 1])
-
-        # Save the figure to a buffer
-        buf = io.BytesIO()
-        fig.tight_layout()
-        fig.savefig(buf, format="png")
-        plt.close(fig)
-        buf.seek(0)
-        img_str = base64.b64encode(buf.read()).decode("utf-8")
-        return img_str, max_day
+        matrix = np.zeros((len(WEEK_ORDER), len(SESSION_LABELS)), dtype=np.int64)
+        for day, type_data in day_data.items():
+            for stype, duration in type_data.items():
+                matrix[WEEK_ORDER.index(day), stype] = duration
+        chart, max_day = self._render_chart(matrix)
+        return base64.b64encode(chart).decode("utf-8"), max_day
+
+    def _render_chart(self, matrix: np.ndarray) -> (bytes, str):
+        """Renders the chart of a week in the calling process."""
+        return render_chart(matrix)
+
+    def _render_charts(self, matrices: np.ndarray):
+        """
+        Yields the rendered chart of every 7x4 matrix, in order, fanned out
+        across the chart render pool when one is configured.
+        """
+        pool = chart_pool()
+        if pool is None:
+            return map(self._render_chart, matrices)
+        return render_charts(
+            pool, matrices, Config().chart_workers * CHARTS_IN_FLIGHT_PER_WORKER
+        )
 
     def send_email(
         self, to_email: str, chart_b64: str, max_day: str, summary_text: str
     ):
         """
         Sends an email with the provided summary and stacked bar chart image embedded.
-        SMTP settings are read from environment variables.
+        SMTP settings are read from environment variables, the email goes out
+        on the process-wide pool of SMTP sessions.
         """
+        chart = base64.b64decode(chart_b64)
+        msg = self.compose_email(to_email, chart, max_day, summary_text)
+        self._deliver(to_email, msg)
+
+    def send_summary(self, summary: dict):
+        """Sends the email of a weekly summary as built by iter_weekly_summaries."""
+        msg = self.compose_email(
+            summary["email"],
+            summary["chart"],
+            summary["max_day"],
+            summary["summary_text"],
+        )
+        self._deliver(summary["email"], msg)
+
+    def compose_email(
+        self, to_email: str, chart: bytes, max_day: str, summary_text: str
+    ) -> MIMEMultipart:
+        """Builds the weekly summary email with the chart image embedded."""
         msg = MIMEMultipart("related")
         msg["Subject"] = "Your Weekly Focus Sessions Summary"
         msg["From"] = self.cfg.from_email
@@ -148,106 +246,624 @@ class NotificationService(object):
         msg_alternative.attach(MIMEText(html, "html"))
 
         # Attach the stacked bar chart image
-        img_data = base64.b64decode(chart_b64)
-        image = MIMEImage(img_data, name="chart.png")
+        if chart.startswith(b"<svg"):
+            image = MIMEImage(chart, "svg+xml", name="chart.svg")
+        else:
+            image = MIMEImage(chart, name="chart.png")
         image.add_header("Content-ID", "<chart>")
         msg.attach(image)
+        return msg
 
-        # Send email using SMTP with TLS
-        with smtplib.SMTP(self.cfg.smtp_server, self.cfg.smtp_port) as server:
-            server.starttls()
-            server.login(self.cfg.smtp_username, self.cfg.smtp_password)
-            server.sendmail(self.cfg.from_email, to_email, msg.as_string())
+    def _deliver(self, to_email: str, msg: MIMEMultipart):
+        smtp_pool().send(self.cfg.from_email, to_email, msg.as_string())
 
     def aggregate_weekly_summary(self):
         """
-        Queries the database for users with email notifications enabled,
-        aggregates their completed focus sessions over the past week into a summary,
-        and returns a list of dictionaries containing the email, the base64-encoded
-        stacked bar chart, the day with the highest focus, and summary text.
-        """
-        user_collection = self.db.get_collection("user")
-        focus_collection = self.db.get_collection("focus_timer")
-        today = datetime.now(ZoneInfo("America/Toronto"))
-        last_week = today - timedelta(days=7)
-        summaries = []
-
-        # Find users with email notifications enabled.
-        users = list(user_collection.find({"notification.email_notification": True}))
-        for user in users:
-            user_id = str(user["_id"])
-            email = user["email"]
-
-            # Query completed sessions for this user
-            sessions = list(
-                focus_collection.find({"user_id": user_id, "session_status": 3})
+        Aggregates the daily focus rollup over the last full week of every user
+        with email notifications enabled into a summary, and returns a list of
+        dictionaries containing the email, the stacked bar chart image, the day with the highest focus, and summary text.
+        """
+        return list(self.iter_weekly_summaries())
+
+    def iter_weekly_summaries(self, week: str = None, user_ids: list = None):
+        """
+        Yields the weekly summaries one at a time. Every stage pulls from the
+        previous one only when it needs more, so at most one batch of users
+        and one rendered chart are held in memory whatever the user count.
+        week is the summary_week of the run, the current one by default, and
+        user_ids restricts the summaries to these users.
+        """
+        for batch in _batches(self._weeks(week, user_ids), USER_BATCH_SIZE):
+            yield from self._summarize_batch(batch)
+
+    def _weeks(self, week: str = None, user_ids: list = None):
+        """Streams the week of every subscribed user."""
+        rollup_collection = self.db.get_collection(ROLLUP_COLLECTION)
+        # one aggregation, fetched from the server a batch at a time
+        pipeline = self._weekly_summary_pipeline(week, user_ids)
+        return rollup_collection.aggregate(pipeline, batchSize=USER_BATCH_SIZE)
+
+    def iter_subscriber_chunks(self, week: str, size: int, user_ids: list = None):
+        """
+        Yields the ids of the users the weekly summary of week goes to, of
+        user_ids only when given, in lists of up to size ids.
+        """
+        rollup_collection = self.db.get_collection(ROLLUP_COLLECTION)
+        pipeline = [
+            self._week_match(week, user_ids),
+            {"$group": {"_id": "$user_id"}},
+            *self._subscriber_stages(),
+            {"$project": {"_id": 1}},
+        ]
+        users = rollup_collection.aggregate(pipeline, batchSize=size)
+        for batch in _batches(users, size):
+            yield [user["_id"] for user in batch]
+
+    def _week_match(self, week: str = None, user_ids: list = None) -> dict:
+        """$match stage of the rollup days of week with sessions."""
+        # the Monday to Sunday week ending on the key, the last full week of
+        # summary_week by default, like the charts and outbox of the run
+        sunday = datetime.strptime(week or summary_week(), WEEK_FORMAT)
+        query = {
+            "day": {
+                "$gte": sunday - timedelta(days=6),
+                "$lt": sunday + timedelta(days=1),
+            },
+            "sessions": {"$gt": 0},
+        }
+        if user_ids is not None:
+            query["user_id"] = {"$in": user_ids}
+        return {"$match": query}
+
+    def _subscriber_stages(self) -> list:
+        """
+        Stages joining documents grouped by user id with their user, keeping
+        the users who have email notifications enabled.
+        """
+        return [
+            {
+                "$addFields": {
+                    "user_oid": {
+                        "$convert": {"input": "$_id", "to": "objectId", "onError": None}
+                    }
+                }
+            },
+            {
+                "$lookup": {
+                    "from": "user",
+                    "localField": "user_oid",
+                    "foreignField": "_id",
+                    "as": "user",
+                }
+            },
+            {"$unwind": "$user"},
+            {"$match": {"user.notification.email_notification": True}},
+        ]
+
+    def _weekly_summary_pipeline(self, week: str = None, user_ids: list = None) -> list:
+        """
+        Pipeline matching the rollup days of week, grouped per user
+        and joined with the users who have email notifications enabled.
+        """
+        return [
+            self._week_match(week, user_ids),
+            {
+                "$group": {
+                    "_id": "$user_id",
+                    "days": {
+                        "$push": {
+                            "day": "$day",
+                            "session_type": "$session_type",
+                            "focus_minutes": "$focus_minutes",
+                        }
+                    },
+                }
+            },
+            *self._subscriber_stages(),
+            {
+                "$project": {
+                    "_id": 0,
+                    "user_id": "$_id",
+                    "email": "$user.email",
+                    "days": 1,
+                }
+            },
+        ]
+
+    def _week_matrices(self, weeks: list) -> (np.ndarray, np.ndarray):
+        """Computes the minutes matrices of a batch of users' weeks."""
+        columns = [[], [], [], []]
+        for i, week in enumerate(weeks):
+            for row in week["days"]:
+                columns[0].append(i)
+                columns[1].append(row["day"].weekday())
+                columns[2].append(row["session_type"])
+                columns[3].append(row["focus_minutes"])
+        return week_matrices(
+            *(np.array(column, dtype=np.int64) for column in columns), len(weeks)
+        )
+
+    def _summarize_batch(self, weeks: list):
+        """
+        Yields the weekly summaries of a batch of users from their rollup
+        days, as their charts come out of the chart cache.
+        """
+        matrices, active_days = self._week_matrices(weeks)
+        charts = self._cached_charts(matrices)
+        for i, (user_week, (chart_id, chart)) in enumerate(zip(weeks, charts)):
+            yield self._summarize_week(
+                user_week, matrices[i], active_days[i], chart, chart_id
             )
 
-            # Filter sessions within the past week
-            sessions_in_week = []
-            for s in sessions:
-                try:
-                    session_date = datetime.strptime(
-                        s["start_date"], "%m/%d/%Y"
-                    ).replace(tzinfo=ZoneInfo("America/Toronto"))
-                    if last_week <= session_date <= today:
-                        sessions_in_week.append(s)
-                except Exception as e:
-                    print(f"Error parsing date for session {s['_id']}: {e}")
+    def _cached_charts(self, matrices: np.ndarray):
+        """
+        Yields the (chart id, chart) of the 7x4 matrix of every user's week
+        of a batch, in order, from the chart cache. Only the charts it misses
+        are rendered, once per distinct matrix.
+        """
+        cache = ChartCache(self.db)
+        backend = Config().chart_backend
+        for start in range(0, len(matrices), CHART_CACHE_BATCH_SIZE):
+            part = matrices[start : start + CHART_CACHE_BATCH_SIZE]
+            keys = [chart_key(matrix, backend) for matrix in part]
+            charts = cache.get_many(set(keys))
+            missing = {}
+            for key, matrix in zip(keys, part):
+                if key not in charts:
+                    missing.setdefault(key, matrix)
+            rendered = dict(zip(missing, self._render_charts(missing.values())))
+            cache.put_many(rendered)
+            charts.update(rendered)
+            for key in keys:
+                yield key, charts[key]
+
+    def _summarize_week(
+        self,
+        week: dict,
+        matrix: np.ndarray,
+        active_days: np.ndarray,
+        chart: tuple,
+        chart_id: str = None,
+    ) -> dict:
+        """
+        Builds the weekly summary of a single user from their week as read by
+        the pipeline, their 7 day x 4 session type minutes matrix, the days
+        they had sessions on and their rendered chart with its day with the
+        highest focus, and its id in the chart cache if it is cached.
+        """
+        summary_lines = []
+        for day in np.flatnonzero(active_days):
+            type_data = matrix[day]
+            summary_lines.append(
+                f"{WEEK_ORDER[day]}: {type_data.sum()} minute(s)  [WORK: {type_data[0]}, STUDY: {type_data[1]}, PERSONAL: {type_data[2]}, OTHER: {type_data[3]}]"
+            )
+        summary_text = "\n".join(summary_lines)
+        image, max_day = chart
+
+        return {
+            "user_id": week.get("user_id"),
+            "email": week["email"],
+            "chart_id": chart_id,
+            "chart": image,
+            "max_day": max_day,
+            "summary_text": summary_text,
+        }
+
+    def _send_summaries(self, summaries):
+        """
+        Sends summaries on as many threads as there are pooled SMTP sessions,
+        and yields (email, None) once sent or (email, error), in order.
+        """
+        senders = Config().smtp_pool_size
+        window = senders * EMAILS_IN_FLIGHT_PER_CONNECTION
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=senders, thread_name_prefix="smtp") as pool:
+            for summary in summaries:
+                pending.append(
+                    (summary["email"], pool.submit(self.send_summary, summary))
+                )
+                if len(pending) >= window:
+                    yield self._sent(*pending.popleft())
+            while pending:
+                yield self._sent(*pending.popleft())
+
+    def _sent(self, email: str, sent) -> (str, Exception):
+        try:
+            sent.result()
+            return email, None
+        except Exception as e:
+            return email, e
+
+    def _outbox(self) -> EmailOutbox:
+        cfg = Config()
+        return EmailOutbox(
+            self.db,
+            lease_seconds=cfg.outbox_lease_seconds,
+            max_attempts=cfg.outbox_max_attempts,
+            retry_delay=cfg.summary_retry_delay,
+        )
+
+    def enqueue_weekly_summaries(self, week: str, user_ids: list) -> int:
+        """
+        Renders the weekly summary of week of the users of user_ids who are
+        not in the email outbox yet into it, and returns how many were added.
+        """
+        outbox = self._outbox()
+        queued = outbox.queued_users(week, user_ids)
+        user_ids = [user_id for user_id in user_ids if user_id not in queued]
+        if not user_ids:
+            return 0
+        enqueued = 0
+        summaries = self.iter_weekly_summaries(week, user_ids)
+        for batch in _batches(summaries, OUTBOX_WRITE_BATCH_SIZE):
+            enqueued += outbox.enqueue(week, batch)
+        return enqueued
+
+    def drain_outbox(self, week: str = None, user_ids: list = None) -> dict:
+        """
+        Sends the email outbox entries that can be claimed, optionally of
+        week and user_ids only, until none is left. Returns how many were
+        sent, released to be retried later and failed for good.
+        """
+        outbox = self._outbox()
+        batch_size = Config().outbox_claim_batch
+        counts = {"sent": 0, "retry": 0, "failed": 0}
+        while True:
+            entries = outbox.claim(batch_size, week, user_ids)
+            if not entries:
+                return counts
+            charts = self._outbox_charts(entries)
+            for entry in entries:
+                if entry["payload"]["chart_id"] not in charts:
+                    error = LookupError("the chart could not be rendered again")
+                    self._outbox_failed(outbox, entry, error, counts)
+            entries = [
+                entry for entry in entries if entry["payload"]["chart_id"] in charts
+            ]
+            summaries = (self._outbox_summary(entry, charts) for entry in entries)
+            for entry, (email, error) in zip(entries, self._send_summaries(summaries)):
+                if error is None:
+                    outbox.mark_sent(entry)
+                    counts["sent"] += 1
                     continue
+                self._outbox_failed(outbox, entry, error, counts)
 
-            if not sessions_in_week:
+    def _outbox_charts(self, entries: list) -> dict:
+        """
+        Chart and max_day of the outbox entries by chart_id, rendering again
+        the charts evicted from the chart cache. The charts of users left
+        without sessions for the week are missing.
+        """
+        charts = ChartCache(self.db).get_many(
+            {entry["payload"]["chart_id"] for entry in entries}
+        )
+        for entry in entries:
+            chart_id = entry["payload"]["chart_id"]
+            if chart_id in charts:
                 continue
+            chart = self.weekly_chart(entry["user_id"], entry["week"])
+            if chart is not None:
+                charts[chart_id] = (chart["chart"], chart["max_day"])
+        return charts
+
+    def _outbox_failed(self, outbox, entry: dict, error: Exception, counts: dict):
+        print(f"Failed to send email to {entry['email']}: {error}")
+        status = outbox.mark_failed(entry, error)
+        counts["retry" if status == PENDING else "failed"] += 1
+
+    def _outbox_summary(self, entry: dict, charts: dict) -> dict:
+        payload = entry["payload"]
+        chart, _ = charts[payload["chart_id"]]
+        return {
+            "email": entry["email"],
+            "chart": chart,
+            "max_day": payload["max_day"],
+            "summary_text": payload["summary_text"],
+        }
+
+    def start_summary_run(self, week: str, users: int, chunks: int):
+        """
+        Adds the users and chunks enqueued for the weekly summary run of week
+        to its progress, a rerun of the same week adding its own.
+        """
+        self.db.get_collection(SUMMARY_RUN_COLLECTION).update_one(
+            {"_id": week},
+            {
+                "$inc": {"users": users, "chunks": chunks},
+                "$setOnInsert": {"started_at": datetime.now()},
+            },
+            upsert=True,
+        )
+
+    def schedule_weekly_summaries(self, dispatch, now: datetime = None) -> dict:
+        """
+        Passes the users whose weekly summary fell due since the previous
+        call to dispatch(week, user_ids), in chunks of summary_chunk_size ids.
+        A user is due at the start of their bucket of the delivery window,
+        which opens on Monday at midnight in their time zone. Meant to run
+        once per bucket; a call that was missed is caught up by the next one.
+        """
+        cfg = Config()
+        now = now or utc_now()
+        window = timedelta(hours=cfg.summary_window_hours)
+        monday = window_monday(now)
+        week = summary_week(monday)
+        opens, closes = window_bounds(monday, window)
+        counts = {"week": week, "users": 0, "chunks": 0}
+        if now < opens:
+            return counts
+        until = min(now, closes)
+        claimed, since = self._claim_schedule(week, until)
+        if not claimed:
+            return counts
+        try:
+            due = self._due_subscribers(week, monday, window, since, until)
+            for user_ids in _batches(due, cfg.summary_chunk_size):
+                dispatch(week, user_ids)
+                counts["users"] += len(user_ids)
+                counts["chunks"] += 1
+        except Exception:
+            # dispatch the whole interval again next time, the outbox skips
+            # the users already sent to
+            self.db.get_collection(SUMMARY_RUN_COLLECTION).update_one(
+                {"_id": week, "scheduled_until": until},
+                {"$set": {"scheduled_until": since}},
+            )
+            raise
+        finally:
+            self.start_summary_run(week, counts["users"], counts["chunks"])
+        return counts
 
-            # day_data maps day_name -> { session_type -> total duration }
-            day_data = defaultdict(lambda: {0: 0, 1: 0, 2: 0, 3: 0})
-            for s in sessions_in_week:
-                try:
-                    session_date = datetime.strptime(s["start_date"], "%m/%d/%Y")
-                    day_name = session_date.strftime("%A")
-                    stype = s.get("session_type", 3)
-                    day_data[day_name][stype] += s.get("duration", 0) - (
-                        math.floor(s.get("remaining_focus_time", 0) / 60)
-                    )
-                except Exception as e:
-                    print(f"Error processing session {s['_id']}: {e}")
-                    continue
+    def _claim_schedule(self, week: str, until: datetime) -> (bool, datetime):
+        """
+        Moves the schedule of the run of week up to until. Returns whether it
+        did, False if it already was there or another scheduler moved it
+        first, and where it was, None for nowhere yet.
+        """
+        runs = self.db.get_collection(SUMMARY_RUN_COLLECTION)
+        run = runs.find_one({"_id": week}, {"scheduled_until": 1}) or {}
+        since = run.get("scheduled_until")
+        if since is not None and since >= until:
+            return False, since
+        try:
+            result = runs.update_one(
+                {"_id": week, "scheduled_until": since},
+                {
+                    "$set": {"scheduled_until": until},
+                    "$setOnInsert": {"started_at": datetime.now()},
+                },
+                upsert=since is None,
+            )
+        except DuplicateKeyError:
+            return False, since
+        return bool(result.modified_count or result.upserted_id), since
+
+    def _due_subscribers(
+        self,
+        week: str,
+        monday: datetime,
+        window: timedelta,
+        since: datetime,
+        until: datetime,
+    ):
+        """Yields the ids of the subscribers of week due in (since, until]."""
+        buckets = Config().summary_buckets
+        rollup_collection = self.db.get_collection(ROLLUP_COLLECTION)
+        pipeline = [
+            self._week_match(week),
+            {"$group": {"_id": "$user_id"}},
+            *self._subscriber_stages(),
+            {"$project": {"_id": 1, "timezone": "$user.timezone"}},
+        ]
+        for user in rollup_collection.aggregate(pipeline, batchSize=USER_BATCH_SIZE):
+            tz = user_timezone(user.get("timezone"))
+            due = due_at(user["_id"], tz, monday, window, buckets)
+            if (since is None or due > since) and due <= until:
+                yield user["_id"]
 
-            summary_lines = []
-            for day, type_data in day_data.items():
-                total = sum(type_data.values())
-                summary_lines.append(
-                    f"{day}: {total} minute(s)  [WORK: {type_data.get(0, 0)}, STUDY: {type_data.get(1, 0)}, PERSONAL: {type_data.get(2, 0)}, OTHER: {type_data.get(3, 0)}]"
-                )
-            summary_text = "\n".join(summary_lines)
+    def record_summary_chunk(self, week: str, job_id: str = None):
+        """
+        Counts a finished chunk in the progress of the weekly summary run of
+        week, and of the job it was sent by if any.
+        """
+        self.db.get_collection(SUMMARY_RUN_COLLECTION).update_one(
+            {"_id": week}, {"$inc": {"chunks_done": 1}}, upsert=True
+        )
+        if job_id is not None:
+            self.db.get_collection(SUMMARY_JOB_COLLECTION).update_one(
+                {"_id": job_id}, {"$inc": {"chunks_done": 1}}
+            )
+
+    def weekly_summary_progress(self, week: str = None) -> dict:
+        """
+        Progress of the weekly summary run of week, the current one by
+        default, with its email outbox entries per status.
+        """
+        week = week or summary_week()
+        run = self.db.get_collection(SUMMARY_RUN_COLLECTION).find_one({"_id": week})
+        run = run or {}
+        return {
+            "week": week,
+            "users": run.get("users", 0),
+            "chunks": run.get("chunks", 0),
+            "chunks_done": run.get("chunks_done", 0),
+            **self._outbox().status_counts(week),
+        }
+
+    def weekly_chart(self, user_id: str, week: str = None) -> dict:
+        """
+        Gets the chart of user_id for week, the last full week by default,
+        from the chart cache, rendering and caching it first if it is not
+        there. Returns its chart_id, chart, content_type and max_day, None if
+        the user had no sessions that week.
+        """
+        week = week or summary_week()
+        rollup_collection = self.db.get_collection(ROLLUP_COLLECTION)
+        pipeline = self._user_week_pipeline(week, user_id)
+        days = list(rollup_collection.aggregate(pipeline))
+        if not days:
+            return None
+        matrices, _ = self._week_matrices([{"days": days}])
+        chart_id, (chart, max_day) = next(self._cached_charts(matrices))
+        return self._weekly_chart(chart_id, chart, max_day)
+
+    def _user_week_pipeline(self, week: str, user_id: str) -> list:
+        """Pipeline of the rollup days of week of user_id with sessions."""
+        return [
+            self._week_match(week, [user_id]),
+            {"$project": {"_id": 0, "day": 1, "session_type": 1, "focus_minutes": 1}},
+        ]
 
-            # Generate the stacked bar chart and determine the day with the highest focus.
-            chart_b64, max_day = self.generate_stacked_bar_chart(day_data)
+    def _weekly_chart(self, chart_id: str, chart: bytes, max_day: str) -> dict:
+        return {
+            "chart_id": chart_id,
+            "chart": chart,
+            "content_type": content_type(chart),
+            "max_day": max_day,
+        }
 
-            summaries.append(
-                {
-                    "email": email,
-                    "chart_b64": chart_b64,
-                    "max_day": max_day,
-                    "summary_text": summary_text,
+    def create_summary_job(self, requested_by: str, user_ids: list = None) -> dict:
+        """
+        Records a job sending the weekly summary of the current week to the
+        users of user_ids, every subscriber when None, on behalf of the user
+        requested_by, and returns its progress. weekly_summary_task runs it.
+        """
+        job = self._new_summary_job(requested_by, user_ids)
+        self.db.get_collection(SUMMARY_JOB_COLLECTION).insert_one(job)
+        return self._summary_job_progress(job, status_counts([]))
+
+    def _new_summary_job(self, requested_by: str, user_ids: list = None) -> dict:
+        return {
+            "_id": uuid.uuid4().hex,
+            "requested_by": requested_by,
+            "user_ids": user_ids,
+            "week": summary_week(),
+            "status": JOB_QUEUED,
+            "users": 0,
+            "chunks": 0,
+            "chunks_done": 0,
+            "created_at": datetime.now(),
+        }
+
+    def find_summary_job(self, job_id: str) -> dict:
+        """Get the job document of job_id, None if there is none."""
+        return self.db.get_collection(SUMMARY_JOB_COLLECTION).find_one({"_id": job_id})
+
+    def start_summary_job(self, job_id: str, users: int, chunks: int):
+        """Records the users and chunks the job of job_id was split into."""
+        self.db.get_collection(SUMMARY_JOB_COLLECTION).update_one(
+            {"_id": job_id},
+            {
+                "$set": {
+                    "status": JOB_RUNNING,
+                    "users": users,
+                    "chunks": chunks,
+                    "started_at": datetime.now(),
                 }
-            )
-        return summaries
+            },
+        )
+
+    def fail_summary_job(self, job_id: str, error: Exception):
+        """Records that the job of job_id could not be split into chunks."""
+        self.db.get_collection(SUMMARY_JOB_COLLECTION).update_one(
+            {"_id": job_id}, {"$set": {"status": JOB_FAILED, "error": str(error)}}
+        )
 
-    def weekly_summary_job(self):
+    def get_summary_job(self, job_id: str) -> dict:
         """
-        This job aggregates weekly summaries and sends emails to users.
+        Progress of the job of job_id with the email outbox entries of its
+        users per status, None if there is no such job.
         """
-        print("Running weekly summary job...")
-        summaries = self.aggregate_weekly_summary()
-        for summary in summaries:
-            try:
-                self.send_email(
-                    summary["email"],
-                    summary["chart_b64"],
-                    summary["max_day"],
-                    summary["summary_text"],
-                )
-                print(f"Email sent to {summary['email']}")
-            except Exception as e:
-                print(f"Failed to send email to {summary['email']}: {e}")
+        job = self.find_summary_job(job_id)
+        if job is None:
+            return None
+        outbox = self.db.get_collection(OUTBOX_COLLECTION)
+        rows = outbox.aggregate(status_pipeline(job["week"], job["user_ids"]))
+        return self._summary_job_progress(job, status_counts(rows))
+
+    def _summary_job_progress(self, job: dict, counts: dict) -> dict:
+        status = job["status"]
+        if status == JOB_RUNNING and job["chunks_done"] >= job["chunks"]:
+            status = JOB_DONE
+        return {
+            "job_id": job["_id"],
+            "requested_by": job["requested_by"],
+            "week": job["week"],
+            "job_status": status,
+            "users": job["users"],
+            "chunks": job["chunks"],
+            "chunks_done": job["chunks_done"],
+            **counts,
+        }
+
+
+class AsyncNotificationService(NotificationService):
+    """class to handle notification management on top of AsyncMongoDB"""
+
+    def __init__(self, cfg: Config):
+        self.cfg = cfg
+        self.db = AsyncMongoDB()
+
+    async def get_notification(self, user_id: str):
+        """List the user notification settings"""
+        collection = self.db.get_collection("user")
+        user_data = await collection.find_one({"_id": ObjectId(user_id)})
+        return user_data["notification"]
+
+    async def update_notification(
+        self, user_id: str, notification_type: str, enabled: bool
+    ):
+        """Update user notification status"""
+        collection = self.db.get_collection("user")
+        query_filter = {"_id": ObjectId(user_id)}
+        update_operation = self._notification_update(notification_type, enabled)
+        result = await collection.update_one(query_filter, update_operation)
+        return result.modified_count > 0
+
+    async def create_summary_job(
+        self, requested_by: str, user_ids: list = None
+    ) -> dict:
+        """Same as NotificationService.create_summary_job."""
+        job = self._new_summary_job(requested_by, user_ids)
+        await self.db.get_collection(SUMMARY_JOB_COLLECTION).insert_one(job)
+        return self._summary_job_progress(job, status_counts([]))
+
+    async def get_summary_job(self, job_id: str) -> dict:
+        """Same as NotificationService.get_summary_job."""
+        job = await self.db.get_collection(SUMMARY_JOB_COLLECTION).find_one(
+            {"_id": job_id}
+        )
+        if job is None:
+            return None
+        outbox = self.db.get_collection(OUTBOX_COLLECTION)
+        rows = await outbox.aggregate(status_pipeline(job["week"], job["user_ids"]))
+        counts = status_counts([row async for row in rows])
+        return self._summary_job_progress(job, counts)
+
+    async def weekly_chart(self, user_id: str, week: str = None) -> dict:
+        """
+        Same as NotificationService.weekly_chart, rendering the chart off the
+        event loop when it is not cached.
+        """
+        week = week or summary_week()
+        rollup_collection = self.db.get_collection(ROLLUP_COLLECTION)
+        pipeline = self._user_week_pipeline(week, user_id)
+        rows = await rollup_collection.aggregate(pipeline)
+        days = [row async for row in rows]
+        if not days:
+            return None
+        matrices, _ = self._week_matrices([{"days": days}])
+        chart_id = chart_key(matrices[0], Config().chart_backend)
+        blobs = self.db.get_collection(CHART_BLOB_COLLECTION)
+        blob = await blobs.find_one({"_id": chart_id})
+        if blob is None:
+            chart, max_day = await self._schedule_chart(chart_pool(), matrices[0])
+            await blobs.update_one(*blob_update(chart_id, chart, max_day), upsert=True)
+        else:
+            chart, max_day = bytes(blob["data"]), blob["max_day"]
+        return self._weekly_chart(chart_id, chart, max_day)
+
+    def _schedule_chart(self, pool, matrix: np.ndarray) -> asyncio.Future:
+        if pool is None:
+            return asyncio.ensure_future(asyncio.to_thread(self._render_chart, matrix))
+        return asyncio.wrap_future(pool.submit(render_chart, matrix))
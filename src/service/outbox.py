@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Email outbox: one document per (user, week) weekly summary email, written
+when the summary is rendered and drained by the senders.
+
+An entry goes from pending to sending when a sender claims it, with a lease
+that expires after lease_seconds, then to sent, or back to pending when
+sending fails, claimable again after retry_delay seconds doubling on every
+attempt (failed once max_attempts attempts were made). An entry whose
+sender died is claimed again once its lease expired, so any number of
+senders can share the backlog and a restarted one resumes with what is left.
+The rendered email lives in EMAIL_PAYLOAD_COLLECTION, referenced by the
+entry's payload_id and written before the entry, so that every entry can be
+sent. Its chart is referenced by chart_id from the chart cache.
+"""
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+OUTBOX_COLLECTION = "email_outbox"
+EMAIL_PAYLOAD_COLLECTION = "email_payload"
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+STATUSES = (PENDING, SENDING, SENT, FAILED)
+
+
+def outbox_key(user_id: str, week: str) -> str:
+    """Key of the outbox entry and payload of the summary of user_id for week."""
+    return f"{week}:{user_id}"
+
+
+def status_pipeline(week: str, user_ids: list = None) -> list:
+    """Pipeline counting the entries of week, optionally of user_ids, per status."""
+    query = {"week": week}
+    if user_ids is not None:
+        query["user_id"] = {"$in": user_ids}
+    return [
+        {"$match": query},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+    ]
+
+
+def status_counts(rows) -> dict:
+    """Number of entries per status, from the rows of status_pipeline."""
+    counts = dict.fromkeys(STATUSES, 0)
+    for row in rows:
+        counts[row["_id"]] = row["count"]
+    return counts
+
+
+class EmailOutbox:
+    """class to encapsulate the email outbox collections."""
+
+    def __init__(
+        self,
+        db,
+        lease_seconds: int = 300,
+        max_attempts: int = 4,
+        retry_delay: int = 60,
+    ):
+        self.outbox = db.get_collection(OUTBOX_COLLECTION)
+        self.payloads = db.get_collection(EMAIL_PAYLOAD_COLLECTION)
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    def queued_users(self, week: str, user_ids: list) -> set:
+        """Get the users of user_ids who already have an entry for week."""
+        entries = self.outbox.find(
+            {"week": week, "user_id": {"$in": user_ids}}, {"user_id": 1}
+        )
+        return {entry["user_id"] for entry in entries}
+
+    def enqueue(self, week: str, summaries: list) -> int:
+        """
+        Write the entries of the rendered summaries of week, each with a
+        user_id, and return how many were new. Existing entries are left as
+        they are, whatever their status.
+        """
+        if not summaries:
+            return 0
+        now = datetime.now()
+        payloads = [
+            UpdateOne(
+                {"_id": outbox_key(summary["user_id"], week)},
+                {
+                    "$setOnInsert": {
+                        "chart_id": summary["chart_id"],
+                        "max_day": summary["max_day"],
+                        "summary_text": summary["summary_text"],
+                        "created_at": now,
+                    }
+                },
+                upsert=True,
+            )
+            for summary in summaries
+        ]
+        self.payloads.bulk_write(payloads, ordered=False)
+        entries = [
+            UpdateOne(
+                {"user_id": summary["user_id"], "week": week},
+                {
+                    "$setOnInsert": {
+                        "email": summary["email"],
+                        "payload_id": outbox_key(summary["user_id"], week),
+                        "status": PENDING,
+                        "attempts": 0,
+                        "lease_until": None,
+                        "created_at": now,
+                    }
+                },
+                upsert=True,
+            )
+            for summary in summaries
+        ]
+        try:
+            result = self.outbox.bulk_write(entries, ordered=False)
+        except BulkWriteError as e:
+            # concurrent upserts of the same entry, one of them wins
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+            return e.details["nUpserted"]
+        return result.upserted_count
+
+    def _claimable(self, week: str = None, user_ids: list = None) -> dict:
+        now = datetime.now()
+        query = {
+            "$or": [
+                {"status": PENDING, "retry_at": {"$not": {"$gt": now}}},
+                {"status": SENDING, "lease_until": {"$lt": now}},
+            ]
+        }
+        if week is not None:
+            query["week"] = week
+        if user_ids is not None:
+            query["user_id"] = {"$in": user_ids}
+        return query
+
+    def claim(self, limit: int, week: str = None, user_ids: list = None) -> list:
+        """
+        Lease up to limit pending or expired entries, optionally of week and
+        user_ids only, and return them with their payload. Every claim gets
+        its own lease token, so an entry claimed again after its lease expired
+        can no longer be completed by the sender that lost it.
+        """
+        query = self._claimable(week, user_ids)
+        ids = [
+            entry["_id"]
+            for entry in self.outbox.find(query, {"_id": 1})
+            .sort("created_at", ASCENDING)
+            .limit(limit)
+        ]
+        if not ids:
+            return []
+        token = uuid.uuid4().hex
+        query["_id"] = {"$in": ids}
+        # a concurrent sender may have claimed some of them in between
+        self.outbox.update_many(
+            query,
+            {
+                "$set": {
+                    "status": SENDING,
+                    "lease": token,
+                    "lease_until": datetime.now() + self.lease,
+                },
+                "$inc": {"attempts": 1},
+            },
+        )
+        entries = list(self.outbox.find({"_id": {"$in": ids}, "lease": token}))
+        payloads = {
+            payload["_id"]: payload
+            for payload in self.payloads.find(
+                {"_id": {"$in": [entry["payload_id"] for entry in entries]}}
+            )
+        }
+        for entry in entries:
+            entry["payload"] = payloads[entry["payload_id"]]
+        return entries
+
+    def mark_sent(self, entry: dict) -> bool:
+        """Complete a claimed entry, False if its lease was lost."""
+        result = self.outbox.update_one(
+            {"_id": entry["_id"], "lease": entry["lease"]},
+            {
+                "$set": {"status": SENT, "sent_at": datetime.now()},
+                "$unset": {"lease": "", "lease_until": ""},
+            },
+        )
+        return result.modified_count > 0
+
+    def mark_failed(self, entry: dict, error: Exception) -> str:
+        """
+        Release a claimed entry after a failed attempt, as pending until it
+        used up its attempts, and return its new status.
+        """
+        status = PENDING if entry["attempts"] < self.max_attempts else FAILED
+        delay = self.retry_delay * 2 ** (entry["attempts"] - 1)
+        self.outbox.update_one(
+            {"_id": entry["_id"], "lease": entry["lease"]},
+            {
+                "$set": {
+                    "status": status,
+                    "last_error": str(error),
+                    "retry_at": datetime.now() + timedelta(seconds=delay),
+                },
+                "$unset": {"lease": "", "lease_until": ""},
+            },
+        )
+        return status
+
+    def status_counts(self, week: str, user_ids: list = None) -> dict:
+        """Get the number of entries of week, optionally of user_ids, per status."""
+        return status_counts(self.outbox.aggregate(status_pipeline(week, user_ids)))
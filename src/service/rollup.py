@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Daily focus rollup: per user, local day and session type, the focused time
+and number of completed sessions. The focus timer service keeps it up to date
+with $inc whenever a completed session is added, edited or deleted, so the
+analytics read one document per day instead of every session.
+"""
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from src.api import SessionStatus, SessionType
+
+ROLLUP_COLLECTION = "focus_daily_rollup"
+ROLLUP_FIELDS = ("focus_seconds", "focus_minutes", "sessions")
+
+
+def session_day(start_at: datetime) -> datetime:
+    """Get the local day of a session start."""
+    return datetime(start_at.year, start_at.month, start_at.day)
+
+
+def _contribution(session: dict):
+    """Get the rollup key and counters of a session, None if it is not counted."""
+    if session is None or session.get("session_status") != SessionStatus.COMPLETED:
+        return None
+    if session.get("start_at") is None:
+        return None
+    duration = session.get("duration") or 0
+    remaining = session.get("remaining_focus_time") or 0
+    session_type = session.get("session_type")
+    key = (
+        session["user_id"],
+        session_day(session["start_at"]),
+        # stored as null by the single add endpoint, like $ifNull on rebuild
+        int(SessionType.OTHER if session_type is None else session_type),
+    )
+    # focus_minutes matches the per session rounding of the weekly email
+    return key, (duration * 60 - remaining, duration - remaining // 60, 1)
+
+
+def rollup_updates(before: dict = None, after: dict = None) -> list[UpdateOne]:
+    """Get the rollup writes for a session going from before to after."""
+    deltas = {}
+    for session, sign in ((before, -1), (after, 1)):
+        contribution = _contribution(session)
+        if contribution is None:
+            continue
+        key, counters = contribution
+        current = deltas.get(key, (0, 0, 0))
+        deltas[key] = tuple(c + sign * v for c, v in zip(current, counters))
+    return [
+        UpdateOne(
+            {"user_id": user_id, "day": day, "session_type": session_type},
+            {"$inc": dict(zip(ROLLUP_FIELDS, delta))},
+            upsert=True,
+        )
+        for (user_id, day, session_type), delta in deltas.items()
+        if any(delta)
+    ]
+
+
+def rollup_rebuild_pipeline() -> list:
+    """Pipeline regenerating the whole rollup from the focus_timer documents."""
+    return [
+        {
+            "$match": {
+                "session_status": SessionStatus.COMPLETED,
+                "start_at": {"$ne": None},
+            }
+        },
+        {
+            "$group": {
+                "_id": {
+                    "user_id": "$user_id",
+                    "day": {
+                        "$dateFromParts": {
+                            "year": {"$year": "$start_at"},
+                            "month": {"$month": "$start_at"},
+                            "day": {"$dayOfMonth": "$start_at"},
+                        }
+                    },
+                    "session_type": {"$ifNull": ["$session_type", SessionType.OTHER]},
+                },
+                "focus_seconds": {
+                    "$sum": {
+                        "$subtract": [
+                            {"$multiply": [{"$ifNull": ["$duration", 0]}, 60]},
+                            {"$ifNull": ["$remaining_focus_time", 0]},
+                        ]
+                    }
+                },
+                "focus_minutes": {
+                    "$sum": {
+                        "$subtract": [
+                            {"$ifNull": ["$duration", 0]},
+                            {
+                                "$floor": {
+                                    "$divide": [
+                                        {"$ifNull": ["$remaining_focus_time", 0]},
+                                        60,
+                                    ]
+                                }
+                            },
+                        ]
+                    }
+                },
+                "sessions": {"$sum": 1},
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "user_id": "$_id.user_id",
+                "day": "$_id.day",
+                "session_type": "$_id.session_type",
+                "focus_seconds": 1,
+                "focus_minutes": 1,
+                "sessions": 1,
+            }
+        },
+        {"$out": ROLLUP_COLLECTION},
+    ]
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+"""
+Delivery schedule of the weekly summary.
+
+Instead of every user at Monday midnight, each user gets the summary at a
+fixed point of a delivery window opening on Monday at midnight in their own
+time zone: the window is split into buckets and a user always falls in the
+bucket of the crc32 of their id, so the load of the run is spread evenly and
+a user is sent their summary at the same time every week. The times are naive
+UTC datetimes, like the ones MongoDB returns.
+"""
+import zlib
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from src.service.sessiontime import LOCAL_TZ
+
+# widest offsets from UTC a time zone can have, bounding when a window opens
+EARLIEST_OFFSET = timedelta(hours=14)
+LATEST_OFFSET = timedelta(hours=12)
+
+
+def utc_now() -> datetime:
+    """Current time as a naive UTC datetime."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def summary_bucket(user_id: str, buckets: int) -> int:
+    """Bucket of the delivery window of user_id, the same in every process."""
+    return zlib.crc32(user_id.encode()) % buckets
+
+
+def user_timezone(name: str = None) -> ZoneInfo:
+    """Time zone of name, the local one when missing or unknown."""
+    if not name:
+        return LOCAL_TZ
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return LOCAL_TZ
+
+
+def window_monday(now: datetime) -> datetime:
+    """
+    Monday of the delivery window around now: the coming one from Friday on,
+    so that the windows opening on Sunday in UTC, in the time zones ahead of
+    it, are not missed.
+    """
+    day = (now + timedelta(days=3)).date()
+    return datetime.combine(day - timedelta(days=day.weekday()), time())
+
+
+def window_bounds(monday: datetime, window: timedelta) -> (datetime, datetime):
+    """First and last UTC time a user can be due in the window of monday."""
+    return monday - EARLIEST_OFFSET, monday + LATEST_OFFSET + window
+
+
+def due_at(
+    user_id: str, tz: ZoneInfo, monday: datetime, window: timedelta, buckets: int
+) -> datetime:
+    """UTC time the weekly summary of the window of monday is due to user_id."""
+    start = monday.replace(tzinfo=tz)
+    due = start + window * summary_bucket(user_id, buckets) / buckets
+    return due.astimezone(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+# Focus sessions are scheduled in local wall-clock time. start_at/end_at hold
+# that wall-clock time as naive datetimes (stored by MongoDB as BSON dates),
+# next to the legacy "MM/DD/YYYY" start_date and "HH:MM:SS" start_time strings.
+LOCAL_TZ = ZoneInfo("America/Toronto")
+DATE_FORMAT = "%m/%d/%Y"
+TIME_FORMAT = "%H:%M:%S"
+
+
+def parse_date(date_str: str) -> datetime:
+    """Convert MM/DD/YYYY to a naive datetime at midnight."""
+    return datetime.strptime(date_str, DATE_FORMAT)
+
+
+def session_window(
+    start_date: str, start_time: str, duration: int, break_duration: int
+) -> (datetime, datetime):
+    """Get the start and end of a session including its break."""
+    start_at = datetime.strptime(
+        f"{start_date} {start_time}", f"{DATE_FORMAT} {TIME_FORMAT}"
+    )
+    return start_at, start_at + timedelta(minutes=duration + break_duration)
+
+
+def local_today() -> datetime:
+    """Get midnight of the current local day."""
+    now = datetime.now(LOCAL_TZ)
+    return datetime(now.year, now.month, now.day)
+
+
+# Longest session, break included, the conflict checks look back for. Like the
+# former same-day/previous-day comparison, sessions are assumed to span at most
+# one day, which bounds the indexed start_at range on both sides.
+MAX_SESSION_SPAN = timedelta(days=1)
+
+
+class SessionIntervals(object):
+    """
+    class to hold session intervals [start, end) sorted by start.
+
+    Overlap checks bisect on the start and only walk back over intervals that
+    started less than the longest stored span ago, so a check costs
+    O(log n + k) with k the number of nearby sessions.
+    """
+
+    def __init__(self, intervals=()):
+        self._starts = []
+        self._ends = []
+        self._max_span = timedelta(0)
+        for start, end in sorted(intervals):
+            self._starts.append(start)
+            self._ends.append(end)
+            self._max_span = max(self._max_span, end - start)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def add(self, start: datetime, end: datetime):
+        index = bisect_right(self._starts, start)
+        self._starts.insert(index, start)
+        self._ends.insert(index, end)
+        self._max_span = max(self._max_span, end - start)
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        """Check whether [start, end) overlaps any stored interval."""
+        horizon = start - self._max_span
+        for index in range(bisect_left(self._starts, end) - 1, -1, -1):
+            if self._starts[index] <= horizon:
+                break
+            if self._ends[index] > start:
+                return True
+        return False
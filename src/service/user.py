@@ -7,10 +7,14 @@ from dataclasses import dataclass
 import jwt
 import requests
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 from src.api import UserStatus
 from src.config import Config
-from src.db import MongoDB
+from src.db import AsyncMongoDB, MongoDB
+from src.metrics import Metrics
+from src.service.cache import LRUCache, token_digest
+from src.service.google import GoogleUnavailableError, GoogleUserInfoClient
 
 
 @dataclass
@@ -27,10 +31,38 @@ class DecodedUser:
     exp: float
 
 
+class TokenCache(LRUCache):
+    """
+    class to cache verified jwt tokens.
+
+    Entries are keyed by the sha256 digest of the token, hold the DecodedUser
+    and are dropped once the token reaches its exp claim.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(TokenCache, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, "initialized"):
+            super().__init__(Config().token_cache_size)
+            Metrics().register("token_cache", self.stats)
+            self.initialized = True
+
+    def get(self, jwt_token: str):
+        """Return the cached DecodedUser of a token, or None."""
+        return super().get(token_digest(jwt_token))
+
+    def put(self, jwt_token: str, user: DecodedUser):
+        super().put(token_digest(jwt_token), user, user.exp)
+
+
 class UserService(object):
     """class to handle user service"""
 
-    _user_info_url = "https://www.googleapis.com/oauth2/v2/userinfo"
     jwt_algorithm = "HS256"
 
     def __init__(self, cfg: Config):
@@ -39,27 +71,44 @@ class UserService(object):
 
     def _get_user_from_google(self, token: str) -> (str, str):
         """Get user email from token."""
-        user_info_response = requests.get(
-            self._user_info_url, headers={"Authorization": f"Bearer {token}"}
-        )
-        user_info = user_info_response.json()
-        if user_info.get("email") is None:
+        try:
+            user_info_response = requests.get(
+                self.cfg.google_userinfo_url,
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=self.cfg.google_timeout,
+            )
+        except requests.RequestException as e:
+            raise GoogleUnavailableError(str(e)) from e
+        if user_info_response.status_code >= 500:
+            raise GoogleUnavailableError(
+                f"google answered {user_info_response.status_code}"
+            )
+        try:
+            user_info = user_info_response.json()
+        except ValueError:
+            return "", ""
+        if not isinstance(user_info, dict) or user_info.get("email") is None:
             return "", ""
-        return user_info["email"], user_info["picture"]
+        return user_info["email"], user_info.get("picture", "")
+
+    def _new_user(self, email: str) -> dict:
+        return {
+            "email": email,
+            "status": UserStatus.IDLE,
+            "notification": {"browser": False, "email_notification": False},
+        }
 
     def _get_user_id_from_db(self, email: str) -> str:
         """Get user from db."""
         collection = self.db.get_collection("user")
         user = collection.find_one({"email": email})
         if user is None:
-            res = collection.insert_one(
-                {
-                    "email": email,
-                    "status": UserStatus.IDLE,
-                    "notification": {"browser": False, "email_notification": False},
-                }
-            )
-            return str(res.inserted_id)
+            try:
+                res = collection.insert_one(self._new_user(email))
+                return str(res.inserted_id)
+            except DuplicateKeyError:
+                # created by a concurrent login, email is unique
+                user = collection.find_one({"email": email})
 
         if "status" not in user:
             collection.update_one(
@@ -114,3 +163,46 @@ class UserService(object):
             {"_id": ObjectId(user_id)}, {"$set": {"status": status}}
         )
         return result.modified_count > 0
+
+
+class AsyncUserService(UserService):
+    """class to handle user service on top of AsyncMongoDB"""
+
+    def __init__(self, cfg: Config):
+        self.db = AsyncMongoDB()
+        self.cfg = cfg
+        self.google = GoogleUserInfoClient()
+
+    async def _get_user_id_from_db(self, email: str) -> str:
+        """Get user from db."""
+        collection = self.db.get_collection("user")
+        user = await collection.find_one({"email": email})
+        if user is None:
+            try:
+                res = await collection.insert_one(self._new_user(email))
+                return str(res.inserted_id)
+            except DuplicateKeyError:
+                user = await collection.find_one({"email": email})
+
+        if "status" not in user:
+            await collection.update_one(
+                {"_id": user["_id"]}, {"$set": {"status": UserStatus.IDLE}}
+            )
+
+        return str(user["_id"])
+
+    async def get_user_app_token(self, token: str) -> User:
+        """Get user app token from token."""
+        email, picture = await self.google.get_user(token)
+        if email == "":
+            return User("", "", "")
+        user_id = await self._get_user_id_from_db(email)
+        return User(self._generate_jwt(user_id, email), email, picture)
+
+    async def update_user_status(self, user_id: str, status: str):
+        """Update user status."""
+        collection = self.db.get_collection("user")
+        result = await collection.update_one(
+            {"_id": ObjectId(user_id)}, {"$set": {"status": status}}
+        )
+        return result.modified_count > 0
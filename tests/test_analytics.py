@@ -7,7 +7,10 @@ from zoneinfo import ZoneInfo
 from src.api import ResponseStatus, SessionStatus, SessionType
 from src.config import Config
 from src.db import MongoDB
-from src.service import AnalyticsListService
+from src.service import AnalyticsListService, FocusTimerService
+from src.service.analytics import AnalyticsCache
+from src.service.migrations import backfill_session_times, rebuild_daily_rollup
+from src.service.sessiontime import local_today
 from src.service.user import UserService
 
 from tests.test_utils import get_test_app
@@ -61,6 +64,8 @@ class TestAnalytics(unittest.TestCase):
         }
 
         collection.insert_one(test_entry)
+        backfill_session_times(self.db)
+        rebuild_daily_rollup(self.db)
 
         response = self.app.get(
             "/api/v1/analytics", headers={"x-auth-token": self.jwt_token}
@@ -135,6 +140,8 @@ class TestAnalytics(unittest.TestCase):
         collection.insert_one(test_entry_1)
         collection.insert_one(test_entry_2)
         collection.insert_one(test_entry_3)
+        backfill_session_times(self.db)
+        rebuild_daily_rollup(self.db)
 
         start_date = (
             datetime.now(ZoneInfo("America/Toronto")) - timedelta(days=1)
@@ -159,3 +166,256 @@ class TestAnalytics(unittest.TestCase):
             {"summary": expected_summary_response, "status": ResponseStatus.SUCCESS},
             response.json(),
         )
+
+
+class TestAnalyticsCache(unittest.TestCase):
+    app = get_test_app()
+    db = MongoDB().db
+    user_id = "focusbuddy_cache_test"
+
+    def setUp(self):
+        self.cache = AnalyticsCache()
+        self.cache.clear()
+        # a single API process, the in-process cache is bypassed with more
+        cfg = self.cache.cfg
+        self.saved = (cfg.server_profile, cfg.web_workers)
+        cfg.server_profile, cfg.web_workers = "production", 1
+        self.service = AnalyticsListService(cfg=None)
+        self.timer_service = FocusTimerService(cfg=None)
+        self.db.get_collection("focus_timer").delete_many({"user_id": self.user_id})
+        self.db.get_collection("focus_daily_rollup").delete_many(
+            {"user_id": self.user_id}
+        )
+
+    def tearDown(self):
+        self.cache.cfg.server_profile, self.cache.cfg.web_workers = self.saved
+
+    def add_completed_session(self, start_time: str):
+        today = datetime.now(ZoneInfo("America/Toronto")).strftime("%m/%d/%Y")
+        return self.timer_service.add_focus_session(
+            self.user_id,
+            SessionStatus.COMPLETED,
+            today,
+            start_time,
+            30,
+            5,
+            SessionType.WORK,
+            0,
+            0,
+        )[0]
+
+    def test_cached_until_completed_sessions_change(self):
+        self.add_completed_session("00:00:00")
+        self.assertEqual(self.service.get_analytics(self.user_id).daily, 0.5)
+
+        # a write behind the service's back is not seen while cached
+        self.db.get_collection("focus_daily_rollup").update_many(
+            {"user_id": self.user_id}, {"$inc": {"focus_seconds": 1800}}
+        )
+        hits = self.cache.hits
+        self.assertEqual(self.service.get_analytics(self.user_id).daily, 0.5)
+        self.assertEqual(self.cache.hits, hits + 1)
+
+        # completing a session through the timer service invalidates
+        self.add_completed_session("01:00:00")
+        self.assertEqual(self.service.get_analytics(self.user_id).daily, 1.5)
+
+    def test_upcoming_sessions_keep_cache(self):
+        self.add_completed_session("00:00:00")
+        self.service.get_analytics(self.user_id)
+        today = datetime.now(ZoneInfo("America/Toronto")).strftime("%m/%d/%Y")
+        self.timer_service.add_focus_session(
+            self.user_id,
+            SessionStatus.UPCOMING,
+            today,
+            "23:00:00",
+            30,
+            5,
+            SessionType.WORK,
+            1800,
+            300,
+        )
+        hits = self.cache.hits
+        self.service.get_analytics(self.user_id)
+        self.assertEqual(self.cache.hits, hits + 1)
+
+    def test_failed_response_not_cached(self):
+        self.assertEqual(
+            self.service.get_analytics(self.user_id).status, ResponseStatus.FAILED
+        )
+        today = datetime.now(ZoneInfo("America/Toronto")).strftime("%m/%d/%Y")
+        self.timer_service.add_focus_session(
+            self.user_id,
+            SessionStatus.UPCOMING,
+            today,
+            "23:00:00",
+            30,
+            5,
+            SessionType.WORK,
+            1800,
+            300,
+        )
+        self.assertEqual(
+            self.service.get_analytics(self.user_id).status, ResponseStatus.SUCCESS
+        )
+
+    def test_bypassed_in_one_of_several_workers(self):
+        if self.cache.redis is not None:
+            self.skipTest("the workers share redis")
+        self.cache.cfg.web_workers = 2
+        self.add_completed_session("00:00:00")
+        self.assertEqual(self.service.get_analytics(self.user_id).daily, 0.5)
+        # written by another worker, which cannot invalidate this one
+        self.db.get_collection("focus_daily_rollup").update_many(
+            {"user_id": self.user_id}, {"$inc": {"focus_seconds": 1800}}
+        )
+        hits = self.cache.hits
+        self.assertEqual(self.service.get_analytics(self.user_id).daily, 1.0)
+        self.assertEqual(self.cache.hits, hits)
+
+    def test_expires_at_local_midnight(self):
+        midnight = (local_today() + timedelta(days=1)).replace(
+            tzinfo=ZoneInfo("America/Toronto")
+        )
+        self.assertLessEqual(self.cache._expires_at(), midnight.timestamp())
+
+    def test_stats_exported(self):
+        self.add_completed_session("00:00:00")
+        self.service.get_analytics(self.user_id)
+        self.service.get_analytics(self.user_id)
+        response = self.app.get("/api/v1/metrics")
+        stats = response.json()["analytics_cache"]
+        self.assertGreater(stats["hits"], 0)
+        self.assertGreater(stats["hit_ratio"], 0)
+        self.assertIn("saved_db_ms", stats)
+
+
+class TestAnalyticsSeries(unittest.TestCase):
+    app = get_test_app()
+    db = MongoDB().db
+    user_service = UserService(cfg=Config())
+    user_id = "focusbuddy_series_test"
+    jwt_token = user_service._generate_jwt(
+        "focusbuddy_series_test", "focusbuddy.test@gmail.com"
+    )
+
+    def setUp(self):
+        self.db.get_collection("focus_timer").delete_many({"user_id": self.user_id})
+        self.db.get_collection("focus_daily_rollup").delete_many(
+            {"user_id": self.user_id}
+        )
+        timer_service = FocusTimerService(cfg=None)
+        for start_date, session_type in (
+            ("02/28/2024", SessionType.WORK),
+            ("03/02/2024", SessionType.STUDY),
+            ("03/02/2024", SessionType.WORK),
+            ("03/03/2024", SessionType.WORK),
+        ):
+            start_time = "10:00:00" if session_type == SessionType.WORK else "12:00:00"
+            timer_service.add_focus_session(
+                self.user_id,
+                SessionStatus.COMPLETED,
+                start_date,
+                start_time,
+                90,
+                10,
+                session_type,
+                0,
+                0,
+            )
+
+    def get_series(self, **params):
+        response = self.app.get(
+            "/api/v1/analytics/series",
+            params={"start_date": "01/01/2024", "end_date": "12/31/2024", **params},
+            headers={"x-auth-token": self.jwt_token},
+        )
+        self.assertEqual(response.status_code, 200)
+        return [
+            (p["start_date"], p["session_type"], p["duration"], p["sessions"])
+            for p in response.json()["series"]
+        ]
+
+    def test_series_per_day(self):
+        self.assertEqual(
+            self.get_series(),
+            [
+                ("02/28/2024", None, 1.5, 1),
+                ("03/02/2024", None, 3.0, 2),
+                ("03/03/2024", None, 1.5, 1),
+            ],
+        )
+
+    def test_series_per_week_and_session_type(self):
+        self.assertEqual(
+            self.get_series(granularity="week", group_by_session_type=True),
+            [
+                ("02/25/2024", SessionType.WORK, 3.0, 2),
+                ("02/25/2024", SessionType.STUDY, 1.5, 1),
+                ("03/03/2024", SessionType.WORK, 1.5, 1),
+            ],
+        )
+
+    def test_series_per_month(self):
+        self.assertEqual(
+            self.get_series(granularity="month"),
+            [("02/01/2024", None, 1.5, 1), ("03/01/2024", None, 4.5, 3)],
+        )
+
+    def test_series_invalid_range(self):
+        for params in (
+            {"start_date": "12/31/2024", "end_date": "01/01/2024"},
+            {"start_date": "2024-01-01", "end_date": "12/31/2024"},
+        ):
+            response = self.app.get(
+                "/api/v1/analytics/series",
+                params=params,
+                headers={"x-auth-token": self.jwt_token},
+            )
+            self.assertEqual(response.status_code, 400)
+
+
+class TestWeeklyChart(unittest.TestCase):
+    app = get_test_app()
+    db = MongoDB().db
+    user_service = UserService(cfg=Config())
+    user_id = "focusbuddy_chart_test"
+    jwt_token = user_service._generate_jwt(user_id, "focusbuddy.chart@gmail.com")
+
+    def setUp(self):
+        rollup = self.db.get_collection("focus_daily_rollup")
+        rollup.delete_many({"user_id": self.user_id})
+        rollup.insert_one(
+            {
+                "user_id": self.user_id,
+                "day": datetime(2025, 3, 5),
+                "session_type": SessionType.WORK,
+                "focus_seconds": 1800,
+                "focus_minutes": 30,
+                "sessions": 1,
+            }
+        )
+
+    def get_chart(self, week: str, **headers):
+        return self.app.get(
+            "/api/v1/analytics/weeklychart",
+            params={"week": week},
+            headers={"x-auth-token": self.jwt_token, **headers},
+        )
+
+    def test_weekly_chart(self):
+        response = self.get_chart("2025-03-03")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "image/png")
+        self.assertTrue(response.content.startswith(b"\x89PNG\r\n\x1a\n"))
+        self.assertEqual(response.headers["cache-control"], "private, max-age=86400")
+        etag = response.headers["etag"]
+
+        # any day of the week gets the same chart, unchanged since
+        response = self.get_chart("2025-03-09", **{"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["etag"], etag)
+
+    def test_weekly_chart_without_sessions(self):
+        self.assertEqual(self.get_chart("2025-03-10").status_code, 404)
+        self.assertEqual(self.get_chart("03/05/2025").status_code, 400)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from celery.contrib.testing.worker import start_worker
+from testcontainers.redis import RedisContainer
+
+from src.config import Config
+from src.db import MongoDB
+from src.service import NotificationService
+from src.service.celery import celery_app
+from src.service.celery import weekly_summary_chunk_task, weekly_summary_task
+from src.service.notification import SUMMARY_RUN_COLLECTION
+from src.service.outbox import EMAIL_PAYLOAD_COLLECTION, OUTBOX_COLLECTION
+from src.service.schedule import due_at
+from src.service.sessiontime import LOCAL_TZ
+from src.service.rollup import ROLLUP_COLLECTION
+from src.service.user import UserService
+
+from tests.test_utils import get_test_app
+
+# a week no other test writes to
+WEEK = "2031-01-12"
+
+
+class TestWeeklySummaryFanOut(unittest.TestCase):
+    app = get_test_app()
+    db = MongoDB().db
+    user_service = UserService(cfg=Config())
+    emails = [f"fanout{i}@focusbuddy.dev" for i in range(5)]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.redis = RedisContainer("redis:latest")
+        cls.redis.start()
+        host = cls.redis.get_container_host_ip()
+        url = f"redis://{host}:{cls.redis.get_exposed_port(6379)}/0"
+        celery_app.conf.update(broker_url=url, result_backend=url)
+
+        rollup = cls.db.get_collection(ROLLUP_COLLECTION)
+        service = NotificationService(cfg=None)
+        service.db = cls.db
+        for email in cls.emails:
+            user_id = cls.user_service._get_user_id_from_db(email)
+            service.update_notification(user_id, "email", True)
+            rollup.insert_one(
+                {
+                    "user_id": user_id,
+                    "day": datetime(2031, 1, 10),
+                    "session_type": 0,
+                    "focus_seconds": 1500,
+                    "focus_minutes": 25,
+                    "sessions": 1,
+                }
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.redis.stop()
+
+    def setUp(self):
+        self.db.get_collection(SUMMARY_RUN_COLLECTION).delete_many({"_id": WEEK})
+        self.db.get_collection(OUTBOX_COLLECTION).delete_many({"week": WEEK})
+        self.db.get_collection(EMAIL_PAYLOAD_COLLECTION).delete_many(
+            {"_id": {"$regex": f"^{WEEK}:"}}
+        )
+        self.delivered = []
+        self.fail_once = set()
+        self.lock = threading.Lock()
+
+    def deliver(self, to_email: str):
+        with self.lock:
+            if to_email in self.fail_once:
+                self.fail_once.discard(to_email)
+                raise ConnectionRefusedError("smtp is down")
+            self.delivered.append(to_email)
+
+    @contextmanager
+    def worker(self, pool: str = "solo"):
+        """Runs a worker sending to self.deliver, with the run week set to WEEK."""
+        cfg = Config()
+        with patch.object(cfg, "summary_chunk_size", 2), patch.object(
+            cfg, "summary_retry_delay", 0
+        ), patch("src.service.celery.summary_week", lambda today=None: WEEK), patch(
+            "src.service.notification.summary_week", lambda today=None: WEEK
+        ), patch.object(
+            NotificationService,
+            "_deliver",
+            lambda _, to_email, msg: self.deliver(to_email),
+        ), start_worker(
+            celery_app, pool=pool, perform_ping_check=False
+        ):
+            yield
+
+    def wait(self, progress) -> dict:
+        """Polls progress until all the chunks it reports are done."""
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            current = progress()
+            chunks = current["chunks"]
+            if chunks and current["chunks_done"] == chunks:
+                return current
+            time.sleep(0.2)
+        self.fail("the weekly summary chunks did not finish")
+
+    def run_job(self, pool: str = "solo") -> dict:
+        """Runs weekly_summary_task on a worker and waits for all its chunks."""
+        service = NotificationService(cfg=None)
+        service.db = self.db
+        with self.worker(pool):
+            weekly_summary_task.delay().get(timeout=30)
+            return self.wait(lambda: service.weekly_summary_progress(WEEK))
+
+    def test_fan_out_sends_once(self):
+        progress = self.run_job()
+        self.assertEqual(progress["users"], 5)
+        self.assertEqual(progress["chunks"], 3)
+        self.assertEqual(progress["sent"], 5)
+        self.assertEqual(sorted(self.delivered), self.emails)
+
+        # running it again for the same week sends nothing
+        progress = self.run_job()
+        self.assertEqual(progress["sent"], 5)
+        self.assertEqual(sorted(self.delivered), self.emails)
+
+    def test_failed_chunk_is_retried(self):
+        self.fail_once = {self.emails[0], self.emails[3]}
+        progress = self.run_job()
+        self.assertEqual(progress["sent"], 5)
+        self.assertEqual(progress["failed"], 0)
+        self.assertEqual(sorted(self.delivered), self.emails)
+
+    def test_chunks_run_on_the_prefork_pool(self):
+        # its children are daemons, they render the charts themselves
+        with patch.object(Config(), "chart_workers", 2):
+            progress = self.run_job(pool="prefork")
+        self.assertEqual(progress["sent"], 5)
+        self.assertEqual(progress["failed"], 0)
+
+    def test_job_requested_through_the_api(self):
+        email = self.emails[1]
+        user_id = self.user_service._get_user_id_from_db(email)
+        headers = {"x-auth-token": self.user_service._generate_jwt(user_id, email)}
+        with self.worker():
+            response = self.app.post(
+                "/api/v1/user/send_weekly_summary", json={}, headers=headers
+            )
+            self.assertEqual(response.status_code, 202)
+            job = response.json()
+            self.assertEqual(job["job_status"], "queued")
+            path = f"/api/v1/user/weekly_summary_jobs/{job['job_id']}"
+            job = self.wait(lambda: self.app.get(path, headers=headers).json())
+        self.assertEqual(job["job_status"], "done")
+        self.assertEqual(job["users"], 1)
+        self.assertEqual(job["sent"], 1)
+        self.assertEqual(self.delivered, [email])
+
+        # the job is only visible to whoever requested it
+        other = self.user_service._generate_jwt("someone", "someone@focusbuddy.dev")
+        response = self.app.get(path, headers={"x-auth-token": other})
+        self.assertEqual(response.status_code, 404)
+
+        # sending to every user takes an admin
+        response = self.app.post(
+            "/api/v1/user/send_weekly_summary", json={"scope": "all"}, headers=headers
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_unknown_job_is_skipped(self):
+        with self.worker():
+            result = weekly_summary_task.delay("no-such-job").get(timeout=30)
+        self.assertIsNone(result)
+        self.assertEqual(self.delivered, [])
+
+    def test_schedule_spreads_the_run(self):
+        service = NotificationService(cfg=None)
+        service.db = self.db
+        monday = datetime(2031, 1, 13)
+        window = timedelta(hours=Config().summary_window_hours)
+        user_ids = [self.user_service._get_user_id_from_db(e) for e in self.emails]
+        due = {
+            email: due_at(user_id, LOCAL_TZ, monday, window, Config().summary_buckets)
+            for email, user_id in zip(self.emails, user_ids)
+        }
+        # halfway through the window, as seen from Toronto
+        halfway = monday + timedelta(hours=5) + window / 2
+        with self.worker():
+            first = service.schedule_weekly_summaries(
+                weekly_summary_chunk_task.delay, now=halfway
+            )
+            again = service.schedule_weekly_summaries(
+                weekly_summary_chunk_task.delay, now=halfway
+            )
+            self.assertEqual(first["week"], WEEK)
+            self.assertEqual(first["users"], sum(at <= halfway for at in due.values()))
+            self.assertEqual(again["users"], 0)
+            # a missed run is caught up by the next one
+            rest = service.schedule_weekly_summaries(
+                weekly_summary_chunk_task.delay, now=monday + timedelta(days=1)
+            )
+            self.assertEqual(first["users"] + rest["users"], 5)
+            self.wait(lambda: service.weekly_summary_progress(WEEK))
+        self.assertEqual(sorted(self.delivered), self.emails)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+import struct
+import unittest
+import zlib
+
+import numpy as np
+
+from src.service.charts import (
+    COLORS,
+    HEIGHT,
+    WIDTH,
+    chart_layout,
+    render_chart,
+    render_png,
+    render_svg,
+)
+
+
+def decode_png(data: bytes) -> np.ndarray:
+    """Decodes the unfiltered RGB PNGs written by render_png."""
+    assert data.startswith(b"\x89PNG\r\n\x1a\n")
+    pos, chunks = 8, {}
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos : pos + 4])
+        kind = data[pos + 4 : pos + 8]
+        chunks[kind] = chunks.get(kind, b"") + data[pos + 8 : pos + 8 + length]
+        pos += length + 12
+    width, height = struct.unpack(">II", chunks[b"IHDR"][:8])
+    rows = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8)
+    return rows.reshape(height, width * 3 + 1)[:, 1:].reshape(height, width, 3)
+
+
+class TestCharts(unittest.TestCase):
+    matrix = np.zeros((7, 4), dtype=np.int64)
+    matrix[0] = [30, 20, 0, 10]
+    matrix[2] = [100, 0, 25, 0]
+    matrix[6] = [0, 0, 0, 45]
+
+    def test_render_png(self):
+        data, max_day = render_png(self.matrix)
+        self.assertEqual(max_day, "Wednesday")
+        image = decode_png(data)
+        self.assertEqual(image.shape, (HEIGHT, WIDTH, 3))
+        # the middle of every bar segment is filled with its session type color
+        rects, _, _ = chart_layout(self.matrix)
+        bars = [rect for rect in rects if rect[4] in COLORS and rect[3] > 10]
+        self.assertEqual(len(bars), 6)
+        for x, y, width, height, color in bars:
+            self.assertEqual(tuple(image[y + height // 2, x + width // 2]), color)
+
+    def test_render_svg(self):
+        data, max_day = render_svg(self.matrix)
+        self.assertEqual(max_day, "Wednesday")
+        svg = data.decode("utf-8")
+        self.assertTrue(svg.startswith("<svg"))
+        self.assertIn(">Weekly Focus Sessions Summary</text>", svg)
+        self.assertEqual(svg.count(f'fill="rgb{COLORS[3]}"'), 3)
+
+    def test_render_empty_week(self):
+        data, max_day = render_png(np.zeros((7, 4), dtype=np.int64))
+        self.assertEqual(max_day, "Monday")
+        self.assertEqual(decode_png(data).shape, (HEIGHT, WIDTH, 3))
+
+    def test_render_chart_backends(self):
+        for backend in ("builtin", "svg", "matplotlib"):
+            data, max_day = render_chart(self.matrix, backend)
+            self.assertGreater(len(data), 0)
+            self.assertEqual(max_day, "Wednesday")
+        with self.assertRaises(ValueError):
+            render_chart(self.matrix, "gnuplot")
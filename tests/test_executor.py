@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+import asyncio
+import threading
+import unittest
+
+from src.config import Config
+from src.rest.executor import (
+    OffloadedService,
+    ServiceExecutor,
+    ServiceOverloadedError,
+)
+from src.service.user import AsyncUserService, UserService
+
+from tests.test_utils import get_test_app
+
+
+class TestServiceExecutor(unittest.TestCase):
+    app = get_test_app()
+
+    def setUp(self):
+        self.cfg = Config()
+        self.saved = (self.cfg.offload_workers, self.cfg.offload_queue_size)
+        self.cfg.offload_workers, self.cfg.offload_queue_size = 1, 1
+        ServiceExecutor._instance = None
+        self.executor = ServiceExecutor()
+
+    def tearDown(self):
+        self.executor.shutdown()
+        ServiceExecutor._instance = None
+        self.cfg.offload_workers, self.cfg.offload_queue_size = self.saved
+
+    def test_run_records_stats(self):
+        result = asyncio.run(self.executor.run("Service.add", lambda a, b: a + b, 1, 2))
+        self.assertEqual(result, 3)
+        stats = self.executor.stats()
+        self.assertEqual(stats["pending"], 0)
+        self.assertEqual(stats["methods"]["Service.add"]["calls"], 1)
+        self.assertEqual(stats["methods"]["Service.add"]["queued"], 0)
+
+    def test_rejects_when_saturated(self):
+        release = threading.Event()
+
+        async def scenario():
+            running = asyncio.ensure_future(
+                self.executor.run("Service.block", release.wait)
+            )
+            queued = asyncio.ensure_future(
+                self.executor.run("Service.block", release.wait)
+            )
+            await asyncio.sleep(0.05)
+            with self.assertRaises(ServiceOverloadedError):
+                await self.executor.run("Service.block", release.wait)
+            self.assertEqual(
+                self.executor.stats()["methods"]["Service.block"]["queued"], 1
+            )
+            release.set()
+            await asyncio.gather(running, queued)
+
+        asyncio.run(scenario())
+        stats = self.executor.stats()["methods"]["Service.block"]
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(stats["calls"], 2)
+
+    def test_offloaded_service_matches_async_interface(self):
+        service = OffloadedService(
+            UserService(self.cfg), AsyncUserService, self.executor
+        )
+        # pure helpers stay synchronous, db methods become coroutines
+        token = service._generate_jwt("focusbuddy_test", "focusbuddy.test@gmail.com")
+        self.assertEqual(service.decode_user(token).user_id, "focusbuddy_test")
+        self.assertTrue(asyncio.iscoroutinefunction(service.update_user_status))
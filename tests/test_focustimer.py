@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # -*- encoding=utf8 -*-
 import unittest
+from datetime import datetime, timedelta
 from bson import ObjectId
 
 from src.config import Config
@@ -9,6 +10,8 @@ from tests.test_utils import get_test_app
 from src.api import ResponseStatus, SessionStatus, SessionType
 from src.db import MongoDB
 from src.service.focustimer import FocusTimerService
+from src.service.migrations import backfill_session_times, rebuild_daily_rollup
+from src.service.sessiontime import SessionIntervals
 
 
 class TestFocusTimer(unittest.TestCase):
@@ -16,10 +19,14 @@ class TestFocusTimer(unittest.TestCase):
     db = MongoDB().db
     user_service = UserService(cfg=Config())
     user_id = "focusbuddy_test"
-    jwt_token = user_service._generate_jwt("focusbuddy_test", "focusbuddy.test@gmail.com")
+    jwt_token = user_service._generate_jwt(
+        "focusbuddy_test", "focusbuddy.test@gmail.com"
+    )
 
     def test_get_all_focustimer(self):
-        response = self.app.get("/api/v1/focustimer", headers={"x-auth-token": self.jwt_token})
+        response = self.app.get(
+            "/api/v1/focustimer", headers={"x-auth-token": self.jwt_token}
+        )
         assert response.status_code == 200
         assert response.json() == {
             "focus_sessions": [],
@@ -38,10 +45,12 @@ class TestFocusTimer(unittest.TestCase):
             "break_duration": 1,
             "session_type": SessionType.WORK,
             "remaining_focus_time": 60,
-            "remaining_break_time": 60
+            "remaining_break_time": 60,
         }
         inserted_id = collection.insert_one(test_entry).inserted_id
-        response = self.app.get("/api/v1/focustimer", headers={"x-auth-token": self.jwt_token})
+        response = self.app.get(
+            "/api/v1/focustimer", headers={"x-auth-token": self.jwt_token}
+        )
         assert response.status_code == 200
         assert response.json() == {
             "focus_sessions": [
@@ -54,7 +63,7 @@ class TestFocusTimer(unittest.TestCase):
                     "break_duration": 1,
                     "session_type": 0,
                     "remaining_focus_time": 60,
-                    "remaining_break_time": 60
+                    "remaining_break_time": 60,
                 }
             ],
             "status": ResponseStatus.SUCCESS,
@@ -65,6 +74,7 @@ class TestFocusTimer(unittest.TestCase):
         self.service = FocusTimerService(cfg=None)
         self.service.db = self.db
         self.db.get_collection("focus_timer").delete_many({})
+        self.db.get_collection("focus_daily_rollup").delete_many({})
 
     def test_add_focus_timer(self):
         response = self.service.add_focus_session(
@@ -76,7 +86,7 @@ class TestFocusTimer(unittest.TestCase):
             break_duration=1,
             session_type=SessionType.WORK,
             remaining_focus_time=60,
-            remaining_break_time=60
+            remaining_break_time=60,
         )
         assert response[0] != ""
         assert response[1] is True
@@ -93,14 +103,22 @@ class TestFocusTimer(unittest.TestCase):
             "break_duration": 1,
             "session_type": SessionType.WORK,
             "remaining_focus_time": 60,
-            "remaining_break_time": 60
+            "remaining_break_time": 60,
         }
-        response = self.app.post("/api/v1/focustimer", json=test_entry, headers={"x-auth-token": self.jwt_token})
+        response = self.app.post(
+            "/api/v1/focustimer",
+            json=test_entry,
+            headers={"x-auth-token": self.jwt_token},
+        )
         assert response.status_code == 200
 
         test_entry2 = test_entry.copy()
         test_entry2["start_time"] = "23:15:15"
-        response = self.app.post("/api/v1/focustimer", json=test_entry2, headers={"x-auth-token": self.jwt_token})
+        response = self.app.post(
+            "/api/v1/focustimer",
+            json=test_entry2,
+            headers={"x-auth-token": self.jwt_token},
+        )
         assert response.status_code == 409
 
     def test_update_focus_timer(self):
@@ -114,17 +132,22 @@ class TestFocusTimer(unittest.TestCase):
             "break_duration": 5,
             "session_type": SessionType.WORK,
             "remaining_focus_time": 1800,
-            "remaining_break_time": 300
+            "remaining_break_time": 300,
         }
         inserted_id = collection.insert_one(test_entry).inserted_id
+        backfill_session_times(self.db)
 
-        response = self.app.put(f"/api/v1/focustimer/{str(inserted_id)}", json={}, headers={"x-auth-token": self.jwt_token})
+        response = self.app.put(
+            f"/api/v1/focustimer/{str(inserted_id)}",
+            json={},
+            headers={"x-auth-token": self.jwt_token},
+        )
         assert response.status_code == 400
 
         response = self.app.put(
             f"/api/v1/focustimer/{str(inserted_id)}",
             json={"session_type": SessionType.PERSONAL},
-            headers={"x-auth-token": self.jwt_token}
+            headers={"x-auth-token": self.jwt_token},
         )
         assert response.status_code == 200
         assert response.json() == {
@@ -142,21 +165,22 @@ class TestFocusTimer(unittest.TestCase):
             "break_duration": 5,
             "session_type": SessionType.STUDY,
             "remaining_focus_time": 1800,
-            "remaining_break_time": 300
+            "remaining_break_time": 300,
         }
         conflict_id = collection.insert_one(conflict_entry).inserted_id
+        backfill_session_times(self.db)
 
         response = self.app.put(
             f"/api/v1/focustimer/{str(conflict_id)}",
             json={"start_time": "23:10:00"},
-            headers={"x-auth-token": self.jwt_token}
+            headers={"x-auth-token": self.jwt_token},
         )
         assert response.status_code == 409
 
         response = self.app.put(
             f"/api/v1/focustimer/{str(inserted_id)}",
             json={"start_time": "22:00:00"},
-            headers={"x-auth-token": self.jwt_token}
+            headers={"x-auth-token": self.jwt_token},
         )
         assert response.status_code == 200
         assert response.json() == {
@@ -176,14 +200,336 @@ class TestFocusTimer(unittest.TestCase):
             "break_duration": 1,
             "session_type": SessionType.WORK,
             "remaining_focus_time": 60,
-            "remaining_break_time": 60
+            "remaining_break_time": 60,
         }
         inserted_id = collection.insert_one(test_entry).inserted_id
-        response = self.app.delete(f"/api/v1/focustimer/{str(inserted_id)}", headers={"x-auth-token": self.jwt_token})
+        response = self.app.delete(
+            f"/api/v1/focustimer/{str(inserted_id)}",
+            headers={"x-auth-token": self.jwt_token},
+        )
         assert response.status_code == 204
         assert collection.count_documents({"_id": inserted_id}) == 0
 
     def test_delete_non_existent_entry(self):
-        response = self.app.delete(f"/api/v1/focustimer/{str(ObjectId())}", headers={"x-auth-token": self.jwt_token})
+        response = self.app.delete(
+            f"/api/v1/focustimer/{str(ObjectId())}",
+            headers={"x-auth-token": self.jwt_token},
+        )
         assert response.status_code == 404
 
+    def test_add_focus_timer_writes_start_at(self):
+        session_id, ok = self.service.add_focus_session(
+            user_id=self.user_id,
+            session_status=SessionStatus.UPCOMING,
+            start_date="12/31/2025",
+            start_time="23:30:00",
+            duration=50,
+            break_duration=10,
+            session_type=SessionType.WORK,
+            remaining_focus_time=3000,
+            remaining_break_time=600,
+        )
+        assert ok is True
+        doc = self.db.get_collection("focus_timer").find_one(
+            {"_id": ObjectId(session_id)}
+        )
+        assert doc["start_at"] == datetime(2025, 12, 31, 23, 30)
+        assert doc["end_at"] == datetime(2026, 1, 1, 0, 30)
+
+    def test_conflict_across_year_boundary(self):
+        self.service.add_focus_session(
+            self.user_id,
+            SessionStatus.UPCOMING,
+            "12/31/2025",
+            "23:30:00",
+            50,
+            10,
+            SessionType.WORK,
+            3000,
+            600,
+        )
+        _, ok = self.service.add_focus_session(
+            self.user_id,
+            SessionStatus.UPCOMING,
+            "01/01/2026",
+            "00:15:00",
+            25,
+            5,
+            SessionType.WORK,
+            1500,
+            300,
+        )
+        assert ok is False
+        _, ok = self.service.add_focus_session(
+            self.user_id,
+            SessionStatus.UPCOMING,
+            "01/01/2026",
+            "00:30:00",
+            25,
+            5,
+            SessionType.WORK,
+            1500,
+            300,
+        )
+        assert ok is True
+
+    def test_backfill_session_times(self):
+        collection = self.db.get_collection("focus_timer")
+        legacy = {
+            "user_id": self.user_id,
+            "session_status": SessionStatus.COMPLETED,
+            "start_date": "02/22/2025",
+            "start_time": "23:00:00",
+            "duration": 30,
+            "break_duration": 5,
+            "session_type": SessionType.WORK,
+            "remaining_focus_time": 0,
+            "remaining_break_time": 0,
+        }
+        valid_id = collection.insert_one(dict(legacy)).inserted_id
+        bad_time_id = collection.insert_one(
+            dict(legacy, start_time="23-00-00")
+        ).inserted_id
+        bad_date_id = collection.insert_one(
+            dict(legacy, start_date="not a date")
+        ).inserted_id
+
+        assert backfill_session_times(self.db, batch_size=2) == 3
+        assert backfill_session_times(self.db) == 0
+
+        assert collection.find_one({"_id": valid_id})["end_at"] == datetime(
+            2025, 2, 22, 23, 35
+        )
+        assert collection.find_one({"_id": bad_time_id})["start_at"] == datetime(
+            2025, 2, 22
+        )
+        assert collection.find_one({"_id": bad_date_id})["start_at"] is None
+
+    def test_add_focus_sessions_batch(self):
+        self.service.add_focus_session(
+            self.user_id,
+            SessionStatus.UPCOMING,
+            "03/03/2026",
+            "09:00:00",
+            25,
+            5,
+            SessionType.WORK,
+            1500,
+            300,
+        )
+        session = {
+            "session_status": SessionStatus.UPCOMING,
+            "start_date": "03/02/2026",
+            "start_time": "09:00:00",
+            "duration": 25,
+            "break_duration": 5,
+            "session_type": SessionType.WORK,
+            "remaining_focus_time": 1500,
+            "remaining_break_time": 300,
+        }
+        response = self.app.post(
+            "/api/v1/focustimer/batch",
+            headers={"x-auth-token": self.jwt_token},
+            json={
+                "sessions": [
+                    dict(session, start_date="03/01/2026", start_time="23:50:00"),
+                    dict(session, start_date="03/02/2026", start_time="00:10:00"),
+                ],
+                "recurrence": {"session": session, "frequency": "daily", "count": 3},
+            },
+        )
+        assert response.status_code == 200
+        body = response.json()
+        assert [
+            (item["start_date"], item["start_time"], item["conflict"])
+            for item in body["items"]
+        ] == [
+            ("03/01/2026", "23:50:00", False),
+            ("03/02/2026", "00:10:00", True),
+            ("03/02/2026", "09:00:00", False),
+            ("03/03/2026", "09:00:00", True),
+            ("03/04/2026", "09:00:00", False),
+        ]
+        assert body["created"] == 3
+        stored = self.db.get_collection("focus_timer").count_documents(
+            {"user_id": self.user_id}
+        )
+        assert stored == 4
+        created = self.db.get_collection("focus_timer").find_one(
+            {"_id": ObjectId(body["items"][4]["id"])}
+        )
+        assert created["start_at"] == datetime(2026, 3, 4, 9, 0)
+
+    def test_add_focus_sessions_batch_invalid(self):
+        headers = {"x-auth-token": self.jwt_token}
+        session = {
+            "start_date": "03/02/2026",
+            "start_time": "09:00:00",
+            "duration": 25,
+            "break_duration": 5,
+        }
+        for payload in (
+            {"sessions": []},
+            {"sessions": [dict(session, start_time="9am")]},
+            {"recurrence": {"session": session, "frequency": "weekly"}},
+            {"recurrence": {"session": session, "count": 10000}},
+        ):
+            response = self.app.post(
+                "/api/v1/focustimer/batch", headers=headers, json=payload
+            )
+            assert response.status_code == 400, payload
+        assert self.db.get_collection("focus_timer").count_documents({}) == 0
+
+    def test_add_focus_sessions_batch_missing_fields(self):
+        headers = {"x-auth-token": self.jwt_token}
+        session = {
+            "session_status": SessionStatus.UPCOMING,
+            "start_date": "03/02/2026",
+            "start_time": "09:00:00",
+            "duration": 25,
+            "break_duration": 5,
+            "session_type": SessionType.WORK,
+            "remaining_focus_time": 1500,
+            "remaining_break_time": 300,
+        }
+        for field in ("session_status", "session_type", "remaining_focus_time"):
+            for payload in (
+                {
+                    "sessions": [
+                        session,
+                        dict(session, start_date="03/03/2026", **{field: None}),
+                    ]
+                },
+                {"recurrence": {"session": dict(session, **{field: None}), "count": 2}},
+            ):
+                response = self.app.post(
+                    "/api/v1/focustimer/batch", headers=headers, json=payload
+                )
+                assert response.status_code == 400, payload
+        assert self.db.get_collection("focus_timer").count_documents({}) == 0
+
+    def rollup(self):
+        return {
+            (doc["day"], doc["session_type"]): (
+                doc["focus_seconds"],
+                doc["focus_minutes"],
+                doc["sessions"],
+            )
+            for doc in self.db.get_collection("focus_daily_rollup").find(
+                {"user_id": self.user_id}
+            )
+            if doc["sessions"]
+        }
+
+    def test_rollup_follows_completed_sessions(self):
+        march_2 = datetime(2026, 3, 2)
+        session_id, _ = self.service.add_focus_session(
+            self.user_id,
+            SessionStatus.UPCOMING,
+            "03/02/2026",
+            "09:00:00",
+            25,
+            5,
+            SessionType.WORK,
+            1500,
+            300,
+        )
+        assert self.rollup() == {}
+
+        self.service.modify_focus_session(
+            self.user_id,
+            session_id,
+            session_status=SessionStatus.COMPLETED,
+            remaining_focus_time=90,
+        )
+        assert self.rollup() == {(march_2, SessionType.WORK): (1410, 24, 1)}
+
+        self.service.add_focus_session(
+            self.user_id,
+            SessionStatus.COMPLETED,
+            "03/02/2026",
+            "10:00:00",
+            50,
+            10,
+            SessionType.WORK,
+            0,
+            0,
+        )
+        assert self.rollup() == {(march_2, SessionType.WORK): (4410, 74, 2)}
+
+        self.service.modify_focus_session(
+            self.user_id,
+            session_id,
+            start_date="03/03/2026",
+            session_type=SessionType.STUDY,
+        )
+        assert self.rollup() == {
+            (march_2, SessionType.WORK): (3000, 50, 1),
+            (datetime(2026, 3, 3), SessionType.STUDY): (1410, 24, 1),
+        }
+
+        self.service.delete_focus_session(self.user_id, session_id)
+        assert self.rollup() == {(march_2, SessionType.WORK): (3000, 50, 1)}
+
+        expected = self.rollup()
+        self.db.get_collection("focus_daily_rollup").delete_many({})
+        rebuild_daily_rollup(self.db)
+        assert self.rollup() == expected
+
+    def test_rollup_counts_null_type_as_other(self):
+        session_id, _ = self.service.add_focus_session(
+            self.user_id,
+            SessionStatus.COMPLETED,
+            "03/02/2026",
+            "09:00:00",
+            25,
+            5,
+            None,
+            0,
+            0,
+        )
+        assert self.rollup() == {
+            (datetime(2026, 3, 2), SessionType.OTHER): (1500, 25, 1)
+        }
+        assert (
+            self.service.modify_focus_session(self.user_id, session_id, duration=30)
+            is True
+        )
+        assert self.rollup() == {
+            (datetime(2026, 3, 2), SessionType.OTHER): (1800, 30, 1)
+        }
+        self.service.delete_focus_session(self.user_id, session_id)
+        assert self.rollup() == {}
+
+
+class TestSessionIntervals(unittest.TestCase):
+    def test_overlaps(self):
+        day = datetime(2026, 2, 22)
+        intervals = SessionIntervals(
+            [
+                (day.replace(hour=9), day.replace(hour=10)),
+                (day.replace(hour=23), day.replace(hour=23) + timedelta(hours=2)),
+            ]
+        )
+        intervals.add(day.replace(hour=12), day.replace(hour=12, minute=30))
+        assert len(intervals) == 3
+        assert intervals.overlaps(day.replace(hour=9, minute=30), day.replace(hour=11))
+        assert intervals.overlaps(day.replace(hour=11), day.replace(hour=12, minute=1))
+        assert not intervals.overlaps(day.replace(hour=10), day.replace(hour=12))
+        # spills over into the next day
+        assert intervals.overlaps(
+            day + timedelta(days=1), day + timedelta(days=1, minutes=30)
+        )
+        assert not intervals.overlaps(
+            day + timedelta(days=1, hours=1), day + timedelta(days=1, hours=2)
+        )
+
+    def test_long_interval_before_short_ones(self):
+        day = datetime(2026, 2, 22)
+        intervals = SessionIntervals([(day, day + timedelta(hours=8))])
+        for hour in range(1, 7):
+            intervals.add(
+                day.replace(hour=hour, minute=10), day.replace(hour=hour, minute=20)
+            )
+        assert intervals.overlaps(day.replace(hour=7), day.replace(hour=7, minute=30))
+        assert not intervals.overlaps(day.replace(hour=8), day.replace(hour=9))
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+import unittest
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ASCENDING
+
+from src.api import AnalyticsGranularity
+from src.db import MongoDB
+from src.service import AnalyticsListService, FocusTimerService, NotificationService
+from src.service.migrations import migrate_indexes
+from src.service.outbox import OUTBOX_COLLECTION, EmailOutbox
+
+from tests.test_utils import get_test_app
+
+INDEXED_STAGES = ("IXSCAN", "IDHACK", "COUNT_SCAN")
+
+
+def _winning_stages(explain, in_winning_plan=False) -> list:
+    """Collect the stage names of every winning plan in an explain output."""
+    stages = []
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "rejectedPlans":
+                continue
+            if key == "stage" and in_winning_plan:
+                stages.append(value)
+            stages += _winning_stages(value, in_winning_plan or key == "winningPlan")
+    elif isinstance(explain, list):
+        for value in explain:
+            stages += _winning_stages(value, in_winning_plan)
+    return stages
+
+
+class TestIndexes(unittest.TestCase):
+    """every service query shape must be answered from an index"""
+
+    app = get_test_app()
+    db = MongoDB().db
+    user_id = "focusbuddy_test"
+
+    def assertIndexed(self, explain):
+        stages = _winning_stages(explain)
+        self.assertTrue(stages, explain)
+        self.assertNotIn("COLLSCAN", stages)
+        self.assertTrue(
+            any(indexed in stage for stage in stages for indexed in INDEXED_STAGES),
+            stages,
+        )
+
+    def explain_find(self, collection_name, query, sort=None):
+        cursor = self.db.get_collection(collection_name).find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        return cursor.explain()
+
+    def explain_aggregate(self, collection_name, pipeline):
+        return self.db.command(
+            "aggregate", collection_name, pipeline=pipeline, explain=True
+        )
+
+    def test_focus_timer_queries(self):
+        timer_service = FocusTimerService(cfg=None)
+        now = datetime.now()
+        queries = [
+            ({"user_id": self.user_id}, None),
+            ({"user_id": self.user_id, "_id": ObjectId()}, None),
+            ({"user_id": self.user_id, "session_status": {"$in": [0, 1]}}, None),
+            ({"user_id": self.user_id, "session_status": 0}, [("start_at", 1)]),
+            (
+                timer_service._conflict_query(
+                    self.user_id, now, now + timedelta(hours=1), str(ObjectId())
+                ),
+                None,
+            ),
+        ]
+        for query, sort in queries:
+            with self.subTest(query=query):
+                self.assertIndexed(self.explain_find("focus_timer", query, sort))
+
+    def test_analytics_pipelines(self):
+        service = AnalyticsListService(cfg=None)
+        pipelines = [
+            service._analytics_pipeline(self.user_id),
+            service._weekly_per_session_type_pipeline(
+                self.user_id, "02/01/2025", "02/28/2025"
+            ),
+            service._series_pipeline(
+                self.user_id,
+                "01/01/2024",
+                "12/31/2024",
+                AnalyticsGranularity.WEEK,
+                True,
+            ),
+        ]
+        for pipeline in pipelines:
+            with self.subTest(pipeline=pipeline[0]):
+                self.assertIndexed(
+                    self.explain_aggregate("focus_daily_rollup", pipeline)
+                )
+
+    def test_weekly_summary_pipeline(self):
+        pipeline = NotificationService(cfg=None)._weekly_summary_pipeline()
+        self.assertIndexed(self.explain_aggregate("focus_daily_rollup", pipeline))
+
+    def test_email_outbox_queries(self):
+        outbox = EmailOutbox(self.db)
+        week = "2030-01-06"
+        queries = [
+            ({"week": week, "user_id": {"$in": [self.user_id]}}, None),
+            (outbox._claimable(), [("created_at", ASCENDING)]),
+            (outbox._claimable(week, [self.user_id]), [("created_at", ASCENDING)]),
+        ]
+        for query, sort in queries:
+            with self.subTest(query=query):
+                self.assertIndexed(self.explain_find(OUTBOX_COLLECTION, query, sort))
+
+    def test_user_queries(self):
+        queries = [
+            {"email": "focusbuddy.test@gmail.com"},
+            {"_id": ObjectId()},
+            {"notification.email_notification": True},
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                self.assertIndexed(self.explain_find("user", query))
+
+    def test_blocklist_queries(self):
+        queries = [
+            {"user_id": self.user_id},
+            {"user_id": self.user_id, "domain": "example.com", "list_type": 0},
+            {"_id": ObjectId(), "user_id": self.user_id},
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                self.assertIndexed(self.explain_find("blocklist", query))
+
+    def test_migrate_indexes_drops_unused(self):
+        collection = self.db.get_collection("focus_timer")
+        collection.create_index([("start_date", ASCENDING), ("start_time", ASCENDING)])
+        dropped = migrate_indexes(self.db)
+        self.assertIn("start_date_1_start_time_1", dropped["focus_timer"])
+        self.assertNotIn("start_date_1_start_time_1", collection.index_information())
+        self.assertIn(
+            "user_id_1_session_status_1_start_at_1", collection.index_information()
+        )
+        self.assertEqual(migrate_indexes(self.db)["focus_timer"], [])
+
+    def test_unique_index_with_duplicates_is_not_built(self):
+        collection = self.db.get_collection("user")
+        collection.drop_index("email_1")
+        email = "focusbuddy.duplicate@gmail.com"
+        ids = collection.insert_many([{"email": email}, {"email": email}]).inserted_ids
+        try:
+            skipped = MongoDB().ensure_indexes()
+            self.assertEqual(skipped, [("user", "email_1", [{"email": email}])])
+            self.assertNotIn("email_1", collection.index_information())
+            with self.assertRaises(ValueError):
+                migrate_indexes(self.db)
+        finally:
+            collection.delete_many({"_id": {"$in": ids}})
+            MongoDB().ensure_indexes()
+        self.assertIn("email_1", collection.index_information())
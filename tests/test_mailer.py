@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+import smtplib
+import socket
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+from src.service.mailer import SMTPPool
+
+
+class Inbox:
+    """aiosmtpd handler keeping the delivered messages"""
+
+    def __init__(self):
+        self.messages = []
+        self.drop_next = 0
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("nobody@"):
+            return "550 no such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.drop_next:
+            self.drop_next -= 1
+            return "421 closing the session"
+        self.messages.append((envelope.mail_from, envelope.rcpt_tos, envelope.content))
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def authenticate(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=auth_data.password == b"secret")
+
+
+class TestSMTPPool(unittest.TestCase):
+    def setUp(self):
+        self.inbox = Inbox()
+        self.controller = Controller(
+            self.inbox,
+            hostname="127.0.0.1",
+            port=free_port(),
+            authenticator=authenticate,
+            auth_require_tls=False,
+        )
+        self.controller.start()
+        self.addCleanup(self.controller.stop)
+
+    def _pool(self, **kwargs) -> SMTPPool:
+        kwargs.setdefault("username", "focusbuddy")
+        kwargs.setdefault("password", "secret")
+        pool = SMTPPool(
+            self.controller.hostname,
+            self.controller.port,
+            starttls=False,
+            **kwargs,
+        )
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_send_reuses_sessions(self):
+        pool = self._pool(size=2)
+        with ThreadPoolExecutor(max_workers=8) as senders:
+            for i in range(50):
+                senders.submit(
+                    pool.send, "from@focusbuddy.dev", f"user{i}@focusbuddy.dev", "hi"
+                )
+        self.assertEqual(len(self.inbox.messages), 50)
+        stats = pool.stats()
+        self.assertEqual(stats["sent"], 50)
+        self.assertLessEqual(stats["connects"], 2)
+
+    def test_messages_per_connection(self):
+        pool = self._pool(messages_per_connection=10)
+        for i in range(25):
+            pool.send("from@focusbuddy.dev", "user@focusbuddy.dev", "hi")
+        self.assertEqual(pool.stats()["connects"], 3)
+        self.assertEqual(pool.stats()["idle"], 1)
+
+    def test_reconnect_when_session_dropped(self):
+        pool = self._pool()
+        self.inbox.drop_next = 1
+        pool.send("from@focusbuddy.dev", "user@focusbuddy.dev", "hi")
+        self.assertEqual(len(self.inbox.messages), 1)
+        self.assertEqual(pool.stats()["reconnects"], 1)
+
+        # a second drop in a row is reported
+        self.inbox.drop_next = 2
+        with self.assertRaises(smtplib.SMTPDataError):
+            pool.send("from@focusbuddy.dev", "user@focusbuddy.dev", "hi")
+        self.assertEqual(pool.stats()["failed"], 1)
+
+    def test_refused_recipient_keeps_session(self):
+        pool = self._pool()
+        with self.assertRaises(smtplib.SMTPRecipientsRefused):
+            pool.send("from@focusbuddy.dev", "nobody@focusbuddy.dev", "hi")
+        pool.send("from@focusbuddy.dev", "user@focusbuddy.dev", "hi")
+        self.assertEqual(pool.stats()["connects"], 1)
+        self.assertEqual(len(self.inbox.messages), 1)
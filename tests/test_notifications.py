@@ -1,15 +1,30 @@
 #!/usr/bin/env python
 # -*- encoding=utf8 -*-
 import base64
+import multiprocessing
+import tracemalloc
 import unittest
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from unittest.mock import MagicMock, patch
-from zoneinfo import ZoneInfo
+
+import numpy as np
 
 from src.api import SessionStatus, SessionType
 from src.config import Config
 from src.db import MongoDB
 from src.service import NotificationService
+from src.service.chartcache import CHART_BLOB_COLLECTION, chart_key
+from src.service.notification import (
+    WEEK_FORMAT,
+    render_chart,
+    render_charts,
+    summary_week,
+    week_matrices,
+)
+from src.service.migrations import backfill_session_times, rebuild_daily_rollup
+from src.service.outbox import OUTBOX_COLLECTION
+from src.service.rollup import ROLLUP_COLLECTION
 from src.service.user import UserService
 
 from tests.test_utils import get_test_app
@@ -125,6 +140,7 @@ class TestNotifications(unittest.TestCase):
 
         self.assertIn(max_day, day_data.keys())
 
+    @patch("src.service.mailer._smtp_pool", None)
     @patch("smtplib.SMTP")
     def test_send_email(self, mock_smtp):
         self.db = MongoDB().db
@@ -141,9 +157,12 @@ class TestNotifications(unittest.TestCase):
 
         mock_server = MagicMock()
 
-        mock_smtp.return_value.__enter__.return_value = mock_server
+        mock_smtp.return_value = mock_server
 
         self.service.send_email(to_email, chart_b64, max_day, summary_text)
+        # the session is kept open for the next email
+        self.service.send_email(to_email, chart_b64, max_day, summary_text)
+        mock_smtp.assert_called_once()
 
         mock_server.starttls.assert_called_once()
 
@@ -151,7 +170,8 @@ class TestNotifications(unittest.TestCase):
             self.cfg.smtp_username, self.cfg.smtp_password
         )
 
-        mock_server.sendmail.assert_called_once()
+        self.assertEqual(mock_server.sendmail.call_count, 2)
+        mock_server.quit.assert_not_called()
         sendmail_call_args = mock_server.sendmail.call_args[0]
 
         self.assertEqual(sendmail_call_args[0], self.cfg.from_email)
@@ -187,15 +207,13 @@ class TestWeeklyAggregateSummary(unittest.TestCase):
         # Insert test focus session #
         collection = self.db.get_collection("focus_timer")
 
+        # the Sunday ending the last full week, the one the summary covers
+        sunday = datetime.strptime(summary_week(), WEEK_FORMAT)
         test_entry = {
             "user_id": self.user_id_db,
             "session_status": SessionStatus.COMPLETED,
-            "start_date": (
-                datetime.now(ZoneInfo("America/Toronto")) - timedelta(days=1)
-            ).strftime("%m/%d/%Y"),
-            "start_time": (
-                datetime.now(ZoneInfo("America/Toronto")) - timedelta(days=1)
-            ).strftime("%H-%M-%S"),
+            "start_date": sunday.strftime("%m/%d/%Y"),
+            "start_time": "12-00-00",
             "duration": 120,
             "break_duration": 30,
             "session_type": SessionType.WORK,
@@ -204,6 +222,8 @@ class TestWeeklyAggregateSummary(unittest.TestCase):
         }
 
         collection.insert_one(test_entry)
+        backfill_session_times(self.db)
+        rebuild_daily_rollup(self.db)
 
         summaries = self.service.aggregate_weekly_summary()
 
@@ -213,10 +233,11 @@ class TestWeeklyAggregateSummary(unittest.TestCase):
 
         self.assertGreater(len(summary["summary_text"]), 0)
 
-        self.assertGreater(len(summary["chart_b64"]), 0)
-
-        decoded_img = base64.b64decode(summary["chart_b64"])
-        self.assertTrue(decoded_img.startswith(b"\x89PNG\r\n\x1a\n"), "Decoded image does not start with PNG header")
+        self.assertTrue(
+            summary["chart"].startswith(b"\x89PNG\r\n\x1a\n"),
+            "Chart does not start with PNG header",
+        )
+        self.assertIsNotNone(summary["chart_id"])
 
         expected_days = [
             "Monday",
@@ -228,3 +249,220 @@ class TestWeeklyAggregateSummary(unittest.TestCase):
             "Sunday",
         ]
         self.assertIn(summary["max_day"], expected_days)
+
+        # unsubscribing removes the user from the next run
+        self.service.update_notification(
+            user_id=self.user_id_db,
+            notification_type="email",
+            enabled=False,
+        )
+        self.assertEqual(self.service.aggregate_weekly_summary(), [])
+        self.service.update_notification(
+            user_id=self.user_id_db,
+            notification_type="email",
+            enabled=True,
+        )
+
+
+class TestWeekMatrices(unittest.TestCase):
+    def test_week_matrices(self):
+        users = np.array([0, 0, 0, 2])
+        days = np.array([0, 0, 6, 3])
+        session_types = np.array([1, 1, 3, 0])
+        minutes = np.array([25, 50, 10, 0])
+        matrices, active_days = week_matrices(users, days, session_types, minutes, 3)
+        self.assertEqual(matrices.shape, (3, 7, 4))
+        self.assertEqual(matrices[0, 0].tolist(), [0, 75, 0, 0])
+        self.assertEqual(matrices[0, 6].tolist(), [0, 0, 0, 10])
+        self.assertEqual(matrices.sum(), 85)
+        self.assertEqual(np.flatnonzero(active_days[0]).tolist(), [0, 6])
+        self.assertFalse(active_days[1].any())
+        # a day with sessions but no focused minutes still counts
+        self.assertEqual(np.flatnonzero(active_days[2]).tolist(), [3])
+
+
+class TestWeeklySummaryStreaming(unittest.TestCase):
+    """rendering and sending the weekly summaries keeps a bounded amount of memory"""
+
+    service = NotificationService(Config())
+    # a few KB like a real chart, so holding every user's one would show
+    chart = b"\x89PNG\r\n\x1a\n" + bytes(4096)
+
+    def _weeks(self, users: int):
+        monday = datetime(2030, 1, 7)
+        for i in range(users):
+            yield {
+                "email": f"user{i}@focusbuddy.dev",
+                "days": [
+                    {
+                        "day": monday + timedelta(days=i % 7),
+                        "session_type": i % 4,
+                        "focus_minutes": 25,
+                    }
+                ],
+            }
+
+    def _peak(self, users: int) -> (int, int):
+        sent = [0]
+
+        def deliver(to_email, msg):
+            msg.as_string()
+            sent[0] += 1
+
+        tracemalloc.start()
+        try:
+            # not to cache the stand-in chart under the key of a real one
+            with patch.object(Config(), "chart_backend", "stub"), patch.object(
+                self.service, "_weeks", lambda *args: self._weeks(users)
+            ), patch.object(
+                self.service,
+                "_render_chart",
+                lambda matrix: (self.chart, "Monday"),
+            ), patch.object(
+                self.service, "_deliver", deliver
+            ):
+                summaries = self.service.iter_weekly_summaries()
+                for _ in self.service._send_summaries(summaries):
+                    pass
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return sent[0], peak
+
+    def test_weekly_summary_memory_is_flat(self):
+        sent, small_peak = self._peak(5_000)
+        self.assertEqual(sent, 5_000)
+        sent, peak = self._peak(50_000)
+        self.assertEqual(sent, 50_000)
+        # 50k charts alone would be over 250MB
+        self.assertLess(peak, 2 * small_peak)
+        self.assertLess(peak, 32 * 1024 * 1024)
+
+
+class TestChartRendering(unittest.TestCase):
+    def test_render_charts_on_pool(self):
+        matrices = np.zeros((3, 7, 4), dtype=np.int64)
+        matrices[0, 2, 1] = 50
+        matrices[1, 4, 0] = 25
+        matrices[2, 6, 3] = 90
+        pool = ProcessPoolExecutor(
+            max_workers=2, mp_context=multiprocessing.get_context("spawn")
+        )
+        with pool:
+            charts = list(render_charts(pool, matrices, window=2))
+        # charts come back in order and match the ones rendered in process
+        self.assertEqual(
+            [max_day for _, max_day in charts], ["Wednesday", "Friday", "Sunday"]
+        )
+        self.assertEqual(charts, [render_chart(matrix) for matrix in matrices])
+        self.assertTrue(charts[0][0].startswith(b"\x89PNG\r\n\x1a\n"))
+
+    def test_compose_email_with_svg_chart(self):
+        service = NotificationService(Config())
+        chart, _ = render_chart(np.ones((7, 4), dtype=np.int64), "svg")
+        msg = service.compose_email("focusbuddy.test@gmail.com", chart, "", "")
+        image = msg.get_payload()[1]
+        self.assertEqual(image.get_content_type(), "image/svg+xml")
+        self.assertEqual(image.get_payload(decode=True), chart)
+
+
+class TestChartCache(unittest.TestCase):
+    """identical weeks share one cached chart, rendered only once"""
+
+    app = get_test_app()
+    db = MongoDB().db
+    week = "2030-03-10"
+
+    def setUp(self):
+        self.service = NotificationService(Config())
+        self.service.db = self.db
+        monday = datetime(2030, 3, 4)
+        self.weeks = [
+            {
+                "user_id": f"chartcache{i}",
+                "days": [
+                    {
+                        "day": monday + timedelta(days=i % 2),
+                        "session_type": SessionType.STUDY,
+                        "focus_minutes": 1017,
+                    }
+                ],
+            }
+            for i in range(4)
+        ]
+        self.matrices, _ = self.service._week_matrices(self.weeks)
+        keys = [chart_key(m, Config().chart_backend) for m in self.matrices]
+        self.db.get_collection(CHART_BLOB_COLLECTION).delete_many(
+            {"_id": {"$in": keys}}
+        )
+
+    def test_cached_charts(self):
+        render = MagicMock(side_effect=self.service._render_chart)
+        with patch.object(self.service, "_render_chart", render):
+            charts = list(self.service._cached_charts(self.matrices))
+            self.assertEqual(render.call_count, 2)
+            again = list(self.service._cached_charts(self.matrices))
+            self.assertEqual(render.call_count, 2)
+        self.assertEqual(charts, again)
+        self.assertEqual(charts[0], charts[2])
+        self.assertNotEqual(charts[0][0], charts[1][0])
+        self.assertTrue(charts[0][1][0].startswith(b"\x89PNG\r\n\x1a\n"))
+
+    def test_cached_weekly_chart_is_only_read(self):
+        rollup = self.db.get_collection(ROLLUP_COLLECTION)
+        rollup.delete_many({"user_id": "chartcache2"})
+        rollup.insert_one(
+            {
+                "user_id": "chartcache2",
+                "day": datetime(2030, 3, 6),
+                "session_type": SessionType.WORK,
+                "focus_minutes": 50,
+                "sessions": 2,
+            }
+        )
+        chart = self.service.weekly_chart("chartcache2", self.week)
+        collection = type(self.db.get_collection(CHART_BLOB_COLLECTION))
+        writes = MagicMock()
+        with patch.object(collection, "update_one", writes), patch.object(
+            collection, "bulk_write", writes
+        ), patch.object(collection, "insert_one", writes):
+            self.assertEqual(self.service.weekly_chart("chartcache2", self.week), chart)
+        writes.assert_not_called()
+
+    def test_default_week_reads_the_summary_week(self):
+        # the rollup days of the week the charts and outbox are keyed by
+        self.assertEqual(
+            self.service._week_match(), self.service._week_match(summary_week())
+        )
+
+    def test_evicted_chart_is_rendered_again(self):
+        user_ids = ["chartcache0", "chartcache1"]
+        self.db.get_collection(OUTBOX_COLLECTION).delete_many(
+            {"user_id": {"$in": user_ids}}
+        )
+        rollup = self.db.get_collection(ROLLUP_COLLECTION)
+        rollup.delete_many({"user_id": {"$in": user_ids}})
+        rollup.insert_one(
+            {
+                "user_id": "chartcache0",
+                "day": datetime(2030, 3, 4),
+                "session_type": SessionType.STUDY,
+                "focus_minutes": 1017,
+                "sessions": 1,
+            }
+        )
+        weeks = [
+            dict(week, email=f"{week['user_id']}@focusbuddy.dev")
+            for week in self.weeks[:2]
+        ]
+        summaries = list(self.service._summarize_batch(weeks))
+        self.service._outbox().enqueue(self.week, summaries)
+        # evicted, and chartcache1 has no sessions left to render it from
+        self.db.get_collection(CHART_BLOB_COLLECTION).delete_many(
+            {"_id": {"$in": [summary["chart_id"] for summary in summaries]}}
+        )
+        with patch.object(self.service, "send_summary") as send:
+            counts = self.service.drain_outbox(self.week, user_ids)
+        self.assertEqual(counts, {"sent": 1, "retry": 1, "failed": 0})
+        self.assertEqual(send.call_args.args[0]["email"], "chartcache0@focusbuddy.dev")
+        self.assertEqual(send.call_args.args[0]["chart"], summaries[0]["chart"])
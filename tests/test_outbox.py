@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+import unittest
+from datetime import datetime, timedelta
+
+from src.db import MongoDB
+from src.service.outbox import (
+    EMAIL_PAYLOAD_COLLECTION,
+    FAILED,
+    OUTBOX_COLLECTION,
+    PENDING,
+    SENT,
+    EmailOutbox,
+)
+
+from tests.test_utils import get_test_app
+
+# a week no other test writes to
+WEEK = "2031-02-09"
+
+
+def summary(i: int) -> dict:
+    return {
+        "user_id": f"outbox{i}",
+        "email": f"outbox{i}@focusbuddy.dev",
+        "chart_id": f"chart{i % 2}",
+        "max_day": "Monday",
+        "summary_text": f"summary {i}",
+    }
+
+
+class TestEmailOutbox(unittest.TestCase):
+    app = get_test_app()
+    db = MongoDB().db
+
+    def setUp(self):
+        self.db.get_collection(OUTBOX_COLLECTION).delete_many({"week": WEEK})
+        self.db.get_collection(EMAIL_PAYLOAD_COLLECTION).delete_many(
+            {"_id": {"$regex": f"^{WEEK}:"}}
+        )
+        self.outbox = EmailOutbox(self.db, lease_seconds=60, max_attempts=2)
+        self.outbox.enqueue(WEEK, [summary(i) for i in range(5)])
+
+    def expire_leases(self):
+        self.db.get_collection(OUTBOX_COLLECTION).update_many(
+            {"week": WEEK, "lease_until": {"$ne": None}},
+            {"$set": {"lease_until": datetime.now() - timedelta(seconds=1)}},
+        )
+
+    def test_enqueue_is_idempotent(self):
+        self.assertEqual(
+            self.outbox.enqueue(WEEK, [summary(i) for i in range(3, 7)]), 2
+        )
+        self.assertEqual(
+            self.outbox.queued_users(WEEK, ["outbox0", "outbox6", "outbox9"]),
+            {"outbox0", "outbox6"},
+        )
+        self.assertEqual(self.outbox.status_counts(WEEK)[PENDING], 7)
+
+    def test_claims_share_the_backlog(self):
+        first = self.outbox.claim(3, WEEK)
+        second = self.outbox.claim(3, WEEK)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse(
+            {entry["_id"] for entry in first} & {entry["_id"] for entry in second}
+        )
+        self.assertEqual(self.outbox.claim(3, WEEK), [])
+        entry = first[0]
+        self.assertIn(entry["payload"]["chart_id"], ("chart0", "chart1"))
+        self.assertEqual(entry["attempts"], 1)
+
+    def test_expired_lease_is_claimed_again(self):
+        lost = self.outbox.claim(5, WEEK)
+        self.expire_leases()
+        resumed = self.outbox.claim(5, WEEK)
+        self.assertEqual(len(resumed), 5)
+        # the sender that lost its lease can no longer complete the entry
+        self.assertFalse(self.outbox.mark_sent(lost[0]))
+        self.assertTrue(self.outbox.mark_sent(resumed[0]))
+        self.assertEqual(self.outbox.status_counts(WEEK)[SENT], 1)
+
+    def test_failed_entry_is_retried_then_failed(self):
+        entry = self.outbox.claim(1, WEEK, ["outbox0"])[0]
+        self.assertEqual(self.outbox.mark_failed(entry, OSError("down")), PENDING)
+        # not before its retry delay
+        self.assertEqual(self.outbox.claim(1, WEEK, ["outbox0"]), [])
+        self.db.get_collection(OUTBOX_COLLECTION).update_one(
+            {"_id": entry["_id"]}, {"$set": {"retry_at": datetime.now()}}
+        )
+        entry = self.outbox.claim(1, WEEK, ["outbox0"])[0]
+        self.assertEqual(entry["attempts"], 2)
+        self.assertEqual(self.outbox.mark_failed(entry, OSError("down")), FAILED)
+        self.assertEqual(self.outbox.status_counts(WEEK)[FAILED], 1)
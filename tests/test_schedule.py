@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+import os
+import unittest
+from collections import Counter
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+from src.config import Config
+from src.service.notification import summary_week
+from src.service.schedule import (
+    due_at,
+    summary_bucket,
+    user_timezone,
+    window_bounds,
+    window_monday,
+)
+from src.service.sessiontime import LOCAL_TZ
+
+MONDAY = datetime(2031, 1, 13)
+WINDOW = timedelta(hours=6)
+
+
+class TestSchedule(unittest.TestCase):
+    def test_buckets_are_stable_and_even(self):
+        user_ids = [f"{i:024x}" for i in range(24_000)]
+        buckets = Counter(summary_bucket(user_id, 24) for user_id in user_ids)
+        # crc32, unlike hash(), does not change from one process to the next
+        self.assertEqual(summary_bucket(user_ids[0], 24), 3)
+        self.assertEqual(len(buckets), 24)
+        for count in buckets.values():
+            self.assertLess(abs(count - 1000), 150)
+
+    def test_due_in_the_user_time_zone(self):
+        user_id = "6790f6c3a1e2b4d5e6f70812"
+        offset = WINDOW * summary_bucket(user_id, 24) / 24
+        # Monday midnight in Toronto is 05:00 UTC in winter
+        self.assertEqual(
+            due_at(user_id, LOCAL_TZ, MONDAY, WINDOW, 24),
+            MONDAY + timedelta(hours=5) + offset,
+        )
+        self.assertEqual(
+            due_at(user_id, ZoneInfo("Asia/Tokyo"), MONDAY, WINDOW, 24),
+            MONDAY - timedelta(hours=9) + offset,
+        )
+        self.assertEqual(user_timezone("Not/AZone"), LOCAL_TZ)
+        self.assertEqual(user_timezone(None), LOCAL_TZ)
+
+    def test_window_monday(self):
+        # from the Sunday before, when the windows east of UTC open
+        for now in (
+            datetime(2031, 1, 10, 0, 0),
+            datetime(2031, 1, 12, 10, 0),
+            datetime(2031, 1, 14, 23, 0),
+        ):
+            with self.subTest(now=now):
+                self.assertEqual(window_monday(now), MONDAY)
+        opens, closes = window_bounds(MONDAY, WINDOW)
+        self.assertEqual(opens, datetime(2031, 1, 12, 10, 0))
+        self.assertEqual(closes, datetime(2031, 1, 13, 18, 0))
+
+    def test_summary_week_is_the_last_full_week(self):
+        for day in range(13, 20):
+            with self.subTest(day=day):
+                self.assertEqual(summary_week(datetime(2031, 1, day)), "2031-01-12")
+        self.assertEqual(summary_week(datetime(2031, 1, 12)), "2031-01-05")
+
+    def test_window_and_buckets_are_validated(self):
+        cfg = Config()
+        try:
+            for env in ({"SUMMARY_BUCKETS": "0"}, {"SUMMARY_WINDOW_HOURS": "0"}):
+                with self.subTest(env=env), patch.dict(os.environ, env):
+                    Config._instance = None
+                    with self.assertRaises(ValueError):
+                        Config()
+                # loaded again in full once the settings are fixed
+                self.assertEqual(Config().outbox_max_attempts, cfg.outbox_max_attempts)
+        finally:
+            Config._instance = cfg
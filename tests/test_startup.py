@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from benchmarks.bench_startup import LAZY_MODULES
+from src.config import Config, cpu_count
+from src.main import server_options
+
+
+class TestStartup(unittest.TestCase):
+    def test_heavy_modules_are_imported_lazily(self):
+        # a fresh interpreter, this one already imported them for other tests
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import json, sys, src.rest; print(json.dumps(list(sys.modules)))",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+            env={**os.environ, "ENV": "", "SERVICE_MODE": "async"},
+        ).stdout
+        imported = {name.split(".")[0] for name in json.loads(output)}
+        self.assertEqual(imported & set(LAZY_MODULES), set())
+
+
+class TestServerOptions(unittest.TestCase):
+    def setUp(self):
+        self.cfg = Config()
+        self.saved = (
+            self.cfg.server_profile,
+            self.cfg.web_workers,
+            self.cfg.analytics_cache_redis_url,
+        )
+        self.cfg.analytics_cache_redis_url = ""
+
+    def tearDown(self):
+        (
+            self.cfg.server_profile,
+            self.cfg.web_workers,
+            self.cfg.analytics_cache_redis_url,
+        ) = self.saved
+
+    def test_production_starts_several_workers_without_redis(self):
+        self.cfg.server_profile, self.cfg.web_workers = "production", 3
+        # started all the same, with the analytics cache bypassed
+        self.assertEqual(server_options(self.cfg)["workers"], 3)
+        self.assertEqual(self.cfg.server_workers(), 3)
+
+    def test_production_runs_a_worker_per_cpu(self):
+        self.cfg.server_profile, self.cfg.web_workers = "production", 0
+        self.cfg.analytics_cache_redis_url = "redis://localhost:6379/1"
+        options = server_options(self.cfg)
+        self.assertEqual(options["workers"], cpu_count())
+        self.assertNotIn("reload", options)
+        self.assertEqual(options["timeout_keep_alive"], self.cfg.keep_alive)
+        self.assertEqual(
+            options["timeout_graceful_shutdown"], self.cfg.graceful_timeout
+        )
+        self.cfg.web_workers = 3
+        self.assertEqual(server_options(self.cfg)["workers"], 3)
+
+    def test_dev_reloads_a_single_process(self):
+        self.cfg.server_profile, self.cfg.web_workers = "dev", 0
+        options = server_options(self.cfg)
+        self.assertTrue(options["reload"])
+        self.assertNotIn("workers", options)
+        self.assertEqual(self.cfg.server_workers(), 1)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- encoding=utf8 -*-
+import asyncio
+import json
+import socket
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.config import Config
+from src.service.google import GoogleUnavailableError, GoogleUserInfoClient
+from src.service.user import DecodedUser, TokenCache, UserService
+
+from tests.test_utils import get_test_app
+
+
+class TestTokenCache(unittest.TestCase):
+    app = get_test_app()
+    user_service = UserService(cfg=Config())
+
+    def setUp(self):
+        self.cache = TokenCache()
+        self.cache.clear()
+
+    def test_validate_token_hits_cache(self):
+        jwt_token = self.user_service._generate_jwt(
+            "focusbuddy_test", "focusbuddy.test@gmail.com"
+        )
+        hits, misses = self.cache.hits, self.cache.misses
+        for _ in range(3):
+            response = self.app.get(
+                "/api/v1/blocklist", headers={"x-auth-token": jwt_token}
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.cache.misses - misses, 1)
+        self.assertEqual(self.cache.hits - hits, 2)
+
+    def test_invalid_token_not_cached(self):
+        for _ in range(2):
+            response = self.app.get(
+                "/api/v1/blocklist", headers={"x-auth-token": "invalid"}
+            )
+            self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_expired_entry_evicted(self):
+        self.cache.put("token", DecodedUser("focusbuddy_test", "", time.time() - 1))
+        self.assertIsNone(self.cache.get("token"))
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_lru_eviction(self):
+        maxsize = self.cache.maxsize
+        self.cache.maxsize = 2
+        try:
+            exp = time.time() + 60
+            self.cache.put("a", DecodedUser("a", "", exp))
+            self.cache.put("b", DecodedUser("b", "", exp))
+            self.cache.get("a")
+            self.cache.put("c", DecodedUser("c", "", exp))
+            self.assertIsNotNone(self.cache.get("a"))
+            self.assertIsNone(self.cache.get("b"))
+            self.assertIsNotNone(self.cache.get("c"))
+        finally:
+            self.cache.maxsize = maxsize
+
+
+class _UserInfoHandler(BaseHTTPRequestHandler):
+    """stand-in for the google userinfo endpoint"""
+
+    calls = 0
+    failures = 0
+
+    def do_GET(self):
+        type(self).calls += 1
+        if type(self).failures > 0:
+            type(self).failures -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        token = self.headers["Authorization"].removeprefix("Bearer ")
+        body = {"error": "invalid_token"}
+        if token.startswith("valid"):
+            body = {"email": "focusbuddy.test@gmail.com", "picture": token}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestGoogleUserInfoClient(unittest.TestCase):
+    app = get_test_app()
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _UserInfoHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.cfg = Config()
+        cls.saved_url = cls.cfg.google_userinfo_url
+        cls.cfg.google_userinfo_url = f"http://127.0.0.1:{cls.server.server_port}/"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.cfg.google_userinfo_url = cls.saved_url
+
+    def setUp(self):
+        self.client = GoogleUserInfoClient()
+        self.client.profiles.clear()
+        _UserInfoHandler.calls = 0
+        _UserInfoHandler.failures = 0
+
+    def test_profile_cached(self):
+        for _ in range(2):
+            email, picture = asyncio.run(self.client.get_user("valid-a"))
+            self.assertEqual(email, "focusbuddy.test@gmail.com")
+            self.assertEqual(picture, "valid-a")
+        self.assertEqual(_UserInfoHandler.calls, 1)
+
+    def test_invalid_token_not_cached(self):
+        for _ in range(2):
+            self.assertEqual(asyncio.run(self.client.get_user("expired")), ("", ""))
+        self.assertEqual(_UserInfoHandler.calls, 2)
+
+    def test_retry_on_server_error(self):
+        _UserInfoHandler.failures = 1
+        _, picture = asyncio.run(self.client.get_user("valid-b"))
+        self.assertEqual(picture, "valid-b")
+        self.assertEqual(_UserInfoHandler.calls, 2)
+
+    def test_login_skips_google_when_cached(self):
+        for _ in range(2):
+            response = self.app.post("/api/v1/user/login", json={"token": "valid-c"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["picture"], "valid-c")
+        self.assertEqual(_UserInfoHandler.calls, 1)
+
+    def test_google_outage_is_unavailable(self):
+        _UserInfoHandler.failures = self.cfg.google_retries + 1
+        response = self.app.post("/api/v1/user/login", json={"token": "valid-d"})
+        self.assertEqual(response.status_code, 503)
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            closed = f"http://127.0.0.1:{sock.getsockname()[1]}/"
+        self.cfg.google_userinfo_url, url = closed, self.cfg.google_userinfo_url
+        try:
+            with self.assertRaises(GoogleUnavailableError):
+                asyncio.run(self.client.get_user("valid-d"))
+        finally:
+            self.cfg.google_userinfo_url = url